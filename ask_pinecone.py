@@ -1,19 +1,33 @@
 # ask_pinecone.py
 import os
 import re
+import sys
 import json
+import time
+import argparse
 import unicodedata
 import difflib
+import multiprocessing
+import queue
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
-from typing import List, Dict, Set
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Set, Optional, Tuple
 
 import ollama
 from pinecone import Pinecone
 
+# Orden canónico, alias de libros y parser de referencias: una sola fuente, compartida con la API
+from src.domain.scripture_reference import book_order, canon_sort_key, parse_reference, parse_reference_query
+from src.infra.metrics import percentile
+
 INDEX_NAME = "escrituras"
 NAMESPACE  = "es"
 JSONL_FILE = "versiculos.jsonl"   # base para índice literal (id -> texto / ref)
+EMBED_MODEL = "nomic-embed-text"
 ORDER_MODE = os.getenv("ASK_ORDER", "canon").lower().strip()  # "canon" (default) o "score"
+# Consultas a Pinecone solo con ids/scores; texto y ref desde el JSONL local ("0" para pedir metadata)
+ID_ONLY = os.getenv("ASK_ID_ONLY", "1").strip() not in ("0", "false", "no")
 
 # =============== utilidades ===============
 def clear_screen():
@@ -58,68 +72,14 @@ def extract_phrases_and_tokens(q: str):
             tokens.append(t)
     return phrases, tokens
 
-# =============== orden canónico ===============
-_CANON_ORDER = [
-    # AT
-    "Génesis","Éxodo","Levítico","Números","Deuteronomio","Josué","Jueces","Rut",
-    "1 Samuel","2 Samuel","1 Reyes","2 Reyes","1 Crónicas","2 Crónicas","Esdras","Nehemías","Ester",
-    "Job","Salmos","Proverbios","Eclesiastés","Cantares","Isaías","Jeremías","Lamentaciones",
-    "Ezequiel","Daniel","Oseas","Joel","Amós","Abdías","Jonás","Miqueas","Nahúm","Habacuc",
-    "Sofonías","Hageo","Zacarías","Malaquías",
-    # NT
-    "Mateo","Marcos","Lucas","Juan","Hechos","Romanos","1 Corintios","2 Corintios","Gálatas",
-    "Efesios","Filipenses","Colosenses","1 Tesalonicenses","2 Tesalonicenses","1 Timoteo",
-    "2 Timoteo","Tito","Filemón","Hebreos","Santiago","1 Pedro","2 Pedro","1 Juan","2 Juan",
-    "3 Juan","Judas","Apocalipsis",
-    # BoM
-    "1 Nefi","2 Nefi","Jacob","Enós","Jarom","Omni","Palabras de Mormón","Mosíah","Alma",
-    "Helamán","3 Nefi","4 Nefi","Mormón","Éter","Moroni",
-    # DyC
-    "Doctrina y Convenios",
-    # PGP
-    "Moisés","Abraham","José Smith—Mateo","José Smith—Historia","Artículos de Fe"
-]
-_ALIAS = {
-    # equivalencias ortográficas/diacríticas de libros (no de términos)
-    "genesis":"génesis","exodo":"éxodo","levitico":"levítico","numeros":"números",
-    "nehemias":"nehemías","eclesiastes":"eclesiastés","amos":"amós","jonas":"jonás",
-    "nahum":"nahúm","galatas":"gálatas","filemon":"filemón","enos":"enós",
-    "mosiah":"mosíah","helaman":"helamán","mormon":"mormón","eter":"éter",
-    "moises":"moisés",
-    # variantes de JS—Mateo/Historia y DyC
-    "jose smith-mateo":"josé smith—mateo","jose smith—mateo":"josé smith—mateo",
-    "jose smith-historia":"josé smith—historia","jose smith—historia":"josé smith—historia",
-    "dyc":"doctrina y convenios","articulos de fe":"artículos de fe",
-    "cantar de los cantares":"cantares"
-}
-def _norm_book_key(s: str) -> str:
-    s = s.replace("—","-").replace("–","-")
-    s = norm_basic(s)
-    return re.sub(r"\s+", " ", s).strip()
-_BOOK_INDEX: Dict[str,int] = {}
-for i,name in enumerate(_CANON_ORDER):
-    _BOOK_INDEX[_norm_book_key(name)] = i
-for a,t in _ALIAS.items():
-    _BOOK_INDEX[_norm_book_key(a)] = _BOOK_INDEX.get(_norm_book_key(t), len(_CANON_ORDER)+999)
-
-def parse_reference(ref: str):
-    m = re.match(r"^(?P<book>.+?)\s+(?P<chap>\d+)(?::(?P<verse>\d+))?$", ref.strip())
-    if not m: return ref, 0, 0
-    book = m.group("book").strip()
-    chap = int(m.group("chap"))
-    verse = int(m.group("verse") or 0)
-    return book, chap, verse
-
-def canon_sort_key(ref: str):
-    book, chap, verse = parse_reference(ref)
-    order = _BOOK_INDEX.get(_norm_book_key(book), len(_CANON_ORDER)+1000)
-    return (order, chap, verse)
-
 # =============== índice literal (RAM) ===============
 TEXT_BY_ID: Dict[str,str] = {}
 REF_BY_ID: Dict[str,str]  = {}
 NORMWORDS_BY_ID: Dict[str,str] = {}
 POSTINGS: Dict[str, Set[str]] = defaultdict(set)  # token -> set(ids)
+# (libro, capítulo, versículo) -> id, ordenado para resolver referencias por rango
+REF_KEYS: List[Tuple[int, int, int]] = []
+REF_IDS: List[str] = []
 
 def _add_hyphen_collapses(src_text: str) -> List[str]:
     """Detecta palabras con guion en la versión sin tildes y añade su forma 'pegada' (bet-el -> betel)."""
@@ -154,6 +114,15 @@ def build_inverted_index(jsonl_path: str = JSONL_FILE):
         # si no está el JSONL, el literal total no estará disponible;
         # seguiremos pudiendo hacer búsqueda semántica
         pass
+    pairs = []
+    for vid, ref in REF_BY_ID.items():
+        book, chap, verse = parse_reference(ref)
+        order = book_order(book) if chap else None
+        if order is not None:
+            pairs.append(((order, chap, verse), vid))
+    pairs.sort()
+    REF_KEYS[:] = [k for k, _ in pairs]
+    REF_IDS[:] = [vid for _, vid in pairs]
 
 build_inverted_index()
 
@@ -161,18 +130,48 @@ build_inverted_index()
 pc = Pinecone(api_key=os.environ["PINECONE_API_KEY"])
 index = pc.Index(INDEX_NAME)
 
-def pinecone_semantic_candidates(query: str, top_k: int, sample_k: int):
-    emb = ollama.embed(model="nomic-embed-text", input=query)["embeddings"][0]
-    res = index.query(vector=emb, top_k=sample_k, namespace=NAMESPACE, include_metadata=True)
+def fetch_metadata(ids: List[str]) -> Dict[str, dict]:
+    """Metadata de Pinecone para ids que no están en el JSONL local (fetch en lotes de 100)."""
+    out = {}
+    for i in range(0, len(ids), 100):
+        res = index.fetch(ids=ids[i:i + 100], namespace=NAMESPACE)
+        for vid, vec in (res.get("vectors") or {}).items():
+            out[vid] = vec.get("metadata") or {}
+    return out
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embeddings de varias consultas en una sola llamada a Ollama (mismo orden)."""
+    return ollama.embed(model=EMBED_MODEL, input=queries)["embeddings"]
+
+def semantic_sample_k(query: str, top_k: int) -> int:
+    phrases, tokens = extract_phrases_and_tokens(query)
+    return max(top_k, 200) if (phrases or tokens) else max(top_k, 100)
+
+def pinecone_semantic_candidates(query: str, top_k: int, sample_k: int, emb: Optional[List[float]] = None):
+    if emb is None:
+        emb = embed_queries([query])[0]
+    # con el JSONL cargado basta con ids y scores: el texto ya está en TEXT_BY_ID / REF_BY_ID
+    id_only = ID_ONLY and bool(TEXT_BY_ID)
+    res = index.query(vector=emb, top_k=sample_k, namespace=NAMESPACE, include_metadata=not id_only)
     matches = res.get("matches", [])
+    remote = {}
+    if id_only:
+        missing = [m.get("id") for m in matches if m.get("id") not in TEXT_BY_ID]
+        remote = fetch_metadata(missing) if missing else {}
     # keep structure uniform
     out = []
     for m in matches:
-        md = m.get("metadata", {}) or {}
+        vid = m.get("id")
+        if id_only and vid in TEXT_BY_ID:
+            md = {"reference": REF_BY_ID.get(vid, ""), "contenido": TEXT_BY_ID[vid]}
+        elif id_only:
+            md = remote.get(vid, {})
+        else:
+            md = m.get("metadata", {}) or {}
         out.append({
-            "id": m.get("id"),
+            "id": vid,
             "ref": md.get("reference") or md.get("Referencia") or "",
-            "texto": md.get("contenido") or TEXT_BY_ID.get(m.get("id"), "") or "",
+            "texto": md.get("contenido") or TEXT_BY_ID.get(vid, "") or "",
             "score": m.get("score", 0.0)
         })
     return out
@@ -210,7 +209,27 @@ def ids_for_token(token: str) -> Set[str]:
     if t.endswith("s"):  cand |= POSTINGS.get(t[:-1], set())
     return cand
 
+def reference_search(query: str) -> Optional[List[dict]]:
+    """
+    Consultas de referencia ("Juan 3:16", "Alma 32:21-43", "Juan 3; Mateo 5:3"): versículos de
+    cada rango en orden canónico, los rangos en el orden pedido. None si no es una referencia.
+    """
+    ranges = parse_reference_query(query)
+    if ranges is None:
+        return None
+    results, seen = [], set()
+    for r in ranges:
+        lo, hi = bisect_left(REF_KEYS, r.start_key()), bisect_right(REF_KEYS, r.end_key())
+        for vid in REF_IDS[lo:hi]:
+            if vid not in seen:
+                seen.add(vid)
+                results.append({"id": vid, "ref": REF_BY_ID.get(vid, ""), "texto": index_meta_text(vid), "score": 1.0})
+    return results
+
 def literal_search(query: str):
+    references = reference_search(query)
+    if references is not None:
+        return references
     phrases, tokens = extract_phrases_and_tokens(query)
     literal_ids: Set[str] = set()
 
@@ -240,6 +259,12 @@ def index_meta_text(vid: str) -> str:
     # aquí, como estamos en modo literal local, usamos JSONL (rápido y completo).
     return TEXT_BY_ID.get(vid, "")
 
+def sort_semantic(sem: List[dict]):
+    if ORDER_MODE == "canon":
+        sem.sort(key=lambda r: canon_sort_key(r["ref"]))
+    else:
+        sem.sort(key=lambda r: r["score"], reverse=True)
+
 # =============== pipeline principal ===============
 def consultar(pregunta: str, top_k: int = 50):
     clear_screen()
@@ -256,7 +281,7 @@ def consultar(pregunta: str, top_k: int = 50):
 
     # 2) sin resultados literales → respaldo semántico (explicitarlo al usuario)
     phrases, tokens = extract_phrases_and_tokens(pregunta)
-    sample_k = max(top_k, 200) if (phrases or tokens) else max(top_k, 100)
+    sample_k = semantic_sample_k(pregunta, top_k)
     sem = pinecone_semantic_candidates(pregunta, top_k, sample_k)
 
     if not sem:
@@ -276,18 +301,201 @@ def consultar(pregunta: str, top_k: int = 50):
         return
 
     # 4) tenemos semánticos: ordenar y mostrar
-    if ORDER_MODE == "canon":
-        sem.sort(key=lambda r: canon_sort_key(r["ref"]))
-    else:
-        sem.sort(key=lambda r: r["score"], reverse=True)
+    sort_semantic(sem)
 
     print(f"🔎 Pregunta (semántica – no hubo coincidencias literales): {pregunta}\n")
     for r in sem[:top_k]:
         print(f"[{r['ref']}] (score={r['score']:.3f})")
         print(r["texto"], "\n")
 
+# =============== modo por lotes (offline) ===============
+def _ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 3)
+
+def _literal_timed(args):
+    """Literal de una consulta (se ejecuta en el pool de procesos): top_k, total y ms."""
+    q, top_k = args
+    t0 = time.perf_counter()
+    res = literal_search(q)
+    return (res[:top_k] if top_k else res), len(res), _ms(t0)
+
+def _embed_timed(queries: List[str]):
+    t0 = time.perf_counter()
+    return embed_queries(queries), _ms(t0)
+
+def _semantic_timed(q: str, emb: List[float], top_k: int):
+    t0 = time.perf_counter()
+    sem = pinecone_semantic_candidates(q, top_k, semantic_sample_k(q, top_k), emb=emb)
+    sort_semantic(sem)
+    return sem[:top_k], len(sem), _ms(t0)
+
+def _row(n: int, q: str, mode: str, results: List[dict], total: int, timings: Dict[str, float], with_text: bool) -> dict:
+    keys = ("id", "ref", "score", "texto") if with_text else ("id", "ref", "score")
+    timings["total"] = round(sum(timings.values()), 3)
+    return {
+        "n": n, "query": q, "mode": mode, "total": total,
+        "results": [{k: r[k] for k in keys} for r in results],
+        "timings_ms": timings,
+    }
+
+def summarize(latencies: List[float], modes: Dict[str, int], wall_s: float, embed_calls: int) -> dict:
+    """Resumen del lote a partir de la latencia total de cada pregunta (ms) y el recuento por modo."""
+    lat = sorted(latencies)
+    return {
+        "queries": len(lat),
+        "wall_s": round(wall_s, 3),
+        "throughput_qps": round(len(lat) / wall_s, 2) if wall_s > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(sum(lat) / len(lat), 3) if lat else 0.0,
+            "p50": percentile(lat, 50), "p95": percentile(lat, 95),
+            "p99": percentile(lat, 99), "max": lat[-1] if lat else 0.0,
+        },
+        "modes": dict(modes),
+        "embed_calls": embed_calls,
+    }
+
+def _literal_executor(workers: int) -> Executor:
+    """
+    Pool del literal. Con fork los procesos heredan el índice ya construido; donde solo hay spawn
+    cada proceso reimportaría este script (índice y cliente de Pinecone incluidos), así que se usan hilos.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(max_workers=workers)
+
+def run_batch(queries: List[str], out, top_k: int = 50, workers: int = 0, embed_batch: int = 32,
+              concurrency: int = 8, with_text: bool = False) -> dict:
+    """
+    Igual que consultar() pero sin interacción y para muchas preguntas:
+    - literal en paralelo en un pool de procesos (hilos donde no hay fork);
+    - las preguntas sin resultado literal se embeben en lotes de embed_batch (una llamada a Ollama por lote)
+      y sus consultas a Pinecone van concurrentes en un pool de hilos, solapadas con el literal;
+    - escribe una línea JSON por pregunta en cuanto termina (n es su posición en la entrada), con sus
+      tiempos por etapa; no se guardan los resultados del lote en memoria.
+    Devuelve el resumen agregado (throughput y latencias).
+    """
+    t_start = time.perf_counter()
+    n = len(queries)
+    timings: List[Dict[str, float]] = [{} for _ in range(n)]
+    latencies: List[float] = []
+    modes: Dict[str, int] = defaultdict(int)
+    pending: List[int] = []
+    embeds = []    # (índices, future del lote de embeddings)
+    searches: Dict[Future, int] = {}  # future de la consulta a Pinecone -> índice
+    searched: "queue.Queue[Future]" = queue.Queue()  # consultas a Pinecone terminadas, por orden de llegada
+    embed_calls = 0
+    workers = workers or os.cpu_count() or 1
+    literal_pool = _literal_executor(workers) if workers > 1 and n > 1 else None
+
+    def emit(row: dict):
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        out.flush()
+        latencies.append(row["timings_ms"]["total"])
+        modes[row["mode"]] += 1
+
+    def finish(fut: Future):
+        i = searches.pop(fut)
+        try:
+            sem, total, ms = fut.result()
+        except Exception as e:
+            emit({**_row(i, queries[i], "error", [], 0, timings[i], with_text), "error": f"pinecone: {e}"})
+            return
+        timings[i]["pinecone"] = ms
+        emit(_row(i, queries[i], "semantic" if sem else "none", sem, total, timings[i], with_text))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as io:
+        def flush():
+            nonlocal embed_calls
+            if pending:
+                idx = pending[:]
+                pending.clear()
+                embeds.append((idx, io.submit(_embed_timed, [queries[i] for i in idx])))
+                embed_calls += 1
+
+        def drain(block: bool):
+            # lotes de embeddings ya listos -> sus consultas a Pinecone, sin esperar al resto del literal
+            while embeds and (block or embeds[0][1].done()):
+                idx, fut = embeds.pop(0)
+                try:
+                    embs, ms = fut.result()
+                except Exception as e:
+                    for i in idx:
+                        emit({**_row(i, queries[i], "error", [], 0, timings[i], with_text), "error": f"embed: {e}"})
+                    continue
+                for i, emb in zip(idx, embs):
+                    timings[i]["embed"] = ms
+                    fut = io.submit(_semantic_timed, queries[i], emb, top_k)
+                    searches[fut] = i
+                    fut.add_done_callback(searched.put)
+            while not searched.empty():
+                finish(searched.get_nowait())
+
+        args = ((q, top_k) for q in queries)
+        if literal_pool is not None:
+            literal = literal_pool.map(_literal_timed, args, chunksize=max(1, n // (workers * 8)))
+        else:
+            literal = map(_literal_timed, args)
+        try:
+            for i, (res, total, ms) in enumerate(literal):
+                timings[i]["literal"] = ms
+                if res:
+                    emit(_row(i, queries[i], "literal", res, total, timings[i], with_text))
+                else:
+                    pending.append(i)
+                    if len(pending) >= embed_batch:
+                        flush()
+                drain(block=False)
+        finally:
+            if literal_pool is not None:
+                literal_pool.shutdown()
+        flush()
+        drain(block=True)
+        while searches:
+            finish(searched.get())
+    return summarize(latencies, modes, time.perf_counter() - t_start, embed_calls)
+
+def read_queries(path: str) -> List[str]:
+    """Una pregunta por línea ("-" = stdin); se ignoran las líneas vacías."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        return [line.strip() for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def print_summary(stats: dict, file=sys.stderr):
+    lat = stats["latency_ms"]
+    print(f"{stats['queries']} preguntas en {stats['wall_s']:.2f}s -> {stats['throughput_qps']:.1f} preguntas/s", file=file)
+    print(f"latencia ms: media {lat['mean']:.1f}  p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  "
+          f"p99 {lat['p99']:.1f}  máx {lat['max']:.1f}", file=file)
+    modes = ", ".join(f"{k}={v}" for k, v in sorted(stats["modes"].items()))
+    print(f"modos: {modes}; llamadas de embedding: {stats['embed_calls']}", file=file)
+
 # =============== CLI ===============
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas literales/semánticas a las escrituras")
+    parser.add_argument("--batch", metavar="ARCHIVO", help="modo por lotes: una pregunta por línea ('-' = stdin)")
+    parser.add_argument("--out", default="-", help="JSONL de resultados del modo por lotes ('-' = stdout)")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=0, help="procesos para el literal (0 = núcleos)")
+    parser.add_argument("--embed-batch", type=int, default=32, help="preguntas por llamada de embedding a Ollama")
+    parser.add_argument("--concurrency", type=int, default=8, help="llamadas simultáneas a Ollama/Pinecone")
+    parser.add_argument("--with-text", action="store_true", help="incluye el texto de cada resultado")
+    parser.add_argument("--stats", metavar="ARCHIVO", help="guarda también el resumen agregado en JSON")
+    cli = parser.parse_args()
+    if cli.batch:
+        out = sys.stdout if cli.out == "-" else open(cli.out, "w", encoding="utf-8")
+        try:
+            stats = run_batch(read_queries(cli.batch), out, top_k=cli.top_k, workers=cli.workers,
+                              embed_batch=cli.embed_batch, concurrency=cli.concurrency, with_text=cli.with_text)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print_summary(stats)
+        if cli.stats:
+            with open(cli.stats, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+        sys.exit(0)
     while True:
         try:
             q = input("\nEscribe tu pregunta (o ENTER para salir): ").strip()
@@ -296,5 +504,3 @@ if __name__ == "__main__":
         if not q:
             break
         consultar(q, top_k=50)
-
-copy "d:\myapps\scripturedb\pinecone\versiculos.jsonl" "d:\myapps\scripturedb\apicone\"
@@ -0,0 +1,4 @@
+"""
+Suite de benchmarks: corpus sintéticos, dobles de Ollama/Pinecone y escenarios medidos.
+Uso: python -m benchmarks --help
+"""
@@ -0,0 +1,138 @@
+"""
+Runner del benchmark.
+
+    python -m benchmarks --sizes 42k,250k --scenarios literal_token,semantic \
+        --output bench_results.json --baseline benchmarks/baseline.json
+
+Cada (tamaño, escenario) corre en un proceso nuevo para que el RSS pico sea el del escenario.
+Con --baseline se comparan throughput, p50/p95/p99 y RSS pico; el código de salida es 1 si
+alguna métrica empeora más de --tolerance.
+"""
+
+import argparse
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List
+
+import orjson
+
+from benchmarks.corpus import ensure_corpus, parse_size
+from benchmarks.scenarios import SCENARIOS, BenchConfig, run_scenario, scenario_child
+from benchmarks.stats import compare_results
+
+
+def run_isolated(name: str, config: BenchConfig) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=scenario_child, args=(name, asdict(config), child))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {"error": f"el proceso terminó con código {proc.exitcode}"}
+    proc.join()
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks de apicone")
+    p.add_argument("--sizes", default="42k", help="Tamaños de corpus separados por coma (42k, 250k, 1m o número)")
+    p.add_argument("--scenarios", default="all", help=f"Escenarios separados por coma: {', '.join(SCENARIOS)}")
+    p.add_argument("--duration", type=float, default=5.0, help="Segundos de medición por escenario")
+    p.add_argument("--max-ops", type=int, default=2000)
+    p.add_argument("--warmup", type=int, default=5)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--workdir", default=".bench", help="Directorio de corpus generados e índices temporales")
+    p.add_argument("--output", default="bench_results.json")
+    p.add_argument("--baseline", help="Resultados previos contra los que comparar")
+    p.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento relativo tolerado (0.2 = 20%%)")
+    p.add_argument("--ollama-latency-ms", type=float, default=15.0)
+    p.add_argument("--ollama-jitter-ms", type=float, default=5.0)
+    p.add_argument("--pinecone-latency-ms", type=float, default=25.0)
+    p.add_argument("--pinecone-jitter-ms", type=float, default=10.0)
+    p.add_argument("--in-process", action="store_true", help="No aislar escenarios en subprocesos (RSS pico acumulado)")
+    return p.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    names = list(SCENARIOS) if args.scenarios == "all" else [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"Escenarios desconocidos: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    for label in args.sizes.split(","):
+        n = parse_size(label)
+        t0 = time.perf_counter()
+        corpus_path = ensure_corpus(os.path.join(args.workdir, "corpus"), n, args.seed)
+        print(f"[{label}] corpus {corpus_path} ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+        workdir = os.path.join(args.workdir, f"run-{n}")
+        os.makedirs(workdir, exist_ok=True)
+        config = BenchConfig(
+            corpus_path=os.path.abspath(corpus_path),
+            workdir=os.path.abspath(workdir),
+            duration=args.duration,
+            max_ops=args.max_ops,
+            warmup=args.warmup,
+            seed=args.seed,
+            top_k=args.top_k,
+            ollama_latency_ms=args.ollama_latency_ms,
+            ollama_jitter_ms=args.ollama_jitter_ms,
+            pinecone_latency_ms=args.pinecone_latency_ms,
+            pinecone_jitter_ms=args.pinecone_jitter_ms,
+        )
+        for name in names:
+            result = run_scenario(name, config) if args.in_process else run_isolated(name, config)
+            result.update({"size": n, "scenario": name})
+            report["results"][f"{label}/{name}"] = result
+            if "error" in result:
+                print(f"[{label}] {name}: ERROR {result['error']}", file=sys.stderr)
+            else:
+                print(f"[{label}] {name}: {result['throughput']:.1f} ops/s p50={result['p50_ms']}ms "
+                      f"p95={result['p95_ms']}ms p99={result['p99_ms']}ms rss={result['peak_rss_mb']}MB"
+                      + (f" index={result['index_mb']}MB" if "index_mb" in result else ""), file=sys.stderr)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = orjson.loads(f.read())
+        regressions = compare_results(report, baseline, args.tolerance)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESIÓN {r['scenario']} {r['metric']}: {r['baseline']} -> {r['current']} ({r['change_pct']:+}%)", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"Resultados en {args.output}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
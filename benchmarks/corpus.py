@@ -0,0 +1,130 @@
+"""
+Generador de corpus sintéticos con la forma de versiculos.jsonl.
+
+Cada línea: {"id": "AT-genesis-01-001", "text": ..., "metadata": {"reference": "Génesis 1:1",
+"libro": ..., "capitulo": ..., "versiculo": ..., "idioma": "es"}}. Los libros siguen el orden
+canónico y el vocabulario sigue una distribución de Zipf, de modo que las postings tienen
+longitudes parecidas a las del corpus real. Misma semilla, mismo archivo.
+"""
+
+import os
+import random
+import unicodedata
+from itertools import accumulate
+from typing import Dict, Iterator, List, Tuple
+
+import orjson
+
+from src.domain.scripture_reference import CANON_ORDER
+
+SIZES: Dict[str, int] = {"42k": 42_000, "250k": 250_000, "1m": 1_000_000}
+
+# Palabras frecuentes del corpus real; el resto del vocabulario se genera por sílabas
+COMMON_WORDS = (
+    "y de la el que a en los se por su las con no para del al lo como le dios es un una "
+    "sus mas porque pues señor todo he ha hijo padre pueblo tierra cuando sobre jehová "
+    "israel rey casa dijo entonces ni esto amor fe espíritu mundo cielos vida palabra "
+    "corazón hombres mandamientos profeta reino gloria paz verdad luz camino templo "
+    "nombre día noche agua fuego santo ángel alma siervo hermanos obras gracia"
+).split()
+_SYLLABLES = ("ba be bi bo ca ce ci co da de di do fa fe ga go ja je la le li lo ma me mi mo "
+              "na ne ni no pa pe pi po ra re ri ro sa se si so ta te ti to va ve vi za zo "
+              "bra cre dri gla plo tri ción mán lén rás").split()
+
+_VOLUMES = (("AT", 0, 39), ("NT", 39, 66), ("BM", 66, 81), ("DyC", 81, 82), ("PGP", 82, len(CANON_ORDER)))
+
+
+def parse_size(label: str) -> int:
+    """
+    Acepta etiquetas ("42k", "250k", "1m") o números ("5000").
+    """
+    key = label.strip().lower()
+    if key in SIZES:
+        return SIZES[key]
+    if key.endswith("k"):
+        return int(float(key[:-1]) * 1_000)
+    if key.endswith("m"):
+        return int(float(key[:-1]) * 1_000_000)
+    return int(key)
+
+
+def _slug(book: str) -> str:
+    s = unicodedata.normalize("NFD", book.replace("—", "-").lower())
+    s = "".join(c for c in s if unicodedata.category(c) != "Mn")
+    return "-".join(s.replace("-", " ").split())
+
+
+def _vocabulary(rng: random.Random, size: int) -> List[str]:
+    words = list(COMMON_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        w = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if w not in seen:
+            seen.add(w)
+            words.append(w)
+    return words
+
+
+def _books() -> List[Tuple[str, str]]:
+    out = []
+    for volume, start, end in _VOLUMES:
+        out.extend((volume, book) for book in CANON_ORDER[start:end])
+    return out
+
+
+def iter_verses(n: int, seed: int = 1, vocabulary_size: int = 30_000) -> Iterator[Dict]:
+    """
+    Genera n versículos repartidos entre todos los libros canónicos, en orden canónico.
+    """
+    rng = random.Random(seed)
+    vocab = _vocabulary(rng, vocabulary_size)
+    cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(vocab))))
+    books = _books()
+    per_book, extra = divmod(n, len(books))
+    for b, (volume, book) in enumerate(books):
+        count = per_book + (1 if b < extra else 0)
+        slug = _slug(book)
+        chapter, verse = 1, 0
+        chapter_len = rng.randint(15, 45)
+        for _ in range(count):
+            verse += 1
+            if verse > chapter_len:
+                chapter, verse = chapter + 1, 1
+                chapter_len = rng.randint(15, 45)
+            words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(12, 40))
+            text = " ".join(words)
+            text = text[0].upper() + text[1:] + "."
+            yield {
+                "id": f"{volume}-{slug}-{chapter:02d}-{verse:03d}",
+                "text": text,
+                "metadata": {
+                    "reference": f"{book} {chapter}:{verse}",
+                    "libro": book,
+                    "capitulo": chapter,
+                    "versiculo": verse,
+                    "idioma": "es",
+                },
+            }
+
+
+def generate_corpus(path: str, n: int, seed: int = 1) -> str:
+    """
+    Escribe el corpus en path (JSONL) y devuelve la ruta.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        for doc in iter_verses(n, seed):
+            f.write(orjson.dumps(doc) + b"\n")
+    os.replace(tmp, path)
+    return path
+
+
+def ensure_corpus(workdir: str, n: int, seed: int = 1) -> str:
+    """
+    Devuelve la ruta de un corpus de n versículos en workdir, generándolo solo si no existe.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, f"versiculos-{n}-s{seed}.jsonl")
+    if not os.path.exists(path):
+        generate_corpus(path, n, seed)
+    return path
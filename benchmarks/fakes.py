@@ -0,0 +1,147 @@
+"""
+Dobles en proceso de Ollama y Pinecone con latencia configurable, para medir la API sin red.
+Imitan la interfaz que usa el código (OllamaEmbedder.embed, Index.query/upsert/fetch) y
+devuelven datos deterministas derivados del corpus.
+"""
+
+import asyncio
+import hashlib
+import random
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+
+from src.adapters.pinecone_adapter import DEFAULT_TIMEOUT, PineconeAdapter
+
+
+class Latency:
+    """
+    Latencia base + jitter uniforme, en milisegundos.
+    """
+    def __init__(self, base_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 1):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return (self.base_ms + jitter) / 1000.0
+
+
+def fake_vector(text: str, dim: int = 768) -> List[float]:
+    """
+    Vector determinista a partir del texto (mismo texto, mismo vector).
+    """
+    out: List[float] = []
+    counter = 0
+    while len(out) < dim:
+        digest = hashlib.blake2b(f"{counter}:{text}".encode("utf-8"), digest_size=64).digest()
+        out.extend(b / 127.5 - 1.0 for b in digest)
+        counter += 1
+    return out[:dim]
+
+
+class FakeEmbedder:
+    """
+    Sustituto de OllamaEmbedder: espera la latencia configurada (sin bloquear el event loop).
+    """
+    def __init__(self, latency: Optional[Latency] = None, dim: int = 768):
+        self.latency = latency or Latency()
+        self.dim = dim
+        self.calls = 0
+
+    async def embed(self, text: str) -> List[float]:
+        self.calls += 1
+        delay = self.latency.sample()
+        if delay:
+            await asyncio.sleep(delay)
+        return fake_vector(text, self.dim)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        delay = self.latency.sample()
+        if delay:
+            await asyncio.sleep(delay)
+        return [fake_vector(t, self.dim) for t in texts]
+
+
+class FakePineconeIndex:
+    """
+    Índice de Pinecone en memoria. query elige top_k ids del corpus de forma determinista
+    según el vector; la latencia se simula con time.sleep, como el cliente síncrono real, y con
+    timeout la llamada se corta en ese plazo con TimeoutError (como la petición HTTP del cliente).
+    """
+    def __init__(self, records: Sequence[Dict[str, Any]], latency: Optional[Latency] = None):
+        self.records = list(records)
+        self.by_id = {r["id"]: r for r in self.records}
+        self.latency = latency or Latency()
+        self.upserted = 0
+        self.queries = 0
+
+    @classmethod
+    def from_corpus(cls, corpus_path: str, latency: Optional[Latency] = None) -> "FakePineconeIndex":
+        records = []
+        with open(corpus_path, "rb") as f:
+            for line in f:
+                doc = orjson.loads(line)
+                md = dict(doc.get("metadata") or {})
+                md["contenido"] = doc.get("text", "")
+                records.append({"id": doc["id"], "metadata": md})
+        return cls(records, latency)
+
+    def _wait(self, timeout: Optional[float] = None) -> None:
+        delay = self.latency.sample()
+        if timeout is not None and delay > timeout:
+            time.sleep(max(0.0, timeout))
+            raise TimeoutError(f"sin respuesta en {timeout * 1000:.0f} ms")
+        if delay:
+            time.sleep(delay)
+
+    def query(self, vector: List[float], top_k: int = 10, namespace: Optional[str] = None,
+              filter: Optional[Dict[str, Any]] = None, include_metadata: bool = True,
+              timeout: Optional[float] = None, **kwargs: Any) -> Dict[str, Any]:
+        self._wait(timeout)
+        self.queries += 1
+        if not self.records:
+            return {"matches": []}
+        seed = struct.unpack("<Q", hashlib.blake2b(struct.pack(f"<{min(len(vector), 16)}f", *vector[:16]), digest_size=8).digest())[0]
+        rng = random.Random(seed)
+        n = len(self.records)
+        picks = rng.sample(range(n), min(top_k, n))
+        matches = []
+        for rank, i in enumerate(picks):
+            rec = self.records[i]
+            m = {"id": rec["id"], "score": round(0.95 - rank * 0.01, 4)}
+            if include_metadata:
+                m["metadata"] = rec["metadata"]
+            matches.append(m)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def upsert(self, vectors: Sequence[Any], namespace: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        self._wait()
+        self.upserted += len(vectors)
+        return {"upserted_count": len(vectors)}
+
+    def fetch(self, ids: Sequence[str], namespace: Optional[str] = None, timeout: Optional[float] = None,
+              **kwargs: Any) -> Dict[str, Any]:
+        self._wait(timeout)
+        return {"vectors": {vid: self.by_id[vid] for vid in ids if vid in self.by_id}}
+
+
+class FakePineconeAdapter(PineconeAdapter):
+    """
+    PineconeAdapter con el índice falso: conserva la lógica de mapeo de resultados del adaptador real.
+    """
+    def __init__(self, api_key: str = "", environment: str = "", index_name: str = "", namespace: Optional[str] = None,
+                 host: Optional[str] = None, hydrate_from: Any = None, index: Optional[FakePineconeIndex] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.pc = None
+        self.index = index if index is not None else FakePineconeIndex([])
+        self.namespace = namespace
+        self.hydrate_from = hydrate_from
+        self.timeout = timeout
@@ -0,0 +1,345 @@
+"""
+Prueba de carga concurrente de la API real bajo uvicorn.
+
+    python -m benchmarks.loadtest --size 42k --rate 50 --duration 20 \
+        --pinecone-latency-ms 40 --ollama-error-rate 0.01 --output loadtest_results.json
+
+Levanta en procesos aparte los stand-ins HTTP de Ollama y Pinecone (benchmarks.standins)
+y la app (benchmarks.loadtest_app) apuntando a ellos vía OLLAMA_BASE_URL y PINECONE_HOST.
+Después genera tráfico en lazo abierto (llegadas de Poisson a la tasa pedida, sin esperar
+respuestas) por escenario: literal, semantic, documents, upsert y mixed. La latencia se mide
+desde el instante programado de cada petición, así las colas del servidor no se ocultan.
+Por escenario reporta throughput, errores, percentiles, histograma de latencias y el retraso
+del event loop de la app medido por la sonda de /__loadtest/lag.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+
+from benchmarks.corpus import ensure_corpus, parse_size
+from benchmarks.stats import histogram, summarize
+
+SCENARIOS = ("literal", "semantic", "documents", "upsert", "mixed")
+DEFAULT_MIX = "literal=5,semantic=2,documents=2,upsert=1"
+
+
+# =============== procesos ===============
+
+def _spawn(module_app: str, port: int, env: Dict[str, str], factory: bool = False, workers: int = 1) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", module_app, "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--workers", str(workers)]
+    if factory:
+        cmd.append("--factory")
+    return subprocess.Popen(cmd, env={**os.environ, **env})
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"El proceso de {url} terminó con código {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió en {timeout:.0f}s")
+
+
+class Stack:
+    """
+    Stand-ins + app bajo prueba; se detienen juntos al salir.
+    """
+    def __init__(self, args: argparse.Namespace, corpus_path: str, workdir: str):
+        self.args = args
+        self.corpus_path = corpus_path
+        self.workdir = workdir
+        self.procs: List[subprocess.Popen] = []
+        self.app_url = f"http://127.0.0.1:{args.app_port}"
+        self.ollama_url = f"http://127.0.0.1:{args.ollama_port}"
+        self.pinecone_url = f"http://127.0.0.1:{args.pinecone_port}"
+
+    def __enter__(self) -> "Stack":
+        a = self.args
+        try:
+            ollama = _spawn("benchmarks.standins:create_app", a.ollama_port, {
+                "STANDIN_KIND": "ollama",
+                "STANDIN_LATENCY_MS": str(a.ollama_latency_ms),
+                "STANDIN_JITTER_MS": str(a.ollama_jitter_ms),
+                "STANDIN_ERROR_RATE": str(a.ollama_error_rate),
+                "STANDIN_SEED": str(a.seed),
+            }, factory=True)
+            self.procs.append(ollama)
+            pinecone = _spawn("benchmarks.standins:create_app", a.pinecone_port, {
+                "STANDIN_KIND": "pinecone",
+                "STANDIN_LATENCY_MS": str(a.pinecone_latency_ms),
+                "STANDIN_JITTER_MS": str(a.pinecone_jitter_ms),
+                "STANDIN_ERROR_RATE": str(a.pinecone_error_rate),
+                "STANDIN_CORPUS": self.corpus_path,
+                "STANDIN_SEED": str(a.seed),
+            }, factory=True)
+            self.procs.append(pinecone)
+            _wait_ready(self.ollama_url + "/__standin/stats", ollama, 60)
+            _wait_ready(self.pinecone_url + "/__standin/stats", pinecone, 300)
+
+            # La app escribe documentos sobre una copia del corpus
+            docs_path = os.path.join(self.workdir, "documents.jsonl")
+            shutil.copyfile(self.corpus_path, docs_path)
+            app = _spawn("benchmarks.loadtest_app:app", a.app_port, {
+                "JSONL_PATH": self.corpus_path,
+                "CORPUS_PATH": docs_path,
+                "OLLAMA_BASE_URL": self.ollama_url + "/api/embeddings",
+                "OLLAMA_LLM_URL": self.ollama_url + "/api/generate",
+                "PINECONE_API_KEY": "loadtest",
+                "PINECONE_HOST": self.pinecone_url,
+            }, workers=a.workers)
+            self.procs.append(app)
+            _wait_ready(self.app_url + "/api/v1/health", app, 900)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for proc in self.procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+# =============== tráfico ===============
+
+class Workload:
+    """
+    Construye peticiones de cada tipo a partir de una muestra del corpus.
+    """
+    def __init__(self, corpus_path: str, seed: int, sample_size: int = 2000, top_k: int = 10):
+        self.rng = random.Random(seed)
+        self.top_k = top_k
+        self.docs = self._sample(corpus_path, sample_size)
+        self.total = self._count
+        if not self.docs:
+            raise ValueError(f"Corpus vacío: {corpus_path}")
+
+    def _sample(self, corpus_path: str, k: int) -> List[Dict[str, Any]]:
+        # Muestreo de reservorio: una pasada y memoria acotada
+        sample: List[Dict[str, Any]] = []
+        n = 0
+        with open(corpus_path, "rb") as f:
+            for n, line in enumerate(f, 1):
+                if len(sample) < k:
+                    sample.append(orjson.loads(line))
+                else:
+                    j = self.rng.randrange(n)
+                    if j < k:
+                        sample[j] = orjson.loads(line)
+        self._count = n
+        return sample
+
+    def _doc(self) -> Dict[str, Any]:
+        return self.rng.choice(self.docs)
+
+    def literal(self) -> Tuple[str, str, Any]:
+        doc = self._doc()
+        words = doc["text"].rstrip(".").split()
+        kind = self.rng.randrange(3)
+        if kind == 0:
+            q = self.rng.choice(words)
+        elif kind == 1:
+            start = self.rng.randrange(max(1, len(words) - 2))
+            q = '"' + " ".join(words[start:start + 2]) + '"'
+        else:
+            q = doc["metadata"]["reference"]
+        return "POST", "/api/v1/search", {"q": q, "top_k": self.top_k}
+
+    def semantic(self) -> Tuple[str, str, Any]:
+        words = self._doc()["text"].split()
+        return "POST", "/api/v1/search", {"q": " ".join(words[:6]), "top_k": self.top_k, "mode": "semantic"}
+
+    def documents(self) -> Tuple[str, str, Any]:
+        doc = self._doc()
+        r = self.rng.random()
+        if r < 0.6:
+            return "GET", f"/api/v1/documents/{doc['id']}", None
+        if r < 0.9:
+            offset = self.rng.randrange(max(1, self.total - 20))
+            return "GET", f"/api/v1/documents?limit=20&offset={offset}", None
+        return "POST", "/api/v1/documents", {"id": doc["id"], "text": doc["text"], "metadata": doc["metadata"]}
+
+    def upsert(self) -> Tuple[str, str, Any]:
+        items = [{"id": d["id"], "text": d["text"], "metadata": d["metadata"]}
+                 for d in (self._doc() for _ in range(8))]
+        return "POST", "/api/v1/embeddings/upsert", {"items": items}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS or name == "mixed":
+            raise ValueError(f"Tipo de tráfico desconocido en --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run_phase(client: httpx.AsyncClient, workload: Workload, mix: Dict[str, float], rate: float,
+                    duration: float, max_in_flight: int, rng: random.Random) -> Dict[str, Any]:
+    """
+    Lazo abierto: programa llegadas de Poisson durante duration segundos y lanza cada
+    petición en su instante, sin esperar a las anteriores.
+    """
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    latencies: Dict[str, List[float]] = {k: [] for k in kinds}
+    statuses: Dict[str, int] = {}
+    dropped = 0
+    in_flight: set = set()
+    loop = asyncio.get_running_loop()
+
+    async def send(kind: str, scheduled: float) -> None:
+        method, path, body = getattr(workload, kind)()
+        try:
+            resp = await client.request(method, path, json=body)
+            await resp.aread()
+            key = str(resp.status_code)
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        latencies[kind].append(loop.time() - scheduled)
+        statuses[key] = statuses.get(key, 0) + 1
+
+    start = loop.time()
+    next_at = start
+    while True:
+        next_at += rng.expovariate(rate)
+        if next_at - start >= duration:
+            break
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(send(rng.choices(kinds, weights)[0], next_at))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    wall = loop.time() - start
+
+    all_latencies = [v for vs in latencies.values() for v in vs]
+    errors = sum(c for s, c in statuses.items() if not s.startswith(("2", "4")))
+    result = summarize(all_latencies, wall)
+    result.update({
+        "offered_rate": rate,
+        "errors": errors,
+        "dropped": dropped,
+        "status_codes": statuses,
+        "histogram": histogram(all_latencies),
+    })
+    if len(kinds) > 1:
+        result["by_kind"] = {k: summarize(v, wall) for k, v in latencies.items()}
+    return result
+
+
+async def run_scenarios(stack: Stack, workload: Workload, args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=stack.app_url, timeout=args.timeout, limits=limits) as client, \
+            httpx.AsyncClient(timeout=10) as control:
+        for name in args.scenarios.split(","):
+            name = name.strip()
+            phase_mix = mix if name == "mixed" else {name: 1.0}
+            await control.get(stack.app_url + "/__loadtest/lag", params={"reset": "true"})
+            before = await _standin_stats(control, stack)
+            result = await run_phase(client, workload, phase_mix, args.rate, args.duration, args.max_in_flight, rng)
+            result["event_loop_lag"] = (await control.get(stack.app_url + "/__loadtest/lag", params={"reset": "true"})).json()
+            after = await _standin_stats(control, stack)
+            result["standins"] = {
+                k: {m: after[k][m] - before[k][m] for m in after[k]} for k in after
+            }
+            results[name] = result
+            lag = result["event_loop_lag"]
+            print(f"[{name}] {result['throughput']:.1f} req/s p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+                  f"errores={result['errors']} descartadas={result['dropped']} "
+                  f"lag p99={lag['p99_ms']}ms max={lag['max_ms']}ms", file=sys.stderr)
+            await asyncio.sleep(args.cooldown)
+    return results
+
+
+async def _standin_stats(control: httpx.AsyncClient, stack: Stack) -> Dict[str, Dict[str, int]]:
+    out = {}
+    for name, url in (("ollama", stack.ollama_url), ("pinecone", stack.pinecone_url)):
+        out[name] = (await control.get(url + "/__standin/stats")).json()
+    return out
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="Prueba de carga de apicone")
+    p.add_argument("--size", default="42k", help="Tamaño del corpus sintético (42k, 250k, 1m o número)")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Escenarios separados por coma: {', '.join(SCENARIOS)}")
+    p.add_argument("--mix", default=DEFAULT_MIX, help="Pesos del escenario mixed")
+    p.add_argument("--rate", type=float, default=50.0, help="Peticiones por segundo ofrecidas (lazo abierto)")
+    p.add_argument("--duration", type=float, default=20.0, help="Segundos por escenario")
+    p.add_argument("--cooldown", type=float, default=2.0, help="Pausa entre escenarios")
+    p.add_argument("--max-in-flight", type=int, default=1000, help="Peticiones simultáneas máximas; el exceso se descarta y se cuenta")
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--workers", type=int, default=1, help="Workers de uvicorn (la sonda de lag mide uno)")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--app-port", type=int, default=18000)
+    p.add_argument("--ollama-port", type=int, default=18434)
+    p.add_argument("--pinecone-port", type=int, default=18435)
+    p.add_argument("--ollama-latency-ms", type=float, default=15.0)
+    p.add_argument("--ollama-jitter-ms", type=float, default=5.0)
+    p.add_argument("--ollama-error-rate", type=float, default=0.0)
+    p.add_argument("--pinecone-latency-ms", type=float, default=25.0)
+    p.add_argument("--pinecone-jitter-ms", type=float, default=10.0)
+    p.add_argument("--pinecone-error-rate", type=float, default=0.0)
+    p.add_argument("--workdir", default=".bench")
+    p.add_argument("--output", default="loadtest_results.json")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    unknown = [s for s in args.scenarios.split(",") if s.strip() not in SCENARIOS]
+    if unknown:
+        print(f"Escenarios desconocidos: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    n = parse_size(args.size)
+    corpus_path = os.path.abspath(ensure_corpus(os.path.join(args.workdir, "corpus"), n, args.seed))
+    workdir = os.path.abspath(os.path.join(args.workdir, f"loadtest-{n}"))
+    os.makedirs(workdir, exist_ok=True)
+    workload = Workload(corpus_path, args.seed, top_k=args.top_k)
+    with Stack(args, corpus_path, workdir) as stack:
+        results = asyncio.run(run_scenarios(stack, workload, args))
+    report = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "size": n, "args": vars(args)},
+        "results": results,
+    }
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"Resultados en {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+App bajo prueba para benchmarks.loadtest: la misma src.main:app más una sonda de
+retraso del event loop expuesta en GET /__loadtest/lag.
+
+La sonda duerme intervalos cortos y registra cuánto tarda el loop en despertarla;
+cualquier llamada bloqueante dentro de un handler async aparece como retraso.
+"""
+
+import asyncio
+from typing import List, Optional
+
+from benchmarks.stats import summarize
+from src.main import app
+
+
+class LagProbe:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - t0 - self.interval))
+
+    def snapshot(self, reset: bool = False) -> dict:
+        samples, total = self.samples, self.interval * len(self.samples)
+        if reset:
+            self.samples = []
+        summary = summarize(samples, total)
+        out = {k: summary[k] for k in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")}
+        out["samples"] = summary["ops"]
+        return out
+
+
+lag_probe = LagProbe()
+
+
+@app.get("/__loadtest/lag", include_in_schema=False)
+async def loadtest_lag(reset: bool = False):
+    lag_probe.ensure_started()
+    return lag_probe.snapshot(reset)
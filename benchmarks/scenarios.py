@@ -0,0 +1,300 @@
+"""
+Escenarios de benchmark. Cada escenario prepara su estado y devuelve una operación
+(síncrona o async) que el runner ejecuta repetidamente midiendo su latencia.
+
+Los escenarios de API llaman a los handlers de src.api.search en proceso, con Ollama y
+Pinecone sustituidos por los dobles de benchmarks.fakes.
+"""
+
+import os
+import random
+import resource
+import shutil
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fakes import FakeEmbedder, FakePineconeAdapter, FakePineconeIndex, Latency
+from benchmarks.stats import summarize
+
+
+@dataclass
+class BenchConfig:
+    corpus_path: str
+    workdir: str
+    duration: float = 5.0
+    max_ops: int = 2000
+    min_ops: int = 1
+    warmup: int = 5
+    seed: int = 1
+    top_k: int = 10
+    ollama_latency_ms: float = 15.0
+    ollama_jitter_ms: float = 5.0
+    pinecone_latency_ms: float = 25.0
+    pinecone_jitter_ms: float = 10.0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+class Context:
+    """
+    Estado perezoso compartido por los escenarios de un mismo proceso.
+    """
+    def __init__(self, config: BenchConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self._api = None
+
+    @property
+    def api(self):
+        if self._api is None:
+            self._api = load_api(self.config)
+        return self._api
+
+    @property
+    def index_service(self):
+        return self.api.index_service
+
+    def sample_ordinals(self, k: int) -> List[int]:
+        n = len(self.index_service.doc_ids)
+        return [self.rng.randrange(n) for _ in range(k)]
+
+    def use_fake_pinecone(self) -> FakePineconeIndex:
+        api = self.api
+        if not api.pinecone_adapter.index.records:
+            api.pinecone_adapter.index = FakePineconeIndex.from_corpus(
+                self.config.corpus_path,
+                Latency(self.config.pinecone_latency_ms, self.config.pinecone_jitter_ms, self.config.seed),
+            )
+        return api.pinecone_adapter.index
+
+
+def load_api(config: BenchConfig):
+    """
+    Importa src.api.search contra el corpus sintético y con los dobles de Ollama y Pinecone.
+    """
+    os.environ["JSONL_PATH"] = config.corpus_path
+    os.environ["CORPUS_PATH"] = config.corpus_path
+    import src.adapters.pinecone_adapter as pinecone_adapter_module
+    pinecone_adapter_module.PineconeAdapter = FakePineconeAdapter
+    import src.api.search as api
+    embedder = FakeEmbedder(Latency(config.ollama_latency_ms, config.ollama_jitter_ms, config.seed))
+    api.embedder = embedder
+    api.search_usecase.embedder = embedder
+    return api
+
+
+# =============== escenarios ===============
+
+def index_build(ctx: Context) -> Callable:
+    from src.services.inverted_index import InvertedIndexService
+    index_path = os.path.join(ctx.config.workdir, "build.idx")
+
+    def op():
+        for path in (index_path, index_path + ".cols"):
+            if os.path.exists(path):
+                os.remove(path)
+        InvertedIndexService(jsonl_path=ctx.config.corpus_path, index_path=index_path)
+    return op
+
+
+def index_load(ctx: Context) -> Callable:
+    from src.services.inverted_index import InvertedIndexService
+    index_path = os.path.join(ctx.config.workdir, "load.idx")
+    if not os.path.exists(index_path + ".cols"):
+        InvertedIndexService(jsonl_path=ctx.config.corpus_path, index_path=index_path)
+
+    def op():
+        InvertedIndexService(jsonl_path=ctx.config.corpus_path, index_path=index_path)
+    return op
+
+
+def _search_op(ctx: Context, queries: List[str], mode: str = "literal") -> Callable:
+    api = ctx.api
+    requests = [api.SearchRequest(q=q, top_k=ctx.config.top_k, mode=mode) for q in queries]
+    state = {"i": 0}
+
+    async def op():
+        req = requests[state["i"] % len(requests)]
+        state["i"] += 1
+        await api.search_endpoint(req)
+    return op
+
+
+def literal_token(ctx: Context) -> Callable:
+    idx = ctx.index_service
+    queries = []
+    for o in ctx.sample_ordinals(500):
+        words = idx.tokenize_words(idx.text(o))
+        queries.append(ctx.rng.choice(words))
+    return _search_op(ctx, queries)
+
+
+def literal_phrase(ctx: Context) -> Callable:
+    idx = ctx.index_service
+    queries = []
+    for o in ctx.sample_ordinals(500):
+        words = idx.text(o).rstrip(".").split()
+        n = ctx.rng.randint(2, 3)
+        start = ctx.rng.randrange(max(1, len(words) - n))
+        queries.append('"' + " ".join(words[start:start + n]) + '"')
+    return _search_op(ctx, queries)
+
+
+def literal_reference(ctx: Context) -> Callable:
+    idx = ctx.index_service
+    queries = []
+    for o in ctx.sample_ordinals(500):
+        ref = idx.ref(o)
+        book, _, cv = ref.rpartition(" ")
+        chapter, _, verse = cv.partition(":")
+        kind = ctx.rng.randrange(3)
+        if kind == 0:
+            queries.append(ref)
+        elif kind == 1:
+            queries.append(f"{book} {chapter}")
+        else:
+            queries.append(f"{book} {chapter}:{verse}-{int(verse) + 5}")
+    return _search_op(ctx, queries)
+
+
+def semantic(ctx: Context) -> Callable:
+    ctx.use_fake_pinecone()
+    idx = ctx.index_service
+    queries = [" ".join(idx.text(o).split()[:6]) for o in ctx.sample_ordinals(200)]
+    return _search_op(ctx, queries, mode="semantic")
+
+
+def document_get(ctx: Context) -> Callable:
+    api = ctx.api
+    ids = [ctx.index_service.doc_ids[o] for o in ctx.sample_ordinals(500)]
+    state = {"i": 0}
+
+    async def op():
+        vid = ids[state["i"] % len(ids)]
+        state["i"] += 1
+        await api.get_document_by_id(vid)
+    return op
+
+
+def document_list(ctx: Context) -> Callable:
+    api = ctx.api
+    n = len(ctx.index_service.doc_ids)
+    offsets = [ctx.rng.randrange(max(1, n - 20)) for _ in range(500)]
+    state = {"i": 0}
+
+    async def op():
+        offset = offsets[state["i"] % len(offsets)]
+        state["i"] += 1
+        await api.list_documents(limit=20, offset=offset)
+    return op
+
+
+def document_write(ctx: Context) -> Callable:
+    api = ctx.api
+    # Se escribe sobre una copia para no alterar el corpus compartido
+    copy_path = os.path.join(ctx.config.workdir, "write-" + os.path.basename(ctx.config.corpus_path))
+    shutil.copyfile(ctx.config.corpus_path, copy_path)
+    api.CORPUS_PATH = copy_path
+    idx = ctx.index_service
+    ordinals = ctx.sample_ordinals(200)
+    state = {"i": 0}
+
+    async def op():
+        o = ordinals[state["i"] % len(ordinals)]
+        state["i"] += 1
+        req = api.DocumentCreateRequest(id=idx.doc_ids[o], text=idx.text(o), metadata={"reference": idx.ref(o)})
+        await api.create_or_update_document(req)
+    return op
+
+
+def upsert(ctx: Context) -> Callable:
+    ctx.use_fake_pinecone()
+    api = ctx.api
+    idx = ctx.index_service
+    batch = ctx.config.extra.get("upsert_batch", 16)
+    batches = []
+    for _ in range(50):
+        items = [
+            api.EmbeddingUpsertItem(id=idx.doc_ids[o], text=idx.text(o), metadata={"reference": idx.ref(o)})
+            for o in ctx.sample_ordinals(batch)
+        ]
+        batches.append(api.EmbeddingUpsertRequest(items=items))
+    state = {"i": 0}
+
+    async def op():
+        req = batches[state["i"] % len(batches)]
+        state["i"] += 1
+        await api.embeddings_upsert_endpoint(req)
+    return op
+
+
+SCENARIOS: Dict[str, Callable[[Context], Callable]] = {
+    "index_build": index_build,
+    "index_load": index_load,
+    "literal_token": literal_token,
+    "literal_phrase": literal_phrase,
+    "literal_reference": literal_reference,
+    "document_get": document_get,
+    "document_list": document_list,
+    "document_write": document_write,
+    "upsert": upsert,
+    "semantic": semantic,
+}
+
+# Escenarios caros: sin calentamiento (cada operación ya dura segundos en corpus grandes)
+NO_WARMUP = {"index_build", "index_load", "document_write"}
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB; macOS, bytes
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+async def _measure(op: Callable, config: BenchConfig, warmup: int) -> Dict[str, Any]:
+    import inspect
+    is_async = inspect.iscoroutinefunction(op)
+    for _ in range(warmup):
+        await op() if is_async else op()
+    latencies: List[float] = []
+    started = time.perf_counter()
+    deadline = started + config.duration
+    while len(latencies) < config.max_ops and (len(latencies) < config.min_ops or time.perf_counter() < deadline):
+        t0 = time.perf_counter()
+        if is_async:
+            await op()
+        else:
+            op()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_scenario(name: str, config: BenchConfig, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """
+    Ejecuta un escenario y devuelve su resumen (throughput, percentiles, RSS pico del proceso
+    y, si el escenario cargó la API, bytes del índice en memoria según memory_report).
+    """
+    import asyncio
+    ctx = ctx or Context(config)
+    op = SCENARIOS[name](ctx)
+    warmup = 0 if name in NO_WARMUP else config.warmup
+    result = asyncio.run(_measure(op, config, warmup))
+    result["peak_rss_mb"] = peak_rss_mb()
+    if ctx._api is not None and ctx.index_service is not None:
+        report = ctx.index_service.memory_report()
+        result["index_mb"] = round(sum(report.values()) / (1024 * 1024), 1)
+        result["index_bytes"] = report
+    return result
+
+
+def scenario_child(name: str, config: Dict[str, Any], conn) -> None:
+    """
+    Punto de entrada del subproceso aislado: envía el resumen (o el error) por conn.
+    """
+    try:
+        conn.send(run_scenario(name, BenchConfig(**config)))
+    except Exception as e:  # el error queda registrado en el resultado del escenario
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
@@ -0,0 +1,161 @@
+"""
+Servidores HTTP locales que sustituyen a Ollama y Pinecone en las pruebas de carga.
+
+Se levantan con uvicorn como apps de fábrica, configuradas por variables de entorno:
+
+    STANDIN_KIND=ollama|pinecone
+    STANDIN_LATENCY_MS, STANDIN_JITTER_MS   latencia base + jitter uniforme por petición
+    STANDIN_ERROR_RATE                      fracción de peticiones que responden 503
+    STANDIN_CORPUS                          JSONL de donde salen ids y metadatos (pinecone)
+    STANDIN_SEED
+
+    uvicorn --factory benchmarks.standins:create_app --port 18434
+
+Ollama: POST /api/embeddings, POST /api/embed, POST /api/generate.
+Pinecone (API REST de datos, la que usa el cliente con host explícito): POST /query,
+POST /vectors/upsert, GET /vectors/fetch, POST /describe_index_stats.
+La latencia se simula con asyncio.sleep, así el stand-in nunca es el cuello de botella.
+"""
+
+import asyncio
+import os
+import random
+from typing import Any, List
+
+import orjson
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import Response
+
+from benchmarks.fakes import FakePineconeIndex, fake_vector
+
+
+class Behaviour:
+    """
+    Latencia, jitter y tasa de errores inyectados; cuenta peticiones y errores.
+    """
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> "Behaviour":
+        return cls(
+            latency_ms=float(os.getenv("STANDIN_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("STANDIN_JITTER_MS", "0")),
+            error_rate=float(os.getenv("STANDIN_ERROR_RATE", "0")),
+            seed=int(os.getenv("STANDIN_SEED", "1")),
+        )
+
+    async def apply(self) -> bool:
+        """
+        Espera la latencia simulada. Devuelve False si esta petición debe fallar.
+        """
+        self.requests += 1
+        delay = self.latency_ms + (self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay:
+            await asyncio.sleep(delay / 1000.0)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return False
+        return True
+
+
+def _json(data: Any, status_code: int = 200) -> Response:
+    return Response(content=orjson.dumps(data), media_type="application/json", status_code=status_code)
+
+
+_INJECTED = {"error": "error inyectado por el stand-in"}
+
+
+def _add_stats_route(app: FastAPI, behaviour: Behaviour) -> None:
+    @app.get("/__standin/stats")
+    async def stats():
+        return _json({"requests": behaviour.requests, "errors": behaviour.errors})
+
+
+def create_ollama_app(behaviour: Behaviour, dim: int = 768) -> FastAPI:
+    app = FastAPI(title="ollama-standin")
+    _add_stats_route(app, behaviour)
+
+    @app.post("/api/embeddings")
+    async def embeddings(request: Request):
+        body = orjson.loads(await request.body())
+        if not await behaviour.apply():
+            return _json(_INJECTED, 503)
+        return _json({"embedding": fake_vector(body.get("prompt", ""), dim)})
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = orjson.loads(await request.body())
+        if not await behaviour.apply():
+            return _json(_INJECTED, 503)
+        inputs = body.get("input", "")
+        texts: List[str] = inputs if isinstance(inputs, list) else [inputs]
+        return _json({"model": body.get("model"), "embeddings": [fake_vector(t, dim) for t in texts]})
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        await request.body()
+        if not await behaviour.apply():
+            return _json(_INJECTED, 503)
+        return _json({"model": "standin", "response": "[0]", "done": True})
+
+    return app
+
+
+def create_pinecone_app(behaviour: Behaviour, index: FakePineconeIndex, dim: int = 768) -> FastAPI:
+    app = FastAPI(title="pinecone-standin")
+    _add_stats_route(app, behaviour)
+
+    @app.post("/query")
+    async def query(request: Request):
+        body = orjson.loads(await request.body())
+        if not await behaviour.apply():
+            return _json(_INJECTED, 503)
+        res = index.query(
+            body.get("vector") or [],
+            top_k=body.get("topK", 10),
+            namespace=body.get("namespace"),
+            include_metadata=body.get("includeMetadata", False),
+        )
+        return _json(res)
+
+    @app.post("/vectors/upsert")
+    async def upsert(request: Request):
+        body = orjson.loads(await request.body())
+        if not await behaviour.apply():
+            return _json(_INJECTED, 503)
+        return _json({"upsertedCount": index.upsert(body.get("vectors") or [])["upserted_count"]})
+
+    @app.get("/vectors/fetch")
+    async def fetch(ids: List[str] = Query(default=[]), namespace: str = ""):
+        if not await behaviour.apply():
+            return _json(_INJECTED, 503)
+        vectors = index.fetch(ids)["vectors"]
+        return _json({
+            "vectors": {vid: {"id": vid, "values": fake_vector(vid, dim), "metadata": r["metadata"]} for vid, r in vectors.items()},
+            "namespace": namespace,
+        })
+
+    @app.post("/describe_index_stats")
+    async def describe_index_stats():
+        return _json({"dimension": dim, "totalVectorCount": len(index.records), "namespaces": {}})
+
+    return app
+
+
+def create_app() -> FastAPI:
+    """
+    Fábrica para uvicorn --factory; el tipo de stand-in sale de STANDIN_KIND.
+    """
+    behaviour = Behaviour.from_env()
+    kind = os.getenv("STANDIN_KIND", "ollama")
+    if kind == "pinecone":
+        corpus = os.getenv("STANDIN_CORPUS")
+        index = FakePineconeIndex.from_corpus(corpus) if corpus else FakePineconeIndex([])
+        return create_pinecone_app(behaviour, index)
+    return create_ollama_app(behaviour)
@@ -0,0 +1,81 @@
+"""
+Resumen de latencias y comparación contra una línea base guardada.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+from src.infra.metrics import percentile
+
+# Métricas comparadas: (clave, True si más alto es mejor)
+COMPARED_METRICS = (
+    ("throughput", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("peak_rss_mb", False),
+    ("index_mb", False),
+)
+
+
+def summarize(latencies: List[float], wall_seconds: float) -> Dict[str, Any]:
+    """
+    Throughput (ops/s) y percentiles en milisegundos a partir de latencias en segundos.
+    """
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000.0, 3)
+    return {
+        "ops": len(values),
+        "seconds": round(wall_seconds, 3),
+        "throughput": round(len(values) / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        "mean_ms": ms(sum(values) / len(values)) if values else 0.0,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+    }
+
+
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def histogram(latencies: List[float], bounds_ms: Sequence[float] = HISTOGRAM_BOUNDS_MS) -> List[Dict[str, Any]]:
+    """
+    Cuenta latencias (en segundos) por cubeta "hasta le_ms" (no acumulada); la última es +Inf.
+    """
+    counts = [0] * (len(bounds_ms) + 1)
+    for v in latencies:
+        ms = v * 1000.0
+        i = 0
+        while i < len(bounds_ms) and ms > bounds_ms[i]:
+            i += 1
+        counts[i] += 1
+    labels = [str(b) for b in bounds_ms] + ["+Inf"]
+    return [{"le_ms": label, "count": c} for label, c in zip(labels, counts)]
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Devuelve las regresiones: métricas que empeoran más de tolerance (fracción) respecto
+    a la línea base, para cada escenario presente en ambos resultados.
+    """
+    regressions = []
+    base_results = baseline.get("results", {})
+    for key, cur in current.get("results", {}).items():
+        base = base_results.get(key)
+        if not base or cur.get("error") or base.get("error"):
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            old, new = base.get(metric), cur.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append({
+                    "scenario": key,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change_pct": round(change * 100.0, 1),
+                })
+    return regressions
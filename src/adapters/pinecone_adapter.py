@@ -1,29 +1,110 @@
 from pinecone import Pinecone, ServerlessSpec
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Protocol, Sequence, Tuple
+
+from src.infra.metrics import stage
+
+# Ids por llamada a fetch (van en la query string)
+FETCH_BATCH = 100
+# Plazo por defecto de cada llamada HTTP, en segundos (no mayor que el del BackendGuard de Pinecone)
+DEFAULT_TIMEOUT = 5.0
+
+
+class LocalDocuments(Protocol):
+    def documents(self, ids: Sequence[str]) -> Dict[str, Tuple[str, str, Dict[str, Any]]]: ...
+
 
 class PineconeAdapter:
-    def __init__(self, api_key: str, environment: str, index_name: str, namespace: Optional[str] = None):
+    """
+    Consultas vectoriales a Pinecone.
+    Con hydrate_from (p. ej. InvertedIndexService) las consultas piden solo ids y scores y el
+    texto, la referencia y los metadatos se completan en bloque desde el corpus local (mismos
+    campos que guarda Pinecone: metadatos del JSONL más contenido); los ids que no estén en
+    local se completan con fetch a Pinecone.
+    Cada llamada lleva timeout (el indicado o el del adaptador): el cliente corta la petición HTTP y el
+    hilo que la ejecuta queda libre aunque quien espera ya haya abandonado por su plazo.
+    """
+    def __init__(self, api_key: str, environment: str, index_name: str, namespace: Optional[str] = None,
+                 host: Optional[str] = None, hydrate_from: Optional[LocalDocuments] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
         self.pc = Pinecone(api_key=api_key)
-        self.index = self.pc.Index(index_name)
+        # Con host explícito el cliente no consulta el plano de control para resolverlo
+        self.index = self.pc.Index(index_name, host=host) if host else self.pc.Index(index_name)
         self.namespace = namespace
+        self.hydrate_from = hydrate_from
+        self.timeout = timeout
 
-    def query(self, embedding: List[float], top_k: int = 10, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        res = self.index.query(
-            vector=embedding,
-            top_k=top_k,
-            namespace=self.namespace,
-            filter=filter or {},
-            include_metadata=True
-        )
+    def query(self, embedding: List[float], top_k: int = 10, filter: Optional[Dict[str, Any]] = None,
+              namespace: Optional[str] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        namespace sustituye al del adaptador; en otro namespace no se hidrata desde local
+        (hydrate_from corresponde al corpus del namespace propio).
+        """
+        namespace = namespace or self.namespace
+        id_only = self.hydrate_from is not None and namespace == self.namespace
+        timeout = self.timeout if timeout is None else timeout
+        with stage("pinecone"):
+            res = self.index.query(
+                vector=embedding,
+                top_k=top_k,
+                namespace=namespace,
+                filter=filter or {},
+                include_metadata=not id_only,
+                timeout=timeout
+            )
         matches = res.get("matches", [])
+        if id_only:
+            return self._hydrate(matches, timeout)
+        return [_result(m, m.get("metadata", {}) or {}) for m in matches]
+
+    def fetch_metadata(self, ids: Sequence[str], timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadatos de Pinecone por id (los ids inexistentes se omiten).
+        """
+        out: Dict[str, Dict[str, Any]] = {}
+        timeout = self.timeout if timeout is None else timeout
+        with stage("pinecone_fetch"):
+            for i in range(0, len(ids), FETCH_BATCH):
+                res = self.index.fetch(ids=list(ids[i:i + FETCH_BATCH]), namespace=self.namespace, timeout=timeout)
+                for vid, vector in (res.get("vectors") or {}).items():
+                    out[vid] = vector.get("metadata") or {}
+        return out
+
+    def fetch_vectors(self, ids: Sequence[str], timeout: Optional[float] = None) -> Dict[str, List[float]]:
+        """
+        Embeddings guardados en Pinecone por id (los ids inexistentes se omiten).
+        """
+        out: Dict[str, List[float]] = {}
+        timeout = self.timeout if timeout is None else timeout
+        with stage("pinecone_fetch"):
+            for i in range(0, len(ids), FETCH_BATCH):
+                res = self.index.fetch(ids=list(ids[i:i + FETCH_BATCH]), namespace=self.namespace, timeout=timeout)
+                for vid, vector in (res.get("vectors") or {}).items():
+                    out[vid] = list(vector.get("values") or [])
+        return out
+
+    def _hydrate(self, matches: List[Any], timeout: float) -> List[Dict[str, Any]]:
+        ids = [m.get("id") for m in matches]
+        with stage("hydrate"):
+            local = self.hydrate_from.documents(ids)
+        missing = [vid for vid in ids if vid not in local]
+        remote = self.fetch_metadata(missing, timeout) if missing else {}
         out = []
         for m in matches:
-            md = m.get("metadata", {}) or {}
-            out.append({
-                "id": m.get("id"),
-                "ref": md.get("reference") or md.get("Referencia") or "",
-                "snippet": md.get("contenido") or "",
-                "score": m.get("score", 0.0),
-                "metadata": md
-            })
+            vid = m.get("id")
+            if vid in local:
+                ref, text, meta = local[vid]
+                md = {**meta, "reference": meta.get("reference") or ref, "contenido": text}
+            else:
+                md = remote.get(vid, {})
+            out.append(_result(m, md))
         return out
+
+
+def _result(match: Any, md: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": match.get("id"),
+        "ref": md.get("reference") or md.get("Referencia") or "",
+        "snippet": md.get("contenido") or "",
+        "score": match.get("score", 0.0),
+        "metadata": md
+    }
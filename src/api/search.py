@@ -1,10 +1,29 @@
-from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi import APIRouter, HTTPException, Query, Body, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Iterator
 from src.usecases.search_usecase import SearchUseCase
+from src.adapters.pinecone_adapter import PineconeAdapter
+from src.services.embedder_ollama import OllamaEmbedder
 from src.services.inverted_index import InvertedIndexService
+from src.services.metadata_index import extract_fields, record_matches, validate_filters
+from src.services.pagination import SnapshotStore
+from src.services.related import RelatedIndex
+from src.services.shards import ShardSpec, ShardedSearch, parse_shard_specs
+from src.api.serialization import FragmentCache, batch_response, iter_encoded, json_response, search_response
+from src.infra.metrics import (
+    CACHE_HITS, CACHE_MISSES, COALESCE_CALLS, COALESCE_COLLAPSED, INDEX_SIZE, SHARDS_LOADED, current_timings, stage,
+)
+from src.infra.profiling import SlowQueryLog, StackSampler
+from src.infra.resilience import BackendGuard, BackendUnavailable, CircuitBreaker, request_budget
+from src.infra.singleflight import SingleFlight
+import asyncio
+import logging
+import orjson
 import os
+import threading
+import time
 from datetime import datetime
 import uuid
 import re
@@ -17,10 +36,21 @@ class SearchRequest(BaseModel):
     Permite búsqueda literal o semántica, con filtros y paginación.
     """
     q: str = Field(..., description="Consulta de búsqueda")
-    filters: Optional[Dict[str, Any]] = Field(None, description="Filtros opcionales")
+    filters: Optional[Dict[str, Any]] = Field(None, description="Filtros de metadatos, p. ej. {\"book\": \"Alma\", \"chapter\": {\"gte\": 30}}")
     top_k: Optional[int] = Field(10, description="Número máximo de resultados")
     model_config: ClassVar[ConfigDict] = ConfigDict(extra="allow")
     mode: Optional[str] = Field("literal", description="Modo de búsqueda: 'literal' o 'semantic'")
+    explain: Optional[bool] = Field(False, description="Incluir el plan de ejecución y cardinalidades por operador")
+    paginate: Optional[bool] = Field(False, description="Devolver next_cursor para pedir la página siguiente")
+    search_after: Optional[str] = Field(None, description="Cursor opaco (next_cursor de la página anterior)")
+    shards: Optional[List[str]] = Field(None, description="Corpus (shards) donde buscar, p. ej. [\"es\", \"en\"]; por defecto solo el principal")
+    profile: Optional[bool] = Field(False, description="Incluir un perfil por muestreo de pilas de la petición (requiere X-Admin-Key)")
+
+class SearchBatchRequest(BaseModel):
+    """
+    Lote de búsquedas; cada una con el mismo formato que /search.
+    """
+    queries: List[SearchRequest] = Field(..., description="Consultas a ejecutar, en orden")
 
 class SearchResult(BaseModel):
     """
@@ -39,12 +69,15 @@ class SearchResponse(BaseModel):
 router = APIRouter(prefix="/api/v1", tags=["search"])
 
 # Inicialización de adaptadores para búsqueda semántica
-from src.services.embedder_ollama import OllamaEmbedder
-from src.adapters.pinecone_adapter import PineconeAdapter
 
 jsonl_path = os.getenv("JSONL_PATH", "/app/versiculos.jsonl")
+# Corpus que leen y escriben los endpoints de documentos
+CORPUS_PATH = os.getenv("CORPUS_PATH", os.path.join(os.path.dirname(__file__), '../../versiculos.jsonl'))
 try:
-    index_service = InvertedIndexService(jsonl_path=jsonl_path)
+    index_service = InvertedIndexService(
+        jsonl_path=jsonl_path,
+        text_compression=os.getenv("INDEX_TEXT_COMPRESSION", "none")
+    )
     INDEX_STATUS = "ok"
 except FileNotFoundError:
     index_service = None
@@ -55,39 +88,353 @@ pinecone_api_key = os.getenv("PINECONE_API_KEY", "")
 pinecone_env = os.getenv("PINECONE_ENVIRONMENT", "us-east1-gcp")
 pinecone_index = os.getenv("PINECONE_INDEX", "escrituras")
 pinecone_namespace = os.getenv("PINECONE_NAMESPACE", "es")
+pinecone_host = os.getenv("PINECONE_HOST", "")
+# Consultas solo con ids y scores; texto y referencia desde el índice local
+pinecone_id_only = os.getenv("PINECONE_ID_ONLY", "false").lower() in ("1", "true", "yes")
+
+# Resiliencia: presupuesto por búsqueda, timeout por backend, circuito y hedging opcional
+SEARCH_BUDGET = float(os.getenv("SEARCH_BUDGET_MS", "8000")) / 1000.0
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+
+
+def _guard(name: str, timeout_ms: str) -> BackendGuard:
+    prefix = name.upper()
+    return BackendGuard(
+        name,
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT_MS", timeout_ms)) / 1000.0,
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv("BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+        ),
+        hedge=HEDGE_REQUESTS,
+        hedge_min_delay=float(os.getenv("HEDGE_MIN_DELAY_MS", "20")) / 1000.0
+    )
+
+
+ollama_guard = _guard("ollama", "10000")
+pinecone_guard = _guard("pinecone", "5000")
 
 embedder = OllamaEmbedder()
+# Timeout HTTP por llamada igual al del guard: la llamada no sobrevive al plazo que se espera por ella
 pinecone_adapter = PineconeAdapter(
     api_key=pinecone_api_key,
     environment=pinecone_env,
     index_name=pinecone_index,
-    namespace=pinecone_namespace
+    namespace=pinecone_namespace,
+    host=pinecone_host or None,
+    hydrate_from=index_service if pinecone_id_only else None,
+    timeout=pinecone_guard.timeout
 )
 
-search_usecase = SearchUseCase(index_service, embedder=embedder, pinecone_adapter=pinecone_adapter)
+search_usecase = SearchUseCase(
+    index_service,
+    embedder=embedder,
+    pinecone_adapter=pinecone_adapter,
+    snapshots=SnapshotStore(ttl_seconds=float(os.getenv("SEARCH_SNAPSHOT_TTL", "300"))),
+    snapshot_k=int(os.getenv("SEARCH_SNAPSHOT_K", "200")),
+    embed_guard=ollama_guard,
+    pinecone_guard=pinecone_guard
+)
 
+# Shards: SEARCH_SHARDS="en=/app/verses-en.jsonl,pt=/app/versiculos-pt.jsonl"; cada nombre es también
+# el namespace de Pinecone. El corpus principal (JSONL_PATH) es el shard PINECONE_NAMESPACE y no se expulsa.
+shard_specs = parse_shard_specs(os.getenv("SEARCH_SHARDS", ""))
+shard_specs.setdefault(pinecone_namespace, ShardSpec(pinecone_namespace, jsonl_path))
+sharded_search = ShardedSearch(
+    shard_specs,
+    executor=os.getenv("SHARD_EXECUTOR", "thread"),
+    workers=int(os.getenv("SHARD_WORKERS", "0")) or None,
+    max_loaded=int(os.getenv("SHARD_CACHE_SIZE", "4")),
+    text_compression=os.getenv("INDEX_TEXT_COMPRESSION", "none"),
+    semantic=search_usecase
+)
+if index_service is not None:
+    sharded_search.pin(pinecone_namespace, search_usecase)
+
+# Fragmentos JSON cacheados por versículo para las respuestas literales
+fragment_cache = FragmentCache(index_service, max_entries=int(os.getenv("FRAGMENT_CACHE_SIZE", "50000")))
+
+# Métricas de cachés e índice expuestas en /metrics
+CACHE_HITS.watch(lambda: fragment_cache.hits, cache="fragments")
+CACHE_MISSES.watch(lambda: fragment_cache.misses, cache="fragments")
+CACHE_HITS.watch(lambda: search_usecase.snapshots.hits, cache="semantic_snapshots")
+CACHE_MISSES.watch(lambda: search_usecase.snapshots.misses, cache="semantic_snapshots")
+CACHE_HITS.watch(lambda: sharded_search.hits, cache="shards")
+CACHE_MISSES.watch(lambda: sharded_search.misses, cache="shards")
+SHARDS_LOADED.callback = lambda: sharded_search.loaded
+
+# Coalescencia de búsquedas idénticas concurrentes (y, en el caso de uso, de embeddings)
+search_flight = SingleFlight()
+COALESCE_CALLS.watch(lambda: search_flight.calls, kind="search")
+COALESCE_COLLAPSED.watch(lambda: search_flight.collapsed, kind="search")
+COALESCE_CALLS.watch(lambda: search_usecase.embed_flight.calls, kind="embedding")
+COALESCE_COLLAPSED.watch(lambda: search_usecase.embed_flight.collapsed, kind="embedding")
+if index_service is not None:
+    INDEX_SIZE.set(len(index_service.doc_ids), kind="documents")
+    INDEX_SIZE.set(len(index_service.postings), kind="tokens")
+
+# Versículos relacionados precalculados (python -m src.services.related); sin el directorio no hay grafo
+RELATED_PATH = os.getenv("RELATED_PATH", "related")
+RELATED_LIMIT_MAX = int(os.getenv("RELATED_LIMIT_MAX", "50"))
+# Los upserts se acumulan en memoria y se guardan juntos RELATED_SAVE_DELAY segundos después del primero
+RELATED_SAVE_DELAY = float(os.getenv("RELATED_SAVE_DELAY", "30"))
+related_index: Optional[RelatedIndex] = RelatedIndex.load(RELATED_PATH) if RelatedIndex.exists(RELATED_PATH) else None
+_related_updates: set = set()
+_related_flush: Optional[asyncio.Task] = None
+related_logger = logging.getLogger("apicone.related")
+
+
+def _log_related_failure(task: asyncio.Task) -> None:
+    _related_updates.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        related_logger.error("Fallo actualizando el grafo de relacionados", exc_info=task.exception())
+
+
+async def flush_related() -> None:
+    """
+    Espera las actualizaciones del grafo en curso y guarda los cambios (también al apagar).
+    """
+    if related_index is None:
+        return
+    await asyncio.gather(*list(_related_updates), return_exceptions=True)
+    await asyncio.to_thread(related_index.flush)
+
+
+async def _flush_related_later() -> None:
+    await asyncio.sleep(RELATED_SAVE_DELAY)
+    await flush_related()
+
+# Superficie de administración (perfilado, consultas lentas): exige X-Admin-Key == ADMIN_API_KEY
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0
+slow_queries = SlowQueryLog(threshold_ms=float(os.getenv("SLOW_QUERY_MS", "500")))
+
+
+def _stage_ms(timings: List[Tuple[str, float]]) -> Dict[str, float]:
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds * 1000.0
+    return {name: round(ms, 3) for name, ms in merged.items()}
+
+
+def _require_admin(key: Optional[str]) -> None:
+    if not ADMIN_API_KEY or key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Se requiere X-Admin-Key válida")
+
+
+
+def _search_key(request: SearchRequest) -> bytes:
+    """
+    Clave de coalescencia: consulta con espacios normalizados más los parámetros que cambian el resultado.
+    """
+    return orjson.dumps([
+        " ".join(request.q.split()), request.mode or "literal", request.top_k or 10, request.filters,
+        bool(request.explain), bool(request.paginate), request.search_after, request.shards
+    ], option=orjson.OPT_SORT_KEYS)
+
+
+async def _run_search(request: SearchRequest, paginated: bool) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str], List[str]]:
+    """
+    Ejecuta la búsqueda con su presupuesto. Devuelve (resultados, plan, next_cursor, motivos de degradación).
+    """
+    plan = None
+    next_cursor = None
+    with request_budget(SEARCH_BUDGET) as budget:
+        if request.shards:
+            if paginated or request.explain:
+                raise ValueError("explain y la paginación no se admiten con shards")
+            results = await sharded_search.search(
+                request.q,
+                request.shards,
+                top_k=request.top_k or 10,
+                mode=request.mode or "literal",
+                filters=request.filters
+            )
+        elif paginated:
+            results, next_cursor = await search_usecase.search_page(
+                request.q,
+                top_k=request.top_k or 10,
+                mode=request.mode or "literal",
+                filters=request.filters,
+                cursor=request.search_after
+            )
+        elif request.explain:
+            results, plan = await search_usecase.explain(
+                request.q,
+                top_k=request.top_k or 10,
+                mode=request.mode or "literal",
+                filters=request.filters
+            )
+        else:
+            results = await search_usecase.search(
+                request.q,
+                top_k=request.top_k or 10,
+                mode=request.mode or "literal",
+                filters=request.filters
+            )
+    return results, plan, next_cursor, budget.degraded
 
-import asyncio
 
 @router.post("/search")
-async def search_endpoint(request: SearchRequest = Body(...)):
+async def search_endpoint(request: SearchRequest = Body(...), x_admin_key: Optional[str] = Header(None)):
     """
     Endpoint de búsqueda de versículos.
     Permite búsqueda literal o semántica sobre el corpus, con filtros y paginación.
     - q: consulta de texto
-    - filters: filtros opcionales
+    - filters: filtros de metadatos (volume, book, chapter, verse, language),
+      p. ej. {"book": "Alma", "chapter": {"gte": 30}}; operadores eq, ne, in, nin, gt, gte, lt, lte
     - top_k: número máximo de resultados
     - include_snippets: incluir fragmentos de texto
     - mode: 'literal' o 'semantic'
+    - explain: incluir el plan de ejecución de la consulta
+    - paginate / search_after: paginación por cursor; la respuesta incluye next_cursor
+    - profile: perfil por muestreo de pilas de la petición (requiere X-Admin-Key)
+    - shards: corpus donde buscar (SEARCH_SHARDS); se consultan en paralelo y se mezcla el top-k global
+    Las búsquedas idénticas concurrentes comparten una sola ejecución (single-flight).
+    Si Ollama o Pinecone no responden dentro del presupuesto (SEARCH_BUDGET_MS) o tienen el
+    circuito abierto, la búsqueda semántica se resuelve en modo literal y la respuesta incluye degraded.
+    Las búsquedas que superan SLOW_QUERY_MS quedan en el registro de consultas lentas.
+    En modo literal se admiten operadores: +obligatorio, -excluido, OR, paréntesis y varias "frases".
     Responde con lista de resultados y embedding de la consulta si aplica.
     """
-    results = await search_usecase.search(
-        request.q,
-        top_k=request.top_k or 10,
-        mode=request.mode or "literal"
-    )
-    results_serialized = [SearchResult(**r).model_dump() for r in results]
-    return {"results": results_serialized, "query_embedding": None}
+    paginated = bool(request.paginate or request.search_after)
+    sampler = None
+    if request.profile:
+        _require_admin(x_admin_key)
+        # Muestrea el hilo del event loop: la búsqueda corre en él entre awaits
+        sampler = StackSampler(PROFILE_INTERVAL, thread_id=threading.get_ident()).start()
+    start = time.perf_counter()
+    try:
+        if sampler is None:
+            results, plan, next_cursor, degraded = await search_flight.do(
+                _search_key(request), lambda: _run_search(request, paginated))
+        else:
+            # El perfil mide esta petición: no se une a otra idéntica en curso
+            results, plan, next_cursor, degraded = await _run_search(request, paginated)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    finally:
+        if sampler is not None:
+            sampler.stop()
+    slow_queries.record((time.perf_counter() - start) * 1000.0, {
+        "q": request.q,
+        "mode": request.mode or "literal",
+        "filters": request.filters,
+        "top_k": request.top_k,
+        "results": len(results),
+        "degraded": degraded or None,
+        "stages": _stage_ms(current_timings()),
+    })
+    extra: Dict[str, Any] = {}
+    if plan is not None:
+        extra["plan"] = plan
+    if degraded:
+        # Algún backend semántico no respondió: resultados literales en su lugar
+        extra["degraded"] = {"mode": "literal", "reasons": degraded}
+    if sampler is not None:
+        extra["profile"] = sampler.summary()
+    if paginated:
+        extra["next_cursor"] = next_cursor
+    # Los fragmentos cacheados son del corpus principal; los resultados con shard llevan su propia clave
+    cache = fragment_cache if (request.mode or "literal") != "semantic" or degraded else None
+    return search_response(results, cache=cache, **extra)
+
+
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "50"))
+
+
+def _batch_error(e: Exception) -> Dict[str, Any]:
+    if isinstance(e, ValueError):
+        return {"error": {"status": 400, "detail": str(e)}}
+    if isinstance(e, BackendUnavailable):
+        return {"error": {"status": 503, "detail": str(e)}}
+    return {"error": {"status": 500, "detail": f"{type(e).__name__}: {e}"}}
+
+
+@router.post("/search/batch")
+async def search_batch_endpoint(request: SearchBatchRequest = Body(...)):
+    """
+    Varias búsquedas en una sola petición (hasta SEARCH_BATCH_MAX).
+    - Las semánticas comparten una llamada de embeddings por lotes a Ollama y consultan Pinecone en paralelo.
+    - Las literales se ejecutan en paralelo sobre el índice local.
+    Responde {"items": [...]} en el mismo orden: cada item tiene la forma de la respuesta de /search
+    o {"error": {"status", "detail"}}; un error en una consulta no hace fallar el lote.
+    explain, paginate, search_after y profile no se admiten dentro de un lote.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    if len(request.queries) > SEARCH_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {SEARCH_BATCH_MAX} consultas por lote")
+    items: List[Optional[Dict[str, Any]]] = [None] * len(request.queries)
+    pending: List[int] = []
+    for i, q in enumerate(request.queries):
+        if q.explain or q.paginate or q.search_after or q.profile:
+            items[i] = _batch_error(ValueError("explain, paginate, search_after y profile no se admiten en lote"))
+        else:
+            pending.append(i)
+    with request_budget(SEARCH_BUDGET):
+        answers = await search_usecase.search_batch([
+            {
+                "query": request.queries[i].q,
+                "top_k": request.queries[i].top_k or 10,
+                "mode": request.queries[i].mode or "literal",
+                "filters": request.queries[i].filters
+            }
+            for i in pending
+        ])
+    for i, (results, error, degraded) in zip(pending, answers):
+        if error is not None:
+            items[i] = _batch_error(error)
+        else:
+            items[i] = {"results": results}
+            if degraded:
+                items[i]["degraded"] = {"mode": "literal", "reasons": degraded}
+    return batch_response(items, cache=fragment_cache)
+
+
+NDJSON_CHUNK = 64
+
+def _ndjson(lines: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Emite líneas JSON ya serializadas como NDJSON, agrupándolas en bloques para no
+    enviar un chunk HTTP por resultado. Memoria acotada al bloque.
+    """
+    buf: List[bytes] = []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= NDJSON_CHUNK:
+            yield b"\n".join(buf) + b"\n"
+            buf = []
+    if buf:
+        yield b"\n".join(buf) + b"\n"
+
+
+@router.post("/search/stream")
+async def search_stream_endpoint(request: SearchRequest = Body(...)):
+    """
+    Variante en streaming de /search: responde NDJSON (application/x-ndjson),
+    un resultado por línea, a medida que se generan.
+    - Acepta el mismo cuerpo que /search; top_k null devuelve todos los resultados literales.
+    """
+    try:
+        with request_budget(SEARCH_BUDGET) as budget:
+            results = await search_usecase.stream(
+                request.q,
+                mode=request.mode or "literal",
+                filters=request.filters,
+                top_k=request.top_k
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    cache = fragment_cache if (request.mode or "literal") != "semantic" or budget.degraded else None
+    headers = {"X-Search-Degraded": "literal"} if budget.degraded else None
+    return StreamingResponse(_ndjson(iter_encoded(results, cache)), media_type="application/x-ndjson", headers=headers)
 
 
 class EmbeddingUpsertItem(BaseModel):
@@ -123,6 +470,7 @@ async def embeddings_upsert_endpoint(request: EmbeddingUpsertRequest):
     - namespace: opcional
     Responde con cantidad de upserted y lista de fallos.
     """
+    global _related_flush
     upserted = 0
     failed: List[Dict[str, Any]] = []
     vectors: List[Tuple[str, List[float], Dict[str, Any]]] = []
@@ -137,11 +485,22 @@ async def embeddings_upsert_endpoint(request: EmbeddingUpsertRequest):
     # Upsert en Pinecone
     if vectors:
         try:
-            pinecone_adapter.index.upsert(vectors=vectors, namespace=request.namespace or pinecone_namespace)
+            with stage("pinecone_upsert"):
+                pinecone_adapter.index.upsert(vectors=vectors, namespace=request.namespace or pinecone_namespace)
             upserted = len(vectors)
         except Exception as e:
             for v in vectors:
                 failed.append({"id": v[0], "reason": f"Upsert error: {str(e)}"})
+    if upserted:
+        fragment_cache.invalidate(vid for vid, _, _ in vectors)
+    if upserted and related_index is not None and (request.namespace or pinecone_namespace) == pinecone_namespace:
+        # El grafo de relacionados se actualiza en segundo plano solo en las filas afectadas
+        task = asyncio.create_task(asyncio.to_thread(related_index.update, {vid: values for vid, values, _ in vectors}))
+        _related_updates.add(task)
+        task.add_done_callback(_log_related_failure)
+        if _related_flush is None or _related_flush.done():
+            _related_flush = asyncio.create_task(_flush_related_later())
+            _related_flush.add_done_callback(_log_related_failure)
     return EmbeddingUpsertResponse(upserted=upserted, failed=failed)
 
 
@@ -155,7 +514,75 @@ class DocumentResponse(BaseModel):
     created_at: str
     updated_at: str
 
-@router.get("/documents/{id}", response_model=DocumentResponse)
+def _iter_corpus(corpus_path: str, filters: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    from datetime import timezone
+    default_now = datetime.now(timezone.utc).isoformat()
+    with open(corpus_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = orjson.loads(line)
+            metadata = doc.get("metadata", {})
+            if filters:
+                ref = (metadata or {}).get("reference") or doc.get("Referencia") or ""
+                if not record_matches(extract_fields(doc["id"], ref, metadata), filters):
+                    continue
+            now = doc.get("updated_at") or doc.get("created_at") or default_now
+            yield {
+                "id": doc["id"],
+                "text": doc["text"],
+                "metadata": metadata,
+                "created_at": doc.get("created_at", now),
+                "updated_at": doc.get("updated_at", now)
+            }
+
+
+@router.get("/documents/export")
+async def export_documents(filters: Optional[str] = Query(None, description="Filtros de metadatos en JSON, p. ej. {\"book\": \"Alma\"}")):
+    """
+    Exporta el corpus local como NDJSON en streaming, directamente desde el almacén.
+    Cada línea tiene la forma de DocumentResponse; memoria acotada sin importar el tamaño.
+    - filters: opcional, mismos campos y operadores que /search
+    """
+    corpus_path = CORPUS_PATH
+    parsed = None
+    if filters:
+        try:
+            parsed = orjson.loads(filters)
+            if not isinstance(parsed, dict):
+                raise ValueError("filters debe ser un objeto JSON")
+            validate_filters(parsed)
+        except (orjson.JSONDecodeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(corpus_path):
+        raise HTTPException(status_code=500, detail="Error leyendo corpus: no existe el archivo")
+    docs = _iter_corpus(corpus_path, parsed)
+    return StreamingResponse(_ndjson(orjson.dumps(doc) for doc in docs), media_type="application/x-ndjson")
+
+
+@router.get("/documents/{id}/related")
+async def related_documents(id: str, limit: int = Query(10, ge=1)):
+    """
+    Versículos relacionados con id, leídos del grafo kNN precalculado (sin Ollama ni Pinecone).
+    - limit: cuántos vecinos devolver (máximo RELATED_LIMIT_MAX)
+    Responde con id, ref, snippet y score (coseno) de cada vecino, del más al menos parecido.
+    """
+    if related_index is None:
+        raise HTTPException(status_code=503, detail="Grafo de relacionados no construido (python -m src.services.related)")
+    with stage("related"):
+        neighbors = related_index.related(id, min(limit, RELATED_LIMIT_MAX))
+    if neighbors is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    local = index_service.documents([vid for vid, _ in neighbors]) if index_service is not None else {}
+    items = []
+    for vid, score in neighbors:
+        ref, text, _ = local.get(vid, ("", "", None))
+        items.append({"id": vid, "ref": ref, "snippet": text, "score": score})
+    return json_response({"id": id, "items": items})
+
+
+# Estos endpoints devuelven bytes de orjson: el esquema se documenta sin validar la respuesta
+@router.get("/documents/{id}", responses={200: {"model": DocumentResponse}})
 async def get_document_by_id(id: str):
     """
     Devuelve el documento por ID, usando el corpus local como fuente inicial.
@@ -165,21 +592,21 @@ async def get_document_by_id(id: str):
     # Buscar en corpus local (versiculos.jsonl)
     import json
     import os
-    corpus_path = os.path.join(os.path.dirname(__file__), '../../versiculos.jsonl')
+    corpus_path = CORPUS_PATH
     try:
-        with open(corpus_path, encoding='utf-8') as f:
+        with stage("corpus_read"), open(corpus_path, encoding='utf-8') as f:
             for line in f:
                 doc = json.loads(line)
                 if doc.get('id') == id:
                     from datetime import timezone
                     now = datetime.now(timezone.utc).isoformat()
-                    return DocumentResponse(
-                        id=doc['id'],
-                        text=doc['text'],
-                        metadata=doc.get('metadata', {}),
-                        created_at=doc.get('created_at', now),
-                        updated_at=doc.get('updated_at', now)
-                    )
+                    return json_response({
+                        "id": doc['id'],
+                        "text": doc['text'],
+                        "metadata": doc.get('metadata', {}),
+                        "created_at": doc.get('created_at', now),
+                        "updated_at": doc.get('updated_at', now)
+                    })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error leyendo corpus: {str(e)}")
     raise HTTPException(status_code=404, detail="Documento no encontrado")
@@ -194,7 +621,7 @@ class DocumentListResponse(BaseModel):
     limit: int
     offset: int
 
-@router.get("/documents", response_model=DocumentListResponse)
+@router.get("/documents", responses={200: {"model": DocumentListResponse}})
 async def list_documents(limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
     """
     Lista documentos del corpus local con paginación básica.
@@ -205,10 +632,10 @@ async def list_documents(limit: int = Query(20, ge=1, le=100), offset: int = Que
     import json
     import os
     from datetime import timezone
-    corpus_path = os.path.join(os.path.dirname(__file__), '../../versiculos.jsonl')
+    corpus_path = CORPUS_PATH
     items = []
     try:
-        with open(corpus_path, encoding='utf-8') as f:
+        with stage("corpus_read"), open(corpus_path, encoding='utf-8') as f:
             for idx, line in enumerate(f):
                 if idx < offset:
                     continue
@@ -216,19 +643,19 @@ async def list_documents(limit: int = Query(20, ge=1, le=100), offset: int = Que
                     break
                 doc = json.loads(line)
                 now = doc.get('updated_at') or doc.get('created_at') or datetime.now(timezone.utc).isoformat()
-                items.append(DocumentResponse(
-                    id=doc['id'],
-                    text=doc['text'],
-                    metadata=doc.get('metadata', {}),
-                    created_at=doc.get('created_at', now),
-                    updated_at=doc.get('updated_at', now)
-                ))
+                items.append({
+                    "id": doc['id'],
+                    "text": doc['text'],
+                    "metadata": doc.get('metadata', {}),
+                    "created_at": doc.get('created_at', now),
+                    "updated_at": doc.get('updated_at', now)
+                })
         # Calcular total recorriendo todo el archivo
-        with open(corpus_path, encoding='utf-8') as f:
+        with stage("corpus_read"), open(corpus_path, encoding='utf-8') as f:
             total = sum(1 for _ in f)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error leyendo corpus: {str(e)}")
-    return DocumentListResponse(items=items, total=total, limit=limit, offset=offset)
+    return json_response({"items": items, "total": total, "limit": limit, "offset": offset})
 
 
 class ReindexRequest(BaseModel):
@@ -264,6 +691,35 @@ async def admin_reindex_endpoint(request: ReindexRequest):
     return ReindexResponse(job_id=job_id, status=status)
 
 
+@router.post("/admin/profile")
+async def admin_profile_endpoint(seconds: float = Query(10.0, gt=0, le=300), x_admin_key: Optional[str] = Header(None)):
+    """
+    Captura temporizada: muestrea las pilas de todos los hilos durante seconds segundos
+    (todo el tráfico) y escribe un fichero de pilas colapsadas en PROFILE_DIR, apto para
+    flamegraph.pl o speedscope. Responde con la ruta y el número de muestras.
+    """
+    _require_admin(x_admin_key)
+    sampler = StackSampler(PROFILE_INTERVAL).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(sampler.collapsed())
+    return {"path": path, "samples": sampler.samples, "stacks": len(sampler.stacks), "seconds": round(sampler.elapsed, 3)}
+
+
+@router.get("/admin/slow-queries")
+async def admin_slow_queries_endpoint(x_admin_key: Optional[str] = Header(None)):
+    """
+    Últimas búsquedas que superaron SLOW_QUERY_MS (más reciente al final).
+    """
+    _require_admin(x_admin_key)
+    return json_response({"threshold_ms": slow_queries.threshold_ms, "items": slow_queries.entries()})
+
+
 class DocumentCreateRequest(BaseModel):
     """
     Request para crear o actualizar documento.
@@ -306,7 +762,7 @@ async def create_or_update_document(request: DocumentCreateRequest = Body(...)):
     import json
     import os
     from datetime import timezone
-    corpus_path = os.path.join(os.path.dirname(__file__), '../../versiculos.jsonl')
+    corpus_path = CORPUS_PATH
     doc_id = request.id or str(abs(hash(request.text + str(request.metadata or {}))))
     now = datetime.now(timezone.utc).isoformat()
     new_doc = {
@@ -321,7 +777,7 @@ async def create_or_update_document(request: DocumentCreateRequest = Body(...)):
     updated = False
     try:
         if os.path.exists(corpus_path):
-            with open(corpus_path, encoding='utf-8') as f:
+            with stage("corpus_read"), open(corpus_path, encoding='utf-8') as f:
                 for line in f:
                     doc = json.loads(line)
                     if doc.get('id') == doc_id:
@@ -333,9 +789,10 @@ async def create_or_update_document(request: DocumentCreateRequest = Body(...)):
         if not updated:
             docs.append(new_doc)
         # Sobrescribir el archivo
-        with open(corpus_path, 'w', encoding='utf-8') as f:
+        with stage("corpus_write"), open(corpus_path, 'w', encoding='utf-8') as f:
             for doc in docs:
                 f.write(json.dumps(doc, ensure_ascii=False) + '\n')
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error escribiendo corpus: {str(e)}")
+    fragment_cache.invalidate([doc_id])
     return DocumentCreateResponse(id=doc_id, status="updated" if updated else "created")
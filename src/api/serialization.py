@@ -0,0 +1,139 @@
+"""
+Serialización rápida de respuestas con orjson, sin validación Pydantic por elemento.
+Solo para datos internos de confianza (índice local); el esquema público no cambia:
+los objetos conservan las claves y el orden de SearchResult / DocumentResponse.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import orjson
+from fastapi.responses import Response
+
+from src.infra.metrics import stage
+from src.services.inverted_index import InvertedIndexService
+
+
+_SEARCH_RESULT_KEYS = {"id", "score", "snippet", "metadata"}
+
+
+class FragmentCache:
+    """
+    Fragmentos JSON ya serializados por versículo, para armar respuestas concatenando bytes.
+    Cada entrada guarda el prefijo '{"id":...,"score":' y la cola ',"snippet":...,"metadata":{...}}',
+    de modo que solo el score se serializa en cada petición. Los endpoints que cambian un
+    documento (upsert, alta/edición) invalidan sus entradas.
+    """
+    def __init__(self, index_service: Optional[InvertedIndexService], max_entries: int = 50000):
+        self.index_service = index_service
+        self.max_entries = max_entries
+        self._fragments: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, vid: str) -> tuple:
+        fragment = self._fragments.get(vid)
+        if fragment is not None:
+            self.hits += 1
+            return fragment
+        self.misses += 1
+        idx = self.index_service
+        prefix = b'{"id":' + orjson.dumps(vid) + b',"score":'
+        tail = b"," + orjson.dumps({
+            "snippet": idx.text_by_id.get(vid, ""),
+            "metadata": {"ref": idx.ref_by_id.get(vid, "")}
+        })[1:]
+        fragment = (prefix, tail)
+        with self._lock:
+            if len(self._fragments) >= self.max_entries:
+                # FIFO: se descarta la entrada más antigua
+                self._fragments.pop(next(iter(self._fragments)), None)
+            self._fragments[vid] = fragment
+        return fragment
+
+    def invalidate(self, ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Descarta los fragmentos de ids (todos si ids es None).
+        """
+        with self._lock:
+            if ids is None:
+                self._fragments.clear()
+            else:
+                for vid in ids:
+                    self._fragments.pop(vid, None)
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    """
+    Codifica un resultado arbitrario (p. ej. semántico) con la forma de SearchResult.
+    """
+    item = {
+        "id": result["id"],
+        "score": float(result.get("score", 0.0)),
+        "snippet": result.get("snippet"),
+        "metadata": result.get("metadata"),
+    }
+    for key, value in result.items():
+        if key not in item:
+            item[key] = value
+    return orjson.dumps(item)
+
+
+def iter_encoded(results: Iterable[Dict[str, Any]], cache: Optional[FragmentCache] = None) -> Iterator[bytes]:
+    """
+    Serializa resultados uno a uno. Con cache (resultados literales salidos del índice local)
+    se concatenan los fragmentos cacheados; si no, se codifica cada resultado completo.
+    """
+    use_cache = cache is not None and cache.index_service is not None
+    for r in results:
+        if use_cache and r.keys() == _SEARCH_RESULT_KEYS:
+            prefix, tail = cache.get(r["id"])
+            yield prefix + orjson.dumps(float(r["score"])) + tail
+        else:
+            yield encode_result(r)
+
+
+def encode_results(results: Iterable[Dict[str, Any]], cache: Optional[FragmentCache] = None) -> List[bytes]:
+    return list(iter_encoded(results, cache))
+
+
+def _search_body(results: Iterable[Dict[str, Any]], cache: Optional[FragmentCache], extra: Dict[str, Any]) -> bytes:
+    body = [b'{"results":[', b",".join(encode_results(results, cache)), b'],"query_embedding":null']
+    for key, value in extra.items():
+        body.append(b"," + orjson.dumps(key) + b":" + orjson.dumps(value))
+    body.append(b"}")
+    return b"".join(body)
+
+
+def search_response(results: Iterable[Dict[str, Any]], cache: Optional[FragmentCache] = None, **extra: Any) -> Response:
+    """
+    Respuesta de /search armada por concatenación: {"results": [...], "query_embedding": null, ...extra}.
+    """
+    with stage("serialize"):
+        content = _search_body(results, cache, extra)
+    return Response(content=content, media_type="application/json")
+
+
+def batch_response(items: Iterable[Dict[str, Any]], cache: Optional[FragmentCache] = None) -> Response:
+    """
+    Respuesta de /search/batch: {"items": [...]} en el orden de las consultas. Cada item con
+    "results" se arma como una respuesta de /search; el resto (errores) se codifica tal cual.
+    """
+    with stage("serialize"):
+        parts = []
+        for item in items:
+            if "results" in item:
+                extra = {k: v for k, v in item.items() if k != "results"}
+                parts.append(_search_body(item["results"], cache, extra))
+            else:
+                parts.append(orjson.dumps(item))
+        content = b'{"items":[' + b",".join(parts) + b"]}"
+    return Response(content=content, media_type="application/json")
+
+
+def json_response(data: Any, status_code: int = 200) -> Response:
+    return Response(content=orjson.dumps(data), media_type="application/json", status_code=status_code)
@@ -0,0 +1,158 @@
+"""
+Referencias de escrituras: orden canónico de libros, alias ortográficos y parser de
+consultas de referencia ("Juan 3:16", "Alma 32:21-43", "Juan 3", "Juan 3:16,18; Mateo 5:3").
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+CANON_ORDER = [
+    # AT
+    "Génesis","Éxodo","Levítico","Números","Deuteronomio","Josué","Jueces","Rut",
+    "1 Samuel","2 Samuel","1 Reyes","2 Reyes","1 Crónicas","2 Crónicas","Esdras","Nehemías","Ester",
+    "Job","Salmos","Proverbios","Eclesiastés","Cantares","Isaías","Jeremías","Lamentaciones",
+    "Ezequiel","Daniel","Oseas","Joel","Amós","Abdías","Jonás","Miqueas","Nahúm","Habacuc",
+    "Sofonías","Hageo","Zacarías","Malaquías",
+    # NT
+    "Mateo","Marcos","Lucas","Juan","Hechos","Romanos","1 Corintios","2 Corintios","Gálatas",
+    "Efesios","Filipenses","Colosenses","1 Tesalonicenses","2 Tesalonicenses","1 Timoteo",
+    "2 Timoteo","Tito","Filemón","Hebreos","Santiago","1 Pedro","2 Pedro","1 Juan","2 Juan",
+    "3 Juan","Judas","Apocalipsis",
+    # BoM
+    "1 Nefi","2 Nefi","Jacob","Enós","Jarom","Omni","Palabras de Mormón","Mosíah","Alma",
+    "Helamán","3 Nefi","4 Nefi","Mormón","Éter","Moroni",
+    # DyC
+    "Doctrina y Convenios",
+    # PGP
+    "Moisés","Abraham","José Smith—Mateo","José Smith—Historia","Artículos de Fe"
+]
+
+ALIAS = {
+    # equivalencias ortográficas/diacríticas de libros (no de términos)
+    "genesis":"génesis","exodo":"éxodo","levitico":"levítico","numeros":"números",
+    "nehemias":"nehemías","eclesiastes":"eclesiastés","amos":"amós","jonas":"jonás",
+    "nahum":"nahúm","galatas":"gálatas","filemon":"filemón","enos":"enós",
+    "mosiah":"mosíah","helaman":"helamán","mormon":"mormón","eter":"éter",
+    "moises":"moisés",
+    # variantes de JS—Mateo/Historia y DyC
+    "jose smith-mateo":"josé smith—mateo","jose smith—mateo":"josé smith—mateo",
+    "jose smith-historia":"josé smith—historia","jose smith—historia":"josé smith—historia",
+    "dyc":"doctrina y convenios","articulos de fe":"artículos de fe",
+    "cantar de los cantares":"cantares"
+}
+
+UNKNOWN_BOOK = len(CANON_ORDER) + 1000
+MAX_VERSE = 10 ** 6
+
+
+def norm_book_key(s: str) -> str:
+    s = s.replace("—", "-").replace("–", "-").lower()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(c for c in s if unicodedata.category(c) != "Mn")
+    return re.sub(r"\s+", " ", s).strip()
+
+
+BOOK_INDEX: Dict[str, int] = {norm_book_key(name): i for i, name in enumerate(CANON_ORDER)}
+for _alias, _target in ALIAS.items():
+    BOOK_INDEX[norm_book_key(_alias)] = BOOK_INDEX.get(norm_book_key(_target), UNKNOWN_BOOK)
+
+
+def book_order(book: str) -> Optional[int]:
+    """
+    Posición canónica del libro, o None si no es un libro conocido.
+    """
+    return BOOK_INDEX.get(norm_book_key(book or ""))
+
+
+def parse_reference(ref: str) -> Tuple[str, int, int]:
+    m = re.match(r"^(?P<book>.+?)\s+(?P<chap>\d+)(?::(?P<verse>\d+))?$", (ref or "").strip())
+    if not m:
+        return ref, 0, 0
+    return m.group("book").strip(), int(m.group("chap")), int(m.group("verse") or 0)
+
+
+def canon_sort_key(ref: str) -> Tuple[int, int, int]:
+    book, chap, verse = parse_reference(ref)
+    order = BOOK_INDEX.get(norm_book_key(book), UNKNOWN_BOOK)
+    return (order, chap, verse)
+
+
+class RefRange(NamedTuple):
+    """
+    Rango contiguo en orden canónico: desde (book, chapter, verse) hasta (book, end_chapter, end_verse).
+    """
+    book: int
+    chapter: int
+    verse: int
+    end_chapter: int
+    end_verse: int
+
+    def start_key(self) -> Tuple[int, int, int]:
+        return (self.book, self.chapter, self.verse)
+
+    def end_key(self) -> Tuple[int, int, int]:
+        return (self.book, self.end_chapter, self.end_verse)
+
+
+_BOOK_PREFIX_RE = re.compile(r"^\s*(?P<book>(?:[1-4]\s*)?[^\d:;,]+?)\s*(?P<rest>\d.*)$")
+_CHAPTER_ITEM_RE = re.compile(r"^(\d+)(?::(\d+))?(?:\s*-\s*(\d+)(?::(\d+))?)?$")
+_VERSE_ITEM_RE = re.compile(r"^(\d+)(?:\s*-\s*(\d+))?$")
+
+
+def parse_reference_query(query: str) -> Optional[List[RefRange]]:
+    """
+    Interpreta la consulta como lista de referencias. Devuelve None si no lo es.
+    Admite versículo ("Juan 3:16"), rango ("Alma 32:21-43"), capítulo completo ("Juan 3"),
+    rangos entre capítulos ("Juan 3:16-4:2"), listas con coma ("Juan 3:16,18,20-22")
+    y varias referencias separadas por punto y coma ("Juan 3:16; Mateo 5:3").
+    Los rangos invertidos ("Juan 3:20-16", "Juan 4-3") se interpretan con los extremos intercambiados.
+    """
+    ranges: List[RefRange] = []
+    book: Optional[int] = None
+    for segment in query.split(";"):
+        segment = segment.strip()
+        if not segment:
+            continue
+        m = _BOOK_PREFIX_RE.match(segment)
+        if m:
+            book = book_order(m.group("book"))
+            if book is None:
+                return None
+            rest = m.group("rest")
+        elif book is not None:
+            rest = segment  # "Juan 3:16; 4:2" hereda el libro
+        else:
+            return None
+        chapter: Optional[int] = None
+        for item in rest.split(","):
+            item = item.strip()
+            cm = _CHAPTER_ITEM_RE.match(item)
+            vm = _VERSE_ITEM_RE.match(item)
+            if chapter is not None and vm and ":" not in item:
+                # continuación de lista de versículos del mismo capítulo
+                start, end = sorted((int(vm.group(1)), int(vm.group(2) or vm.group(1))))
+                ranges.append(RefRange(book, chapter, start, chapter, end))
+            elif cm:
+                chap = int(cm.group(1))
+                verse = int(cm.group(2)) if cm.group(2) else None
+                if cm.group(3) is None:
+                    end_chap, end_verse = chap, verse
+                elif cm.group(4) is not None:
+                    end_chap, end_verse = int(cm.group(3)), int(cm.group(4))
+                elif verse is not None:
+                    end_chap, end_verse = chap, int(cm.group(3))
+                else:
+                    end_chap, end_verse = int(cm.group(3)), None  # rango de capítulos
+                start_verse = verse if verse is not None else 0
+                end_verse = end_verse if end_verse is not None else MAX_VERSE
+                if (end_chap, end_verse) < (chap, start_verse):
+                    if verse is None:
+                        chap, end_chap = end_chap, chap  # capítulos invertidos ("Juan 4-3")
+                    else:
+                        chap, start_verse, end_chap, end_verse = end_chap, end_verse, chap, start_verse
+                ranges.append(RefRange(book, chap, start_verse, end_chap, end_verse))
+                chapter = end_chap if verse is not None else None
+            else:
+                return None
+    return ranges or None
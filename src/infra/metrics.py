@@ -0,0 +1,331 @@
+"""
+Métricas en formato de exposición de Prometheus (texto 0.0.4) y tiempos por etapa.
+
+- Counter, Gauge e Histogram con etiquetas, registrados en REGISTRY y servidos en /metrics.
+- stage("nombre") mide una etapa: alimenta apicone_stage_duration_seconds y, si hay una
+  petición en curso (RequestTimingMiddleware), se suma a su cabecera Server-Timing.
+- EventLoopLagMonitor mide cuánto tarda el event loop en despertar una tarea dormida.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """
+    Percentil por rango más cercano sobre valores ya ordenados.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    Gauge con valor fijado (set) o calculado al exponer (callback sin etiquetas).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            return [f"{self.name} {_fmt(self.callback())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class CallbackCounter(Counter):
+    """
+    Contador cuyo valor vive en otro objeto (p. ej. FragmentCache.hits); se lee al exponer.
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def watch(self, callback: Callable[[], float], **labels: str) -> None:
+        self._callbacks[self._key(labels)] = callback
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(cb())}" for k, cb in list(self._callbacks.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # por etiquetas: [conteos por cubeta (no acumulados), suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = 0
+        while value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        out = []
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._series.items()]
+        for key, (counts, total, n) in items:
+            acc = 0
+            for bound, c in zip(self.buckets, counts):
+                acc += c
+                le = 'le="' + _fmt(bound) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "apicone_http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    "apicone_http_request_duration_seconds", "Duración de las peticiones HTTP", ("method", "route")))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "apicone_stage_duration_seconds", "Duración por etapa (parse, postings, embed, pinecone, serialize...)", ("stage",)))
+CACHE_HITS = REGISTRY.register(CallbackCounter(
+    "apicone_cache_hits_total", "Aciertos de caché", ("cache",)))
+CACHE_MISSES = REGISTRY.register(CallbackCounter(
+    "apicone_cache_misses_total", "Fallos de caché", ("cache",)))
+COALESCE_CALLS = REGISTRY.register(CallbackCounter(
+    "apicone_coalesce_calls_total", "Llamadas que pasan por single-flight", ("kind",)))
+COALESCE_COLLAPSED = REGISTRY.register(CallbackCounter(
+    "apicone_coalesce_collapsed_total", "Llamadas unidas a otra idéntica ya en curso", ("kind",)))
+INDEX_SIZE = REGISTRY.register(Gauge(
+    "apicone_index_size", "Tamaño del índice local", ("kind",)))
+SHARDS_LOADED = REGISTRY.register(Gauge(
+    "apicone_shards_loaded", "Shards de índice cargados en memoria"))
+BACKEND_FAILURES = REGISTRY.register(Counter(
+    "apicone_backend_failures_total", "Llamadas fallidas a backends remotos (timeout, error, circuit_open, no_budget)",
+    ("backend", "reason")))
+HEDGED_REQUESTS = REGISTRY.register(Counter(
+    "apicone_hedged_requests_total", "Peticiones duplicadas (hedging) lanzadas a backends remotos", ("backend",)))
+CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    "apicone_circuit_open", "1 si el circuito del backend está abierto", ("backend",)))
+DEGRADED_SEARCHES = REGISTRY.register(Counter(
+    "apicone_degraded_searches_total", "Búsquedas semánticas resueltas en modo literal por un backend caído"))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    "apicone_event_loop_lag_seconds", "Retraso del event loop al despertar una tarea dormida",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+
+
+# =============== tiempos por etapa ===============
+
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> List[Tuple[str, float]]:
+    """
+    Etapas registradas hasta ahora en la petición en curso (vacío fuera de una petición).
+    """
+    return list(_request_timings.get() or ())
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_DURATION.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Mide el bloque como etapa name (histograma + Server-Timing de la petición en curso).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def server_timing(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """
+    Cabecera Server-Timing: una entrada por etapa (duraciones sumadas si se repite), en ms.
+    """
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in merged.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+class RequestTimingMiddleware:
+    """
+    Middleware ASGI: cuenta peticiones por ruta, mide su duración y añade Server-Timing
+    con las etapas registradas hasta que empieza la respuesta.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                header = server_timing(timings, time.perf_counter() - start).encode("latin-1")
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            # Plantilla de la ruta (/documents/{id}), no la URL, para acotar la cardinalidad
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=path, status=str(status["code"]))
+            HTTP_DURATION.observe(time.perf_counter() - start, method=method, route=path)
+
+
+class EventLoopLagMonitor:
+    """
+    Tarea que duerme interval segundos y registra el retraso al despertar.
+    """
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - t0 - self.interval)
+            EVENT_LOOP_LAG.observe(self.last_lag)
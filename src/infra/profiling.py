@@ -0,0 +1,117 @@
+"""
+Perfilado por muestreo de pilas y registro de consultas lentas.
+
+- StackSampler: hilo que lee periódicamente sys._current_frames() y acumula pilas
+  colapsadas ("raíz;...;hoja" -> muestras), el formato que consumen flamegraph.pl y speedscope.
+  Con thread_id muestrea solo ese hilo (perfil de una petición); sin él, todos los hilos.
+- SlowQueryLog: guarda en memoria (y en el log "apicone.slow_queries") las búsquedas que
+  superan un umbral, con sus tiempos por etapa y número de resultados.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import orjson
+
+logger = logging.getLogger("apicone.slow_queries")
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_frame(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Muestreador de pilas en un hilo aparte. Usar como context manager o con start/stop.
+    """
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self) -> "StackSampler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                items = [frame] if frame is not None else []
+            else:
+                items = [f for tid, f in frames.items() if tid != own]
+            for frame in items:
+                key = collapse_frame(frame)
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """
+        Texto en formato de pilas colapsadas: una línea "pila conteo" por pila distinta.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items(), key=lambda kv: -kv[1]))
+
+    def summary(self, top: int = 50) -> Dict[str, Any]:
+        stacks = sorted(self.stacks.items(), key=lambda kv: -kv[1])[:top]
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+            "stacks": [{"stack": stack, "count": count} for stack, count in stacks],
+        }
+
+
+class SlowQueryLog:
+    """
+    Búsquedas por encima de threshold_ms: últimas max_entries en memoria, cada una
+    también emitida como JSON en el logger apicone.slow_queries.
+    """
+    def __init__(self, threshold_ms: float = 500.0, max_entries: int = 200):
+        self.threshold_ms = threshold_ms
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+
+    def record(self, duration_ms: float, entry: Dict[str, Any]) -> bool:
+        if self.threshold_ms <= 0 or duration_ms < self.threshold_ms:
+            return False
+        entry = {"ts": time.time(), "duration_ms": round(duration_ms, 3), **entry}
+        self._entries.append(entry)
+        logger.warning(orjson.dumps(entry).decode("utf-8"))
+        return True
+
+    def entries(self) -> List[Dict[str, Any]]:
+        return list(self._entries)
@@ -0,0 +1,238 @@
+"""
+Resiliencia frente a backends remotos (Ollama, Pinecone).
+
+- request_budget(segundos): presupuesto de la petición en curso; cada llamada a un backend
+  recibe como plazo lo que quede de él (acotado por el timeout propio del backend).
+- CircuitBreaker: tras failure_threshold fallos seguidos se abre y rechaza llamadas durante
+  reset_timeout segundos; después deja pasar una sola prueba (half_open).
+- BackendGuard: aplica plazo, circuito y, opcionalmente, una petición duplicada (hedging)
+  cuando la primera tarda más que el p95 reciente. Los fallos salen como BackendUnavailable
+  para que el caso de uso pueda degradar a búsqueda literal; solo los del backend (plazo,
+  transporte, 5xx) cuentan para el circuito, no las peticiones que el backend rechaza.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Iterator, List, Optional
+
+import httpx
+
+from src.infra.metrics import BACKEND_FAILURES, CIRCUIT_OPEN, HEDGED_REQUESTS, percentile
+
+try:  # errores de conexión del cliente de Pinecone que no derivan de OSError
+    from pinecone.errors.exceptions import PineconeConnectionError, PineconeProtocolError
+    _CLIENT_TRANSPORT_ERRORS: tuple = (PineconeConnectionError, PineconeProtocolError)
+except ImportError:
+    _CLIENT_TRANSPORT_ERRORS = ()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BackendUnavailable(Exception):
+    """
+    El backend no respondió a tiempo, falló o tiene el circuito abierto.
+    """
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for obj in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(obj, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """
+    True si el error es del backend (plazo, transporte o respuesta 5xx) y no de la petición.
+    """
+    if isinstance(error, (asyncio.TimeoutError, OSError, httpx.TransportError) + _CLIENT_TRANSPORT_ERRORS):
+        return True
+    status = _status_code(error)
+    return status is not None and status >= 500
+
+
+class RequestBudget:
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+_budget: ContextVar[Optional[RequestBudget]] = ContextVar("request_budget", default=None)
+
+
+@contextmanager
+def request_budget(seconds: float) -> Iterator[RequestBudget]:
+    budget = RequestBudget(seconds)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def call_timeout(limit: float) -> float:
+    """
+    Plazo para una llamada: el menor entre limit y lo que quede del presupuesto de la petición.
+    """
+    budget = _budget.get()
+    return limit if budget is None else min(limit, budget.remaining())
+
+
+def note_degraded(reason: str) -> None:
+    budget = _budget.get()
+    if budget is not None:
+        budget.degraded.append(reason)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        CIRCUIT_OPEN.set(0, backend=name)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        CIRCUIT_OPEN.set(0, backend=self.name)
+
+    def end_probe(self) -> None:
+        """
+        Libera la prueba de half_open si terminó sin resultado (cancelada o rechazada).
+        """
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+            self._probing = False
+            CIRCUIT_OPEN.set(1, backend=self.name)
+
+
+class LatencyWindow:
+    """
+    Últimas latencias correctas de un backend, para estimar el p95 del hedging.
+    """
+    def __init__(self, size: int = 200):
+        self._values: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def percentile(self, q: float) -> float:
+        return percentile(sorted(self._values), q)
+
+
+class BackendGuard:
+    """
+    Envuelve las llamadas a un backend: call(factory) con factory una función sin argumentos
+    que devuelve el awaitable de la llamada (se invoca dos veces si hay hedging).
+    """
+    def __init__(self, name: str, timeout: float, breaker: Optional[CircuitBreaker] = None,
+                 hedge: bool = False, hedge_min_delay: float = 0.02, hedge_min_samples: int = 20):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyWindow()
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.percentile(95))
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        timeout = call_timeout(self.timeout)
+        if timeout <= 0:
+            # Sin presupuesto no se llega a llamar: no cuenta como fallo del backend
+            BACKEND_FAILURES.inc(backend=self.name, reason="no_budget")
+            raise BackendUnavailable(f"{self.name}: sin presupuesto")
+        probe = self.breaker.state == HALF_OPEN
+        if not self.breaker.allow():
+            BACKEND_FAILURES.inc(backend=self.name, reason="circuit_open")
+            raise BackendUnavailable(f"{self.name}: circuito abierto")
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._run(factory), timeout)
+        except asyncio.TimeoutError as e:
+            self.breaker.record_failure()
+            BACKEND_FAILURES.inc(backend=self.name, reason="timeout")
+            raise BackendUnavailable(f"{self.name}: sin respuesta en {timeout * 1000:.0f} ms") from e
+        except Exception as e:
+            if not is_backend_failure(e):
+                # El backend respondió y rechazó la petición: no dice nada de su salud
+                BACKEND_FAILURES.inc(backend=self.name, reason="rejected")
+                raise BackendUnavailable(f"{self.name}: petición rechazada: {type(e).__name__}: {e}") from e
+            self.breaker.record_failure()
+            BACKEND_FAILURES.inc(backend=self.name, reason="error")
+            raise BackendUnavailable(f"{self.name}: {type(e).__name__}: {e}") from e
+        finally:
+            if probe:
+                # Una prueba cancelada (CancelledError) o rechazada no debe dejar el circuito bloqueado
+                self.breaker.end_probe()
+        self.breaker.record_success()
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    async def _run(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await factory()
+        tasks = [asyncio.ensure_future(factory())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return tasks[0].result()
+            HEDGED_REQUESTS.inc(backend=self.name)
+            tasks.append(asyncio.ensure_future(factory()))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,41 @@
+"""
+Coalescencia de trabajo idéntico concurrente (single-flight).
+
+Mientras una llamada con una clave está en curso, las siguientes con la misma clave esperan
+su mismo futuro en lugar de repetir el trabajo. La clave se libera al terminar: no es una caché.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = 0       # llamadas recibidas
+        self.collapsed = 0   # llamadas que se unieron a una ya en curso
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta factory() una sola vez por clave en curso y devuelve (o lanza) su resultado a todos.
+        El trabajo corre en una tarea propia protegida con shield: cancelar a un solicitante
+        no lo cancela para los demás.
+        """
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.collapsed += 1
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(factory())
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._release(key, f))
+        return await asyncio.shield(future)
+
+    def _release(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # marcada como recuperada aunque nadie la esperase
@@ -1,31 +1,63 @@
-from fastapi import FastAPI
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import Response
+from src.api.search import INDEX_STATUS, flush_related, ollama_guard, pinecone_guard
 from src.api.search import router as search_router
+from src.infra.metrics import CONTENT_TYPE, REGISTRY, EventLoopLagMonitor, RequestTimingMiddleware
+
+lag_monitor = EventLoopLagMonitor(interval=float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.25")))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lag_monitor.start()
+    yield
+    await lag_monitor.stop()
+    # Cambios del grafo de relacionados aún sin guardar
+    await flush_related()
+
 
-app = FastAPI(title="apicone", version="0.1.0")
+app = FastAPI(title="apicone", version="0.1.0", lifespan=lifespan)
+
+# Tiempos por etapa (Server-Timing) y métricas por ruta
+app.add_middleware(RequestTimingMiddleware)
 
 app.include_router(search_router)
 
 # Endpoint /health bajo el prefijo /api/v1
-from fastapi import APIRouter
 health_router = APIRouter(prefix="/api/v1", tags=["health"])
 
-import time
 start_time = time.time()
 
-
-from src.api.search import INDEX_STATUS
-
 @health_router.get("/health")
 def health():
+    """
+    Estado del índice local y de los circuitos de Ollama y Pinecone
+    (closed, open o half_open); cualquier circuito no cerrado marca el servicio como degradado.
+    """
     uptime = int(time.time() - start_time)
+    breakers = {guard.name: guard.breaker.state for guard in (ollama_guard, pinecone_guard)}
+    healthy = INDEX_STATUS == "ok" and all(state == "closed" for state in breakers.values())
     return {
-        "status": "ok" if INDEX_STATUS == "ok" else "degraded",
+        "status": "ok" if healthy else "degraded",
         "uptime": uptime,
         "components": {
             "db": "ok",
-            "pinecone": "ok",
+            "ollama": breakers["ollama"],
+            "pinecone": breakers["pinecone"],
             "index": INDEX_STATUS
         }
     }
 
 app.include_router(health_router)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Métricas en formato de texto de Prometheus.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,227 @@
+"""
+Bitmap comprimido estilo roaring sobre ordinales enteros de documento.
+
+El espacio de ids se divide en bloques de 2^16 valores (clave = 16 bits altos).
+Cada bloque se guarda como:
+- array('H') ordenado con los 16 bits bajos, si tiene pocos elementos (<= 4096), o
+- un bytearray de 8 KiB usado como bitset de 65536 bits, si es denso.
+Las operaciones AND / OR / ANDNOT se resuelven bloque a bloque.
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Union
+
+ARRAY_MAX = 4096
+BITSET_BYTES = 1 << 13
+
+Container = Union[array, bytearray]
+
+# posiciones de bits encendidos para cada valor de byte
+_BYTE_BITS = [tuple(i for i in range(8) if (b >> i) & 1) for b in range(256)]
+
+
+def _to_int(bits: bytearray) -> int:
+    return int.from_bytes(bits, "little")
+
+
+def _from_int(value: int) -> bytearray:
+    return bytearray(value.to_bytes(BITSET_BYTES, "little"))
+
+
+def _bits_to_array(bits: bytearray) -> array:
+    out = array("H")
+    for i, byte in enumerate(bits):
+        if byte:
+            base = i << 3
+            out.extend(base + b for b in _BYTE_BITS[byte])
+    return out
+
+
+def _array_to_bits(values: Iterable[int]) -> bytearray:
+    bits = bytearray(BITSET_BYTES)
+    for v in values:
+        bits[v >> 3] |= 1 << (v & 7)
+    return bits
+
+
+def _card(container: Container) -> int:
+    if isinstance(container, bytearray):
+        return _to_int(container).bit_count()
+    return len(container)
+
+
+def _normalize(container: Container) -> Container:
+    """
+    Elige la representación más compacta para el bloque.
+    """
+    if isinstance(container, bytearray):
+        if _card(container) <= ARRAY_MAX:
+            return _bits_to_array(container)
+        return container
+    if len(container) > ARRAY_MAX:
+        return _array_to_bits(container)
+    return container
+
+
+def _has(bits: bytearray, v: int) -> bool:
+    return bool(bits[v >> 3] & (1 << (v & 7)))
+
+
+def _and(a: Container, b: Container) -> Container:
+    if isinstance(a, bytearray) and isinstance(b, bytearray):
+        return _normalize(_from_int(_to_int(a) & _to_int(b)))
+    if isinstance(a, bytearray):
+        a, b = b, a
+    if isinstance(b, bytearray):
+        return array("H", (v for v in a if _has(b, v)))
+    if len(a) > len(b):
+        a, b = b, a
+    sb = set(b)
+    return array("H", (v for v in a if v in sb))
+
+
+def _or(a: Container, b: Container) -> Container:
+    if isinstance(a, bytearray) and isinstance(b, bytearray):
+        return _from_int(_to_int(a) | _to_int(b))
+    if isinstance(a, bytearray):
+        a, b = b, a
+    if isinstance(b, bytearray):
+        out = bytearray(b)
+        for v in a:
+            out[v >> 3] |= 1 << (v & 7)
+        return out
+    return _normalize(array("H", sorted(set(a).union(b))))
+
+
+def _andnot(a: Container, b: Container) -> Container:
+    if isinstance(a, bytearray):
+        bits_b = b if isinstance(b, bytearray) else _array_to_bits(b)
+        return _normalize(_from_int(_to_int(a) & ~_to_int(bits_b) & ((1 << (BITSET_BYTES * 8)) - 1)))
+    if isinstance(b, bytearray):
+        return array("H", (v for v in a if not _has(b, v)))
+    sb = set(b)
+    return array("H", (v for v in a if v not in sb))
+
+
+class Bitmap:
+    """
+    Conjunto de ordinales con operaciones de conjunto por bloques.
+    """
+    __slots__ = ("containers",)
+
+    def __init__(self, containers: Dict[int, Container] = None):
+        self.containers: Dict[int, Container] = containers or {}
+
+    @classmethod
+    def from_sorted(cls, ordinals: Iterable[int]) -> "Bitmap":
+        containers: Dict[int, Container] = {}
+        current_key = -1
+        current = None
+        for o in ordinals:
+            key = o >> 16
+            if key != current_key:
+                if current is not None:
+                    containers[current_key] = _normalize(current)
+                current_key = key
+                current = array("H")
+            low = o & 0xFFFF
+            if not current or current[-1] != low:
+                current.append(low)
+        if current is not None:
+            containers[current_key] = _normalize(current)
+        return cls(containers)
+
+    @classmethod
+    def from_iterable(cls, ordinals: Iterable[int]) -> "Bitmap":
+        return cls.from_sorted(sorted(set(ordinals)))
+
+    @classmethod
+    def full(cls, size: int) -> "Bitmap":
+        containers: Dict[int, Container] = {}
+        for key in range((size + 0xFFFF) >> 16):
+            n = min(size - (key << 16), 1 << 16)
+            containers[key] = _normalize(_from_int((1 << n) - 1))
+        return cls(containers)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        out: Dict[int, Container] = {}
+        for key, a in self.containers.items():
+            b = other.containers.get(key)
+            if b is None:
+                continue
+            c = _and(a, b)
+            if _card(c):
+                out[key] = c
+        return Bitmap(out)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        out = dict(self.containers)
+        for key, b in other.containers.items():
+            a = out.get(key)
+            out[key] = b if a is None else _or(a, b)
+        return Bitmap(out)
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        out: Dict[int, Container] = {}
+        for key, a in self.containers.items():
+            b = other.containers.get(key)
+            c = a if b is None else _andnot(a, b)
+            if _card(c):
+                out[key] = c
+        return Bitmap(out)
+
+    def __len__(self) -> int:
+        return sum(_card(c) for c in self.containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __contains__(self, ordinal: int) -> bool:
+        c = self.containers.get(ordinal >> 16)
+        if c is None:
+            return False
+        low = ordinal & 0xFFFF
+        if isinstance(c, bytearray):
+            return _has(c, low)
+        i = bisect_left(c, low)
+        return i < len(c) and c[i] == low
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self.containers):
+            base = key << 16
+            c = self.containers[key]
+            values = _bits_to_array(c) if isinstance(c, bytearray) else c
+            for v in values:
+                yield base | v
+
+    def iter_from(self, start: int) -> Iterator[int]:
+        """
+        Recorre en orden los ordinales >= start, saltando bloques anteriores.
+        """
+        first_key = start >> 16
+        for key in sorted(self.containers):
+            if key < first_key:
+                continue
+            base = key << 16
+            c = self.containers[key]
+            values = _bits_to_array(c) if isinstance(c, bytearray) else c
+            i = bisect_left(values, start - base) if key == first_key else 0
+            for v in values[i:]:
+                yield base | v
+
+    def to_list(self) -> List[int]:
+        return list(self)
+
+    def filter_sorted(self, ordinals: Iterable[int]) -> List[int]:
+        """
+        Conserva de una lista de ordinales solo los que pertenecen al bitmap.
+        """
+        return [o for o in ordinals if o in self]
+
+    @staticmethod
+    def union_all(bitmaps: Iterable["Bitmap"]) -> "Bitmap":
+        out = Bitmap()
+        for b in bitmaps:
+            out = out | b
+        return out
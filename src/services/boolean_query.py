@@ -0,0 +1,386 @@
+"""
+Lenguaje de consulta booleano para la búsqueda literal.
+
+Sintaxis soportada:
+- palabra          término opcional (OR implícito entre términos sin operador)
+- +palabra         término obligatorio
+- -palabra         término excluido
+- "frase exacta"   frase obligatoria (se pueden combinar varias, se cumplen todas)
+- a OR b           disyunción explícita entre grupos
+- ( ... )          agrupación; admite prefijo + o - como cualquier término
+"""
+
+import re
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.services.inverted_index import InvertedIndexService
+
+
+@dataclass
+class Term:
+    token: str
+
+
+@dataclass
+class Phrase:
+    text: str
+    tokens: List[str]
+
+
+@dataclass
+class Group:
+    must: List["Node"] = field(default_factory=list)
+    should: List["Node"] = field(default_factory=list)
+    must_not: List["Node"] = field(default_factory=list)
+
+
+@dataclass
+class Or:
+    children: List["Node"]
+
+
+Node = Union[Term, Phrase, Group, Or]
+
+_TOKEN_RE = re.compile(
+    r'\s*(?:(?P<rparen>\))|(?P<prefix>[+-])?(?:"(?P<phrase>[^"]*)"?|“(?P<phrase2>[^”]*)”?'
+    r'|(?P<lparen>\()|(?P<word>[^\s()"“”]+)))'
+)
+
+
+def _lex(query: str) -> List[Tuple[str, str, str]]:
+    """
+    Divide la consulta en tokens (tipo, prefijo, texto).
+    """
+    tokens: List[Tuple[str, str, str]] = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        m = _TOKEN_RE.match(query, pos)
+        if not m or m.end() == pos:
+            pos += 1
+            continue
+        pos = m.end()
+        prefix = m.group("prefix") or ""
+        if m.group("rparen"):
+            tokens.append(("RPAREN", "", ")"))
+        elif m.group("lparen"):
+            tokens.append(("LPAREN", prefix, "("))
+        elif m.group("phrase") is not None or m.group("phrase2") is not None:
+            tokens.append(("PHRASE", prefix, m.group("phrase") or m.group("phrase2") or ""))
+        elif m.group("word"):
+            word = m.group("word")
+            if word == "OR" and not prefix:
+                tokens.append(("OR", "", word))
+            else:
+                tokens.append(("WORD", prefix, word))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        # Paréntesis de cierre sobrantes: se ignoran y se sigue leyendo
+        while self.peek() == "RPAREN":
+            self.pos += 1
+            rest = self.parse_or()
+            node = _merge_and(node, rest)
+        return node
+
+    def parse_or(self) -> Node:
+        children = [self.parse_group()]
+        while self.peek() == "OR":
+            self.pos += 1
+            children.append(self.parse_group())
+        children = [c for c in children if not _is_empty(c)]
+        if len(children) == 1:
+            return children[0]
+        return Or(children) if children else Group()
+
+    def parse_group(self) -> Node:
+        group = Group()
+        while self.peek() not in (None, "OR", "RPAREN"):
+            kind, prefix, text = self.tokens[self.pos]
+            self.pos += 1
+            if kind == "LPAREN":
+                node = self.parse_or()
+                if self.peek() == "RPAREN":
+                    self.pos += 1
+            elif kind == "PHRASE":
+                node = _phrase_node(text)
+                if node is not None and not prefix:
+                    prefix = "+"  # las frases entre comillas siempre deben cumplirse
+            else:
+                node = _word_node(text)
+            if node is None or _is_empty(node):
+                continue
+            if prefix == "+":
+                group.must.append(node)
+            elif prefix == "-":
+                group.must_not.append(node)
+            else:
+                group.should.append(node)
+        if not group.must and not group.must_not and len(group.should) == 1:
+            return group.should[0]
+        if len(group.must) == 1 and not group.should and not group.must_not:
+            return group.must[0]
+        return group
+
+
+def _word_node(text: str) -> Optional[Node]:
+    tokens = InvertedIndexService.tokenize_words(text)
+    if not tokens:
+        return None
+    if len(tokens) == 1:
+        return Term(tokens[0])
+    # "bet-el" se normaliza a dos palabras: se trata como frase
+    return Phrase(" ".join(tokens), tokens)
+
+
+def _phrase_node(text: str) -> Optional[Node]:
+    tokens = InvertedIndexService.tokenize_words(text)
+    if not tokens:
+        return None
+    return Phrase(" ".join(tokens), tokens)
+
+
+def _is_empty(node: Node) -> bool:
+    return isinstance(node, Group) and not (node.must or node.should or node.must_not)
+
+
+def _merge_and(left: Node, right: Node) -> Node:
+    if _is_empty(right):
+        return left
+    if _is_empty(left):
+        return right
+    return Group(must=[left, right])
+
+
+def parse_query(query: str) -> Node:
+    """
+    Convierte la consulta en un árbol booleano.
+    """
+    return _Parser(_lex(query)).parse()
+
+
+def needs_planner(node: Node) -> bool:
+    """
+    Indica si la consulta usa operadores booleanos. Las consultas de una sola frase
+    o de solo términos sin operador siguen el camino literal clásico.
+    """
+    if isinstance(node, (Term, Phrase)):
+        return False
+    if isinstance(node, Group):
+        return bool(node.must or node.must_not) or not all(isinstance(c, Term) for c in node.should)
+    return True
+
+
+# =============== operaciones sobre listas ordenadas ===============
+def gallop_intersect(small: List[int], large: List[int]) -> List[int]:
+    """
+    Intersección de listas ordenadas con búsqueda exponencial (galloping) sobre la mayor.
+    """
+    if len(small) > len(large):
+        small, large = large, small
+    out: List[int] = []
+    n = len(large)
+    lo = 0
+    for x in small:
+        # salto exponencial desde la última posición encontrada
+        step = 1
+        hi = lo
+        while hi < n and large[hi] < x:
+            lo = hi
+            hi += step
+            step <<= 1
+        lo = bisect_left(large, x, lo, min(hi + 1, n))
+        if lo >= n:
+            break
+        if large[lo] == x:
+            out.append(x)
+    return out
+
+
+def sorted_difference(base: List[int], excluded: List[int]) -> List[int]:
+    """
+    Diferencia base - excluded sobre listas ordenadas (merge lineal).
+    """
+    if not excluded:
+        return base
+    out: List[int] = []
+    j = 0
+    m = len(excluded)
+    for x in base:
+        while j < m and excluded[j] < x:
+            j += 1
+        if j < m and excluded[j] == x:
+            continue
+        out.append(x)
+    return out
+
+
+def sorted_union(lists: List[List[int]]) -> List[int]:
+    lists = [lst for lst in lists if lst]
+    if not lists:
+        return []
+    if len(lists) == 1:
+        return lists[0]
+    return sorted(set().union(*lists))
+
+
+# =============== planificador ===============
+class QueryPlanner:
+    """
+    Ejecuta el árbol booleano sobre las postings del índice inverso.
+    - AND: intersecta primero las listas más pequeñas y corta en cuanto queda vacío.
+    - NOT: se aplica como diferencia sobre el resultado ya restringido.
+    - OR: unión de los hijos, cada uno restringido al candidato actual.
+    """
+    def __init__(self, index_service: InvertedIndexService):
+        self.index_service = index_service
+
+    def estimate(self, node: Node) -> int:
+        idx = self.index_service
+        if isinstance(node, Term):
+            return idx.posting_size(node.token)
+        if isinstance(node, Phrase):
+            return min(idx.posting_size(t) for t in node.tokens)
+        if isinstance(node, Or):
+            return min(sum(self.estimate(c) for c in node.children), len(idx.doc_ids))
+        if node.must:
+            return min(self.estimate(c) for c in node.must)
+        if node.should:
+            return min(sum(self.estimate(c) for c in node.should), len(idx.doc_ids))
+        return len(idx.doc_ids)
+
+    def execute(self, node: Node, explain: bool = False, within: Optional[List[int]] = None) -> Tuple[List[int], Optional[Dict[str, Any]]]:
+        """
+        Devuelve los ordinales (ordenados) que cumplen la consulta y, si explain,
+        el plan ejecutado con estimaciones y cardinalidades por operador.
+        within restringe la evaluación a un conjunto previo de ordinales (p. ej. un filtro).
+        """
+        trace: Optional[Dict[str, Any]] = {} if explain else None
+        if within is not None and not within:
+            return [], trace
+        result = self._eval(node, within, trace)
+        return list(result), trace
+
+    def _eval(self, node: Node, within: Optional[List[int]], trace: Optional[Dict[str, Any]]) -> List[int]:
+        start = time.perf_counter()
+        if isinstance(node, Term):
+            result = self._eval_term(node, within)
+            if trace is not None:
+                trace.update({"op": "TERM", "token": node.token})
+        elif isinstance(node, Phrase):
+            result = self._eval_phrase(node, within)
+            if trace is not None:
+                trace.update({"op": "PHRASE", "phrase": node.text})
+        elif isinstance(node, Or):
+            result = self._eval_or(node.children, within, trace)
+            if trace is not None:
+                trace["op"] = "OR"
+        else:
+            result = self._eval_group(node, within, trace)
+        if trace is not None:
+            trace["estimate"] = self.estimate(node)
+            trace["cardinality"] = len(result)
+            trace["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+
+    def _eval_term(self, node: Term, within: Optional[List[int]]) -> List[int]:
+        postings = self.index_service.posting_list(node.token)
+        if within is None:
+            return postings
+        return gallop_intersect(within, postings)
+
+    def _eval_phrase(self, node: Phrase, within: Optional[List[int]]) -> List[int]:
+        idx = self.index_service
+        cand = within
+        for token in sorted(node.tokens, key=idx.posting_size):
+            postings = idx.posting_list(token)
+            cand = postings if cand is None else gallop_intersect(cand, postings)
+            if not cand:
+                return []
+        if len(node.tokens) == 1:
+            return cand
+        # Verificación palabra a palabra sobre el texto normalizado
+        pat = re.compile(rf"(?:^|\s){re.escape(node.text)}(?:\s|$)")
+        return [o for o in cand if pat.search(idx.normwords(o))]
+
+    def _eval_or(self, children: List[Node], within: Optional[List[int]], trace: Optional[Dict[str, Any]]) -> List[int]:
+        parts = []
+        child_traces = []
+        for child in children:
+            ct = {} if trace is not None else None
+            parts.append(self._eval(child, within, ct))
+            child_traces.append(ct)
+        if trace is not None:
+            trace["children"] = child_traces
+        return sorted_union(parts)
+
+    def _eval_group(self, node: Group, within: Optional[List[int]], trace: Optional[Dict[str, Any]]) -> List[int]:
+        if trace is not None:
+            trace.update({"op": "AND", "must": [], "should": [], "must_not": []})
+        result = within
+        # AND: de menor a mayor cardinalidad estimada, con corte temprano
+        ordered = sorted(node.must, key=self.estimate)
+        for i, child in enumerate(ordered):
+            ct = {} if trace is not None else None
+            result = self._eval(child, result, ct)
+            if trace is not None:
+                trace["must"].append(ct)
+            if not result:
+                if trace is not None:
+                    trace["must"].extend({"op": "SKIPPED", "estimate": self.estimate(c)} for c in ordered[i + 1:])
+                    trace["short_circuit"] = True
+                return []
+        if not node.must:
+            if node.should:
+                ct = {} if trace is not None else None
+                result = self._eval_or(node.should, within, ct)
+                if trace is not None:
+                    trace["should"] = ct.get("children", [])
+            elif result is None:
+                result = list(self.index_service.all_ordinals())
+        elif trace is not None and node.should:
+            # Con términos obligatorios, los opcionales no restringen el resultado
+            trace["should"] = [{"op": "IGNORED", "estimate": self.estimate(c)} for c in node.should]
+        if not result:
+            return []
+        for child in sorted(node.must_not, key=self.estimate):
+            ct = {} if trace is not None else None
+            excluded = self._eval(child, result, ct)
+            if trace is not None:
+                trace["must_not"].append(ct)
+            result = sorted_difference(result, excluded)
+            if not result:
+                if trace is not None:
+                    trace["short_circuit"] = True
+                return []
+        return result
+
+
+def node_to_dict(node: Node) -> Dict[str, Any]:
+    """
+    Representación serializable del árbol parseado (para explain).
+    """
+    if isinstance(node, Term):
+        return {"term": node.token}
+    if isinstance(node, Phrase):
+        return {"phrase": node.text}
+    if isinstance(node, Or):
+        return {"or": [node_to_dict(c) for c in node.children]}
+    return {
+        "must": [node_to_dict(c) for c in node.must],
+        "should": [node_to_dict(c) for c in node.should],
+        "must_not": [node_to_dict(c) for c in node.must_not],
+    }
@@ -0,0 +1,230 @@
+"""
+Almacenamiento columnar compacto para los campos de texto del corpus.
+
+Cada columna es un único buffer UTF-8 contiguo más un array de offsets indexado por
+ordinal de documento: el texto del documento i es buffer[offsets[i]:offsets[i+1]].
+Opcionalmente el buffer se divide en bloques de N documentos comprimidos por separado
+(zlib, o zstd si el paquete zstandard está instalado) para el texto "frío".
+Las cadenas solo se crean al leer, para los documentos que realmente se devuelven.
+"""
+
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import orjson
+
+try:
+    import zstandard
+except ImportError:  # dependencia opcional
+    zstandard = None
+
+CODECS = ("none", "zlib", "zstd")
+_MAGIC = b"APCOL1\n"
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    return zstandard.ZstdCompressor(level=9).compress(data)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def resolve_codec(codec: Optional[str]) -> str:
+    """
+    Normaliza el códec pedido; zstd cae a zlib si zstandard no está instalado.
+    """
+    codec = (codec or "none").lower()
+    if codec not in CODECS:
+        raise ValueError(f"Códec de compresión no soportado: {codec}")
+    if codec == "zstd" and zstandard is None:
+        return "zlib"
+    return codec
+
+
+class StringColumn:
+    """
+    Columna de cadenas: buffer contiguo (o bloques comprimidos) + offsets por ordinal.
+    """
+    def __init__(self, offsets: array, data: bytes = b"", codec: str = "none", block_size: int = 0,
+                 blocks: Optional[List[bytes]] = None, cache_blocks: int = 64):
+        self.offsets = offsets
+        self.data = data
+        self.codec = codec
+        self.block_size = block_size
+        self.blocks = blocks or []
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_blocks = cache_blocks
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, values: Iterable[str], codec: str = "none", block_size: int = 256) -> "StringColumn":
+        codec = resolve_codec(codec)
+        offsets = array("Q", [0])
+        chunks: List[bytes] = []
+        pos = 0
+        for v in values:
+            b = (v or "").encode("utf-8")
+            chunks.append(b)
+            pos += len(b)
+            offsets.append(pos)
+        if codec == "none":
+            return cls(offsets, b"".join(chunks))
+        blocks = [
+            _compress(codec, b"".join(chunks[i:i + block_size]))
+            for i in range(0, len(chunks), block_size)
+        ]
+        return cls(offsets, codec=codec, block_size=block_size, blocks=blocks)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get_bytes(self, ordinal: int) -> bytes:
+        start, end = self.offsets[ordinal], self.offsets[ordinal + 1]
+        if self.codec == "none":
+            return self.data[start:end]
+        block_no = ordinal // self.block_size
+        base = self.offsets[block_no * self.block_size]
+        raw = self._block(block_no)
+        return raw[start - base:end - base]
+
+    def get(self, ordinal: int) -> str:
+        return bytes(self.get_bytes(ordinal)).decode("utf-8")
+
+    def _block(self, block_no: int) -> bytes:
+        with self._lock:
+            raw = self._cache.get(block_no)
+            if raw is not None:
+                self._cache.move_to_end(block_no)
+                return raw
+        raw = _decompress(self.codec, self.blocks[block_no])
+        with self._lock:
+            self._cache[block_no] = raw
+            while len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        return raw
+
+    def nbytes(self) -> int:
+        """
+        Bytes ocupados por la columna (buffer o bloques comprimidos + offsets).
+        """
+        payload = len(self.data) if self.codec == "none" else sum(len(b) for b in self.blocks)
+        return payload + self.offsets.itemsize * len(self.offsets)
+
+
+class ColumnarStore:
+    """
+    Conjunto de columnas alineadas por ordinal, serializable a un único archivo binario.
+    """
+    def __init__(self, columns: Optional[Dict[str, StringColumn]] = None):
+        self.columns: Dict[str, StringColumn] = columns or {}
+
+    def __getitem__(self, name: str) -> StringColumn:
+        return self.columns[name]
+
+    def save(self, path: str) -> None:
+        header = {}
+        payloads: List[bytes] = []
+        for name, col in self.columns.items():
+            parts = [col.offsets.tobytes()]
+            parts += col.blocks if col.codec != "none" else [col.data]
+            header[name] = {
+                "codec": col.codec,
+                "block_size": col.block_size,
+                "parts": [len(p) for p in parts],
+            }
+            payloads.extend(parts)
+        head = orjson.dumps(header)
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", len(head)))
+            f.write(head)
+            for p in payloads:
+                f.write(p)
+
+    @classmethod
+    def load(cls, path: str) -> "ColumnarStore":
+        """
+        Lee cada parte (offsets, buffer o bloque) por separado: en memoria queda solo lo que
+        guarda cada columna (los bloques comprimidos, no el archivo entero).
+        """
+        columns: Dict[str, StringColumn] = {}
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"Formato de columnas desconocido: {path}")
+            (head_len,) = struct.unpack("<I", f.read(4))
+            header = orjson.loads(f.read(head_len))
+            for name, meta in header.items():
+                sizes = meta["parts"]
+                codec = meta["codec"]
+                if codec == "zstd" and zstandard is None:
+                    raise ValueError("El índice usa zstd y el paquete zstandard no está instalado")
+                offsets = array("Q")
+                offsets.frombytes(f.read(sizes[0]))
+                parts = [f.read(size) for size in sizes[1:]]
+                if codec == "none":
+                    columns[name] = StringColumn(offsets, parts[0] if parts else b"")
+                else:
+                    columns[name] = StringColumn(offsets, codec=codec, block_size=meta["block_size"], blocks=parts)
+        return cls(columns)
+
+    def nbytes(self) -> Dict[str, int]:
+        return {name: col.nbytes() for name, col in self.columns.items()}
+
+
+class ColumnView(Mapping):
+    """
+    Vista id -> texto sobre una columna, compatible con el uso previo de Dict[str, str]
+    (get, [], in, items). Las cadenas se decodifican solo al acceder.
+    """
+    def __init__(self, column: StringColumn, doc_ids: List[str], ordinal_by_id: Dict[str, int]):
+        self.column = column
+        self.doc_ids = doc_ids
+        self.ordinal_by_id = ordinal_by_id
+
+    def __getitem__(self, vid: str) -> str:
+        return self.column.get(self.ordinal_by_id[vid])
+
+    def get(self, vid: str, default: Optional[str] = None) -> Optional[str]:
+        ordinal = self.ordinal_by_id.get(vid)
+        if ordinal is None:
+            return default
+        return self.column.get(ordinal)
+
+    def __contains__(self, vid: object) -> bool:
+        return vid in self.ordinal_by_id
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.doc_ids)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        column = self.column
+        return ((vid, column.get(i)) for i, vid in enumerate(self.doc_ids))
+
+
+def deep_sizeof(obj, _seen=None) -> int:
+    """
+    Tamaño aproximado en memoria de contenedores anidados (dict, list, set, str).
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
@@ -4,17 +4,35 @@ from typing import List
 
 from typing import Optional
 
+from src.infra.metrics import stage
+
 class OllamaEmbedder:
     def __init__(self, base_url: Optional[str] = None, model: str = "nomic-embed-text"):
         self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://ollama:11434/api/embeddings")
         self.model = model
 
     async def embed(self, text: str) -> List[float]:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.post(
-                self.base_url,
-                json={"model": self.model, "prompt": text}
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data["embedding"]
+        with stage("embed"):
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(
+                    self.base_url,
+                    json={"model": self.model, "prompt": text}
+                )
+                response.raise_for_status()
+                data = response.json()
+                return data["embedding"]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Varios textos en una sola llamada a /api/embed (input como lista), en el mismo orden.
+        """
+        url = self.base_url.rsplit("/api/", 1)[0] + "/api/embed"
+        with stage("embed"):
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(
+                    url,
+                    json={"model": self.model, "input": texts}
+                )
+                response.raise_for_status()
+                data = response.json()
+                return data["embeddings"]
@@ -1,23 +1,45 @@
 import os
 import orjson
+from array import array
 import unicodedata
 import re
-from typing import Dict, Set, List
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
 
+from src.domain.scripture_reference import RefRange, book_order, parse_reference
+
+from src.services.columnar_store import ColumnarStore, ColumnView, StringColumn, deep_sizeof, resolve_codec
+from src.services.metadata_index import MetadataIndex, extract_fields
+
+INDEX_FORMAT = 2
+_EMPTY_POSTINGS = array("I")
+
 class InvertedIndexService:
     """
     Servicio para gestionar el índice inverso, con carga desde disco y serialización optimizada.
     Aplica normalización y tokenización eficiente.
     """
-    def __init__(self, jsonl_path: str, index_path: str = None):
+    def __init__(self, jsonl_path: str, index_path: str = None, text_compression: Optional[str] = None):
         self.jsonl_path = jsonl_path
         self.index_path = index_path or jsonl_path + ".idx"
-        self.text_by_id: Dict[str, str] = {}
-        self.ref_by_id: Dict[str, str] = {}
-        self.normwords_by_id: Dict[str, str] = {}
-        self.postings: Dict[str, Set[str]] = {}
+        # Texto y referencia en columnas contiguas por ordinal (ver columnar_store)
+        self.columns_path = self.index_path + ".cols"
+        self.text_compression = resolve_codec(text_compression)
+        self.columns = ColumnarStore()
+        # Postings: token -> ordinales ordenados (array compacto de uint32)
+        self.postings: Dict[str, array] = {}
+        # Ordinal = posición del documento en el corpus (orden canónico del JSONL)
+        self.doc_ids: List[str] = []
+        self.ordinal_by_id: Dict[str, int] = {}
+        self.metadata_index = MetadataIndex()
+        # Índice (libro, capítulo, versículo) -> ordinal, ordenado para escaneos por rango
+        self.ref_keys: List[Tuple[int, int, int]] = []
+        self.ref_ordinals: List[int] = []
+        # Todos los documentos guardan la referencia en metadata.reference (la clave del filtro de Pinecone)
+        self.references_in_metadata = True
         self._load_or_build_index()
+        self._build_ordinals()
 
     def _load_or_build_index(self):
         if Path(self.index_path).exists():
@@ -28,36 +50,222 @@ class InvertedIndexService:
 
     def _build_index(self):
         self.postings = {}
+        self.metadata_index = MetadataIndex()
+        self.ordinal_by_id = {}
+        self.references_in_metadata = True
+        texts: List[str] = []
+        refs: List[str] = []
+        metas: List[str] = []
+        postings: Dict[str, List[int]] = {}
         with open(self.jsonl_path, "r", encoding="utf-8") as f:
             for line in f:
                 o = orjson.loads(line)
                 vid = o["id"]
                 ref = (o.get("metadata") or {}).get("reference") or o.get("Referencia") or ""
+                if not (o.get("metadata") or {}).get("reference"):
+                    self.references_in_metadata = False
                 txt = o.get("text") or o.get("Contenido") or ""
-                self.text_by_id[vid] = txt
-                self.ref_by_id[vid] = ref
-                blob_words = self.norm_words(ref + " " + txt)
-                self.normwords_by_id[vid] = blob_words
-                for t in self.tokenize_words(blob_words):
-                    self.postings.setdefault(t, set()).add(vid)
+                ordinal = self.ordinal_by_id.setdefault(vid, len(self.ordinal_by_id))
+                self.metadata_index.add(ordinal, extract_fields(vid, ref, o.get("metadata")))
+                meta = orjson.dumps(o.get("metadata") or {}).decode()
+                if ordinal == len(texts):
+                    texts.append(txt)
+                    refs.append(ref)
+                    metas.append(meta)
+                else:
+                    texts[ordinal] = txt
+                    refs[ordinal] = ref
+                    metas[ordinal] = meta
+                for t in set(self.tokenize_words(ref + " " + txt)):
+                    postings.setdefault(t, []).append(ordinal)
+        self.doc_ids = list(self.ordinal_by_id)
+        # Un id repetido en el JSONL reutiliza su ordinal: se ordena y deduplica
+        self.postings = {t: array("I", sorted(set(ords))) for t, ords in postings.items()}
+        self._set_columns(texts, refs, metas)
+
+    def _set_columns(self, texts: List[str], refs: List[str], metas: List[str]):
+        self.columns = ColumnarStore({
+            "text": StringColumn.build(texts, codec=self.text_compression),
+            "ref": StringColumn.build(refs),
+            # Metadatos completos del JSONL (JSON por ordinal) para hidratar resultados sin Pinecone
+            "meta": StringColumn.build(metas, codec=self.text_compression),
+        })
+
+    def _corpus_metadata(self, doc_ids: List[str]) -> List[str]:
+        """
+        Metadatos del JSONL (JSON) en el orden de doc_ids; "{}" si falta el corpus o el id.
+        """
+        by_id: Dict[str, str] = {}
+        if Path(self.jsonl_path).exists():
+            with open(self.jsonl_path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        o = orjson.loads(line)
+                        by_id[o["id"]] = orjson.dumps(o.get("metadata") or {}).decode()
+        return [by_id.get(vid, "{}") for vid in doc_ids]
 
     def _save_index(self):
         data = {
-            "text_by_id": self.text_by_id,
-            "ref_by_id": self.ref_by_id,
-            "normwords_by_id": self.normwords_by_id,
-            "postings": {k: list(v) for k, v in self.postings.items()}
+            "format": INDEX_FORMAT,
+            "doc_ids": self.doc_ids,
+            "postings": {k: v.tolist() for k, v in self.postings.items()},
+            "metadata_index": self.metadata_index.finalize().to_dict(),
+            "references_in_metadata": self.references_in_metadata,
         }
+        self.columns.save(self.columns_path)
         with open(self.index_path, "wb") as f:
             f.write(orjson.dumps(data))
 
     def _load_index(self):
         with open(self.index_path, "rb") as f:
             data = orjson.loads(f.read())
-        self.text_by_id = data["text_by_id"]
-        self.ref_by_id = data["ref_by_id"]
-        self.normwords_by_id = data["normwords_by_id"]
-        self.postings = {k: set(v) for k, v in data["postings"].items()}
+        if data.get("format") == INDEX_FORMAT:
+            if not Path(self.columns_path).exists():
+                # Falta el archivo de columnas: se reconstruye todo desde el JSONL
+                self._build_index()
+                self._save_index()
+                return
+            self.doc_ids = data["doc_ids"]
+            self.postings = {k: array("I", v) for k, v in data["postings"].items()}
+            self.columns = ColumnarStore.load(self.columns_path)
+            text = self.columns["text"]
+            changed = False
+            if text.codec != self.text_compression:
+                self.columns.columns["text"] = StringColumn.build(
+                    (text.get(i) for i in range(len(text))), codec=self.text_compression
+                )
+                changed = True
+            if self.columns.columns.pop("norm", None) is not None:
+                # Copia normalizada sin comprimir de versiones anteriores: ya no se usa
+                changed = True
+            if "meta" not in self.columns.columns:
+                # Columnas guardadas antes de existir la columna de metadatos
+                self.columns.columns["meta"] = StringColumn.build(
+                    self._corpus_metadata(self.doc_ids), codec=self.text_compression
+                )
+                changed = True
+            if changed:
+                self.columns.save(self.columns_path)
+        else:
+            # Formato anterior (diccionarios id -> texto en el JSON): se convierte a columnas
+            self.doc_ids = list(data["text_by_id"])
+            self._set_columns(
+                [data["text_by_id"][vid] for vid in self.doc_ids],
+                [data["ref_by_id"].get(vid, "") for vid in self.doc_ids],
+                self._corpus_metadata(self.doc_ids),
+            )
+            ordinal_by_id = {vid: i for i, vid in enumerate(self.doc_ids)}
+            self.postings = {
+                k: array("I", sorted(ordinal_by_id[vid] for vid in set(v) if vid in ordinal_by_id))
+                for k, v in data["postings"].items()
+            }
+        if "references_in_metadata" in data:
+            self.references_in_metadata = data["references_in_metadata"]
+        else:
+            self.references_in_metadata = all(
+                self.metadata(o).get("reference") for o in range(len(self.doc_ids))
+            )
+        if "metadata_index" in data:
+            self.metadata_index = MetadataIndex.from_dict(data["metadata_index"])
+        else:
+            # Índice guardado por una versión anterior: se deducen los campos de id y referencia
+            refs = self.columns["ref"]
+            self.metadata_index = MetadataIndex.from_documents(
+                (i, vid, refs.get(i), None) for i, vid in enumerate(self.doc_ids)
+            )
+
+    def _build_ordinals(self):
+        self.ordinal_by_id = {vid: i for i, vid in enumerate(self.doc_ids)}
+        self.text_by_id = ColumnView(self.columns["text"], self.doc_ids, self.ordinal_by_id)
+        self.ref_by_id = ColumnView(self.columns["ref"], self.doc_ids, self.ordinal_by_id)
+        self.metadata_index.finalize()
+        self._build_ref_index()
+
+    def _build_ref_index(self):
+        pairs = []
+        refs = self.columns["ref"]
+        for ordinal in range(len(self.doc_ids)):
+            book, chap, verse = parse_reference(refs.get(ordinal))
+            order = book_order(book) if chap else None
+            if order is not None:
+                pairs.append(((order, chap, verse), ordinal))
+        pairs.sort()
+        self.ref_keys = [k for k, _ in pairs]
+        self.ref_ordinals = [o for _, o in pairs]
+
+    def lookup_references(self, ranges: List[RefRange]) -> List[int]:
+        """
+        Resuelve rangos de referencias a ordinales con búsqueda binaria y escaneo contiguo,
+        en orden canónico y sin duplicados.
+        """
+        out: List[int] = []
+        seen = set()
+        for r in ranges:
+            lo = bisect_left(self.ref_keys, r.start_key())
+            hi = bisect_right(self.ref_keys, r.end_key())
+            for o in self.ref_ordinals[lo:hi]:
+                if o not in seen:
+                    seen.add(o)
+                    out.append(o)
+        return out
+
+    def posting_list(self, token: str) -> array:
+        """
+        Postings del token como ordinales ordenados (array uint32, sin copiar).
+        """
+        return self.postings.get(token) or _EMPTY_POSTINGS
+
+    def posting_size(self, token: str) -> int:
+        return len(self.postings.get(token, ()))
+
+    def all_ordinals(self) -> range:
+        return range(len(self.doc_ids))
+
+    def text(self, ordinal: int) -> str:
+        return self.columns["text"].get(ordinal)
+
+    def ref(self, ordinal: int) -> str:
+        return self.columns["ref"].get(ordinal)
+
+    def metadata(self, ordinal: int) -> Dict[str, Any]:
+        """
+        Metadatos del documento tal como están en el JSONL.
+        """
+        return orjson.loads(self.columns["meta"].get(ordinal))
+
+    def documents(self, ids: Iterable[str]) -> Dict[str, Tuple[str, str, Dict[str, Any]]]:
+        """
+        (referencia, texto, metadatos) de varios ids a la vez; los ids desconocidos se omiten.
+        Se leen en orden de ordinal para aprovechar los bloques de columnas ya descomprimidos.
+        """
+        ordinals = sorted(o for o in (self.ordinal_by_id.get(vid) for vid in ids) if o is not None)
+        doc_ids = self.doc_ids
+        return {doc_ids[o]: (self.ref(o), self.text(o), self.metadata(o)) for o in ordinals}
+
+    def norm_text(self, ordinal: int) -> str:
+        """
+        Contenido normalizado (minúsculas, sin tildes ni puntuación).
+        """
+        return self.norm_words(self.text(ordinal))
+
+    def normwords(self, ordinal: int) -> str:
+        """
+        Texto normalizado (referencia + contenido).
+        """
+        ref = self.norm_words(self.ref(ordinal))
+        text = self.norm_text(ordinal)
+        return f"{ref} {text}" if ref and text else ref or text
+
+    def memory_report(self) -> Dict[str, int]:
+        """
+        Bytes aproximados por estructura del índice (columnas, postings, ids, metadatos).
+        """
+        report = {f"column_{name}": size for name, size in self.columns.nbytes().items()}
+        report["postings"] = deep_sizeof(self.postings)
+        report["doc_ids"] = deep_sizeof(self.doc_ids)
+        report["ordinal_by_id"] = deep_sizeof(self.ordinal_by_id)
+        report["ref_index"] = deep_sizeof(self.ref_keys) + deep_sizeof(self.ref_ordinals)
+        return report
 
     @staticmethod
     def norm_basic(s: str) -> str:
@@ -0,0 +1,244 @@
+"""
+Índices de metadatos por campo (volumen, libro, capítulo, versículo, idioma).
+Cada valor de cada campo apunta a un Bitmap de ordinales, de modo que los filtros
+de SearchRequest.filters se evalúan como operaciones de bitmaps.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.services.bitmap import Bitmap
+
+
+FIELDS = ("volume", "book", "chapter", "verse", "language")
+NUMERIC_FIELDS = ("chapter", "verse")
+
+# Claves aceptadas en metadata de cada documento, por campo canónico
+FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "volume": ("volume", "volumen", "volume_id"),
+    "book": ("book", "libro", "libro_id"),
+    "chapter": ("chapter", "capitulo", "capítulo"),
+    "verse": ("verse", "versiculo", "versículo"),
+    "language": ("language", "idioma", "lang"),
+}
+
+# Los vectores se suben con los metadatos del JSONL (más contenido): la referencia va en
+# metadata.reference. Los filtros se resuelven con los bitmaps locales y se envían como lista de
+# referencias solo si todo el corpus local la guarda en esa clave (ver references_in_metadata).
+PINECONE_REFERENCE_KEY = "reference"
+# Referencias máximas en un $in: por encima se piden más candidatos y se filtran por id
+PINECONE_IN_MAX = 200
+
+_OPERATORS = ("eq", "ne", "in", "nin", "gt", "gte", "lt", "lte")
+
+
+def norm_value(field: str, value: Any) -> Any:
+    """
+    Normaliza un valor de metadato para indexarlo o compararlo.
+    Los campos numéricos se convierten a int; los textos, a minúsculas sin tildes.
+    """
+    if value is None:
+        return None
+    if field in NUMERIC_FIELDS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    s = str(value).replace("—", "-").replace("–", "-").lower()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(c for c in s if unicodedata.category(c) != "Mn")
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _parse_reference(ref: str) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    m = re.match(r"^(.+?)\s+(\d+)(?::(\d+))?$", (ref or "").strip())
+    if not m:
+        return None, None, None
+    return m.group(1).strip(), int(m.group(2)), int(m.group(3)) if m.group(3) else None
+
+
+def extract_fields(vid: str, ref: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Obtiene los campos filtrables de un documento: primero de metadata y, si faltan,
+    deduciéndolos de la referencia ("Alma 32:21") y del prefijo del id ("BM-alma-32-021").
+    """
+    metadata = metadata or {}
+    values: Dict[str, Any] = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for key in aliases:
+            if metadata.get(key) is not None:
+                values[field] = metadata[key]
+                break
+    if not {"book", "chapter", "verse"} <= values.keys():
+        book, chap, verse = _parse_reference(ref)
+        values.setdefault("book", book)
+        values.setdefault("chapter", chap)
+        values.setdefault("verse", verse)
+    if values.get("volume") is None and "-" in vid:
+        values["volume"] = vid.split("-", 1)[0]
+    out = {}
+    for field in FIELDS:
+        v = norm_value(field, values.get(field))
+        if v is not None and v != "":
+            out[field] = v
+    return out
+
+
+class MetadataIndex:
+    """
+    Índice campo -> valor -> Bitmap de ordinales.
+    """
+    def __init__(self, size: int = 0):
+        self.size = size
+        self.fields: Dict[str, Dict[Any, Bitmap]] = {f: {} for f in FIELDS}
+        self._pending: Dict[str, Dict[Any, List[int]]] = {f: {} for f in FIELDS}
+
+    # --------- construcción ---------
+    def add(self, ordinal: int, values: Dict[str, Any]) -> None:
+        for field, value in values.items():
+            self._pending[field].setdefault(value, []).append(ordinal)
+        self.size = max(self.size, ordinal + 1)
+
+    def finalize(self) -> "MetadataIndex":
+        for field, by_value in self._pending.items():
+            for value, ordinals in by_value.items():
+                bm = Bitmap.from_iterable(ordinals)
+                current = self.fields[field].get(value)
+                self.fields[field][value] = bm if current is None else current | bm
+        self._pending = {f: {} for f in FIELDS}
+        return self
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Tuple[int, str, str, Optional[Dict[str, Any]]]]) -> "MetadataIndex":
+        """
+        Construye el índice a partir de tuplas (ordinal, id, referencia, metadata).
+        """
+        index = cls()
+        for ordinal, vid, ref, metadata in docs:
+            index.add(ordinal, extract_fields(vid, ref, metadata))
+        return index.finalize()
+
+    # --------- serialización ---------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "fields": {
+                field: {str(value): bm.to_list() for value, bm in by_value.items()}
+                for field, by_value in self.fields.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MetadataIndex":
+        index = cls(size=data.get("size", 0))
+        for field, by_value in data.get("fields", {}).items():
+            if field not in index.fields:
+                continue
+            for value, ordinals in by_value.items():
+                key = int(value) if field in NUMERIC_FIELDS else value
+                index.fields[field][key] = Bitmap.from_sorted(ordinals)
+        return index
+
+    # --------- evaluación de filtros ---------
+    def evaluate(self, filters: Optional[Dict[str, Any]]) -> Optional[Bitmap]:
+        """
+        Evalúa filtros como {"book": "Alma", "chapter": {"gte": 30}} y devuelve el Bitmap
+        de ordinales que los cumplen (AND entre campos). None si no hay filtros.
+        Lanza ValueError ante campos u operadores desconocidos.
+        """
+        if not filters:
+            return None
+        result: Optional[Bitmap] = None
+        for field, cond in filters.items():
+            bm = self._evaluate_field(field, cond)
+            result = bm if result is None else result & bm
+            if not result:
+                return Bitmap()
+        return result
+
+    def _evaluate_field(self, field: str, cond: Any) -> Bitmap:
+        conditions = _conditions(field, cond)
+        by_value = self.fields[field]
+        result: Optional[Bitmap] = None
+        for op, operand in conditions:
+            if op in ("eq", "in", "ne", "nin"):
+                operands = operand if isinstance(operand, list) else [operand]
+                keys = [norm_value(field, v) for v in operands]
+                bm = Bitmap.union_all(by_value[k] for k in keys if k in by_value)
+                if op in ("ne", "nin"):
+                    bm = Bitmap.full(self.size) - bm
+            else:
+                bound = norm_value(field, operand)
+                if bound is None:
+                    raise ValueError(f"Valor no comparable para {field}: {operand}")
+                bm = Bitmap.union_all(b for v, b in by_value.items() if _compare(op, v, bound))
+            result = bm if result is None else result & bm
+        return result if result is not None else Bitmap.full(self.size)
+
+
+def _conditions(field: str, cond: Any) -> List[Tuple[str, Any]]:
+    """
+    Normaliza la condición de un campo a pares (operador, operando) y la valida.
+    Un valor simple equivale a eq y una lista a in.
+    """
+    if field not in FIELD_ALIASES:
+        raise ValueError(f"Campo de filtro no soportado: {field}")
+    if not isinstance(cond, dict):
+        cond = {"in": cond} if isinstance(cond, list) else {"eq": cond}
+    out = []
+    for raw_op, operand in cond.items():
+        op = raw_op.lstrip("$")
+        if op not in _OPERATORS:
+            raise ValueError(f"Operador de filtro no soportado: {raw_op}")
+        out.append((op, operand))
+    return out
+
+
+def validate_filters(filters: Optional[Dict[str, Any]]) -> None:
+    """
+    Lanza ValueError si algún campo u operador no está soportado.
+    """
+    for field, cond in (filters or {}).items():
+        _conditions(field, cond)
+
+
+def record_matches(values: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evalúa los filtros sobre los campos de un solo documento (ver extract_fields).
+    Se usa al recorrer el corpus en streaming, sin pasar por los bitmaps.
+    """
+    if not filters:
+        return True
+    for field, cond in filters.items():
+        value = values.get(field)
+        for op, operand in _conditions(field, cond):
+            if op in ("eq", "in", "ne", "nin"):
+                operands = operand if isinstance(operand, list) else [operand]
+                hit = value in {norm_value(field, v) for v in operands}
+                if hit != (op in ("eq", "in")):
+                    return False
+            elif value is None or not _compare(op, value, norm_value(field, operand)):
+                return False
+    return True
+
+
+def _compare(op: str, value: Any, bound: Any) -> bool:
+    try:
+        if op == "gt":
+            return value > bound
+        if op == "gte":
+            return value >= bound
+        if op == "lt":
+            return value < bound
+        return value <= bound
+    except TypeError:
+        return False
+
+
+def to_pinecone_filter(references: Sequence[str]) -> Dict[str, Any]:
+    """
+    Filtro nativo de Pinecone para las referencias que ya cumplen los filtros locales
+    (["Alma 32:21", "Alma 32:28"] -> {"reference": {"$in": ["Alma 32:21", "Alma 32:28"]}}).
+    """
+    return {PINECONE_REFERENCE_KEY: {"$in": list(dict.fromkeys(references))}}
@@ -0,0 +1,80 @@
+import base64
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def query_fingerprint(query: str, mode: str, filters: Optional[Dict[str, Any]]) -> str:
+    """
+    Huella corta de la consulta, para rechazar cursores de otra búsqueda.
+    """
+    raw = orjson.dumps([query, mode, filters], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """
+    Cursor opaco: JSON compacto en base64 url-safe, sin relleno.
+    """
+    return base64.urlsafe_b64encode(orjson.dumps(state)).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = orjson.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeEncodeError):
+        raise InvalidCursor("Cursor inválido")
+    if not isinstance(state, dict):
+        raise InvalidCursor("Cursor inválido")
+    return state
+
+
+class SnapshotStore:
+    """
+    Guarda durante poco tiempo la lista de candidatos de una búsqueda semántica,
+    para servir páginas siguientes sin volver a generar el embedding ni consultar Pinecone.
+    LRU acotado por número de entradas y con caducidad por TTL.
+    """
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, candidates: List[Dict[str, Any]]) -> str:
+        snapshot_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self._entries[snapshot_id] = (time.monotonic() + self.ttl_seconds, candidates)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot_id
+
+    def get(self, snapshot_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(snapshot_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, candidates = entry
+            if expires < time.monotonic():
+                del self._entries[snapshot_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(snapshot_id)
+            self.hits += 1
+            return candidates
+
+    def __len__(self) -> int:
+        return len(self._entries)
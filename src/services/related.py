@@ -0,0 +1,295 @@
+"""
+Versículos relacionados precalculados: grafo kNN sobre los embeddings guardados.
+
+- RelatedIndex.build normaliza los vectores y calcula, por bloques de filas, los N vecinos
+  más cercanos de cada versículo con un producto de matrices local (similitud coseno).
+- Se guarda en un directorio versionado: cada versión (v-*/) tiene ids.json, vectors.npy
+  (float32, se abre con mmap), neighbors.npy (int32, -1 = hueco) y scores.npy (float32), y el
+  archivo CURRENT apunta a la vigente. La consulta lee una fila: O(k).
+- update() recalcula solo las filas afectadas por un upsert: los vectores cambiados, los
+  versículos que los tenían como vecinos y los que ahora los superan en su lista. Los cambios
+  se guardan por lotes con flush().
+
+Trabajo offline: python -m src.services.related --corpus versiculos.jsonl --out related/
+(lee los vectores de Pinecone con fetch por lotes).
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+NO_NEIGHBOR = -1
+# Puntero a la versión vigente dentro del directorio del grafo
+CURRENT = "CURRENT"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Filas sin embedding (norma 0) quedan a cero y se excluyen como vecinas
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def _top_k_rows(rows: np.ndarray, vectors: np.ndarray, valid: np.ndarray, k: int, batch: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vecinos y scores de las filas pedidas contra todos los vectores válidos, por bloques.
+    """
+    neighbors = np.full((len(rows), k), NO_NEIGHBOR, dtype=np.int32)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+    n = len(vectors)
+    k_eff = min(k, n - 1)
+    if k_eff <= 0:
+        return neighbors, scores
+    for start in range(0, len(rows), batch):
+        block = rows[start:start + batch]
+        sims = vectors[block] @ vectors.T
+        sims[:, ~valid] = -np.inf
+        sims[np.arange(len(block)), block] = -np.inf
+        part = np.argpartition(-sims, k_eff - 1, axis=1)[:, :k_eff]
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_sims, axis=1, kind="stable")
+        top = np.take_along_axis(part, order, axis=1)
+        top_sims = np.take_along_axis(part_sims, order, axis=1)
+        missing = ~np.isfinite(top_sims) | ~valid[block][:, None]
+        top[missing] = NO_NEIGHBOR
+        top_sims[missing] = 0.0
+        neighbors[start:start + len(block), :k_eff] = top
+        scores[start:start + len(block), :k_eff] = top_sims
+    return neighbors, scores
+
+
+class RelatedIndex:
+    """
+    Las matrices viven en búferes con holgura (crecen al doble): un upsert escribe solo las
+    filas afectadas, sin copiar el grafo. related() y la publicación de filas comparten un
+    cerrojo corto; update() y flush() se serializan con otro.
+    """
+    def __init__(self, ids: List[str], vectors: np.ndarray, neighbors: np.ndarray, scores: np.ndarray,
+                 path: Optional[str] = None, batch: int = 1024):
+        self.ids = ids
+        self.ordinal_by_id = {vid: i for i, vid in enumerate(ids)}
+        self._vectors = vectors
+        self._neighbors = neighbors
+        self._scores = scores
+        self.path = path
+        self.batch = batch
+        # Hay cambios sin guardar (los persiste flush)
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._rows_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    @property
+    def k(self) -> int:
+        return self._neighbors.shape[1]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:len(self.ids)]
+
+    @property
+    def neighbors(self) -> np.ndarray:
+        return self._neighbors[:len(self.ids)]
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self._scores[:len(self.ids)]
+
+    @classmethod
+    def build(cls, ids: Sequence[str], vectors: np.ndarray, k: int = 20, batch: int = 1024) -> "RelatedIndex":
+        vectors = _normalize(vectors)
+        valid = np.linalg.norm(vectors, axis=1) > 0
+        neighbors, scores = _top_k_rows(np.arange(len(ids)), vectors, valid, k, batch)
+        return cls(list(ids), vectors, neighbors, scores, batch=batch)
+
+    def related(self, vid: str, limit: Optional[int] = None) -> Optional[List[Tuple[str, float]]]:
+        """
+        Vecinos (id, score) de vid, de más a menos parecido. None si vid no está en el grafo.
+        """
+        with self._rows_lock:
+            row = self.ordinal_by_id.get(vid)
+            if row is None:
+                return None
+            neighbors, scores = self._neighbors[row, :limit].tolist(), self._scores[row, :limit].tolist()
+            ids = self.ids
+            out = []
+            for o, score in zip(neighbors, scores):
+                if o == NO_NEIGHBOR:
+                    break
+                out.append((ids[o], round(score, 6)))
+        return out
+
+    def _reserve(self, rows: int) -> None:
+        """
+        Búferes escribibles con sitio para rows filas; al crecer se dobla la capacidad.
+        """
+        capacity = len(self._neighbors)
+        if capacity < rows:
+            capacity = max(rows, 2 * capacity)
+        used = len(self.ids)
+        buffers = []
+        for array, fill in ((self._vectors, 0.0), (self._neighbors, NO_NEIGHBOR), (self._scores, 0.0)):
+            if len(array) < capacity or not array.flags.writeable:
+                # Al cargar, los vectores están en mmap de solo lectura: se copian una vez
+                grown = np.full((capacity, array.shape[1]), fill, dtype=array.dtype)
+                grown[:used] = array[:used]
+                array = grown
+            buffers.append(array)
+        with self._rows_lock:
+            self._vectors, self._neighbors, self._scores = buffers
+
+    def update(self, changed: Dict[str, Sequence[float]]) -> int:
+        """
+        Aplica vectores nuevos o cambiados y recalcula las filas afectadas. Devuelve cuántas.
+        No guarda en disco: marca el grafo como modificado para el siguiente flush().
+        """
+        if not changed:
+            return 0
+        with self._lock:
+            values = np.array([changed[vid] for vid in changed], dtype=np.float32)
+            if values.ndim != 2 or values.shape[1] != self._vectors.shape[1]:
+                raise ValueError(f"Dimensión de embedding distinta a la del grafo ({self._vectors.shape[1]})")
+            new_ids = [vid for vid in changed if vid not in self.ordinal_by_id]
+            new_ordinals = {vid: len(self.ids) + i for i, vid in enumerate(new_ids)}
+            n = len(self.ids) + len(new_ids)
+            self._reserve(n)
+            vectors, neighbors, scores = self._vectors[:n], self._neighbors[:n], self._scores[:n]
+            touched = np.array([self.ordinal_by_id.get(vid, new_ordinals.get(vid)) for vid in changed], dtype=np.int64)
+            # Las lecturas no usan los vectores: se escriben en su sitio
+            vectors[touched] = _normalize(values)
+            valid = np.linalg.norm(vectors, axis=1) > 0
+            # Filas que tenían a un tocado como vecino (su score cambió) o a las que ahora entra uno
+            had_touched = np.isin(neighbors, touched).any(axis=1)
+            kth = np.where(neighbors[:, -1] == NO_NEIGHBOR, -np.inf, scores[:, -1])
+            sims = vectors @ vectors[touched].T
+            sims[touched, np.arange(len(touched))] = -np.inf
+            improved = (sims > kth[:, None]).any(axis=1) & valid
+            rows = np.union1d(touched, np.flatnonzero(had_touched | improved))
+            new_neighbors, new_scores = _top_k_rows(rows, vectors, valid, self.k, self.batch)
+            with self._rows_lock:
+                self.ids.extend(new_ids)
+                neighbors[rows] = new_neighbors
+                scores[rows] = new_scores
+                self.ordinal_by_id.update(new_ordinals)
+            self.dirty = True
+            return len(rows)
+
+    def _snapshot(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            n = len(self.ids)
+            snapshot = list(self.ids), self._vectors[:n].copy(), self._neighbors[:n].copy(), self._scores[:n].copy()
+            self.dirty = False
+        return snapshot
+
+    def flush(self) -> bool:
+        """
+        Guarda en path los cambios acumulados desde el último guardado. True si escribió.
+        La copia se hace bajo el cerrojo; la escritura, fuera (las actualizaciones siguen).
+        """
+        with self._save_lock:
+            if not self.dirty or not self.path:
+                return False
+            snapshot = self._snapshot()
+            try:
+                _write(self.path, *snapshot)
+            except Exception:
+                self.dirty = True
+                raise
+            return True
+
+    def save(self, path: str) -> None:
+        with self._save_lock:
+            _write(path, *self._snapshot())
+            self.path = path
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, CURRENT))
+
+    @classmethod
+    def load(cls, path: str) -> "RelatedIndex":
+        with open(os.path.join(path, CURRENT), "r", encoding="utf-8") as f:
+            version = os.path.join(path, f.read().strip())
+        with open(os.path.join(version, "ids.json"), "rb") as f:
+            ids = orjson.loads(f.read())
+        # Los vectores solo se leen al actualizar: mmap en lugar de cargarlos en memoria
+        vectors = np.load(os.path.join(version, "vectors.npy"), mmap_mode="r")
+        neighbors = np.load(os.path.join(version, "neighbors.npy"))
+        scores = np.load(os.path.join(version, "scores.npy"))
+        return cls(ids, vectors, neighbors, scores, path=path)
+
+
+def _write(path: str, ids: List[str], vectors: np.ndarray, neighbors: np.ndarray, scores: np.ndarray) -> None:
+    """
+    Escribe una versión completa en un directorio nuevo y la publica con un solo rename del
+    puntero CURRENT: un fallo a mitad deja intacta la versión anterior. Luego borra las viejas.
+    """
+    os.makedirs(path, exist_ok=True)
+    version = tempfile.mkdtemp(prefix="v-", dir=path)
+    try:
+        for name, array in (("vectors", vectors), ("neighbors", neighbors), ("scores", scores)):
+            np.save(os.path.join(version, f"{name}.npy"), array)
+        with open(os.path.join(version, "ids.json"), "wb") as f:
+            f.write(orjson.dumps(ids))
+    except BaseException:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+    pointer = os.path.join(path, CURRENT + ".tmp")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version))
+    os.replace(pointer, os.path.join(path, CURRENT))
+    for entry in os.listdir(path):
+        if entry.startswith("v-") and entry != os.path.basename(version):
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+
+def _iter_corpus_ids(corpus_path: str) -> Iterable[str]:
+    with open(corpus_path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)["id"]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from src.adapters.pinecone_adapter import PineconeAdapter
+
+    parser = argparse.ArgumentParser(description="Calcula el grafo de versículos relacionados (kNN) desde Pinecone")
+    parser.add_argument("--corpus", default=os.getenv("JSONL_PATH", "versiculos.jsonl"))
+    parser.add_argument("--out", default=os.getenv("RELATED_PATH", "related"))
+    parser.add_argument("-k", type=int, default=int(os.getenv("RELATED_K", "20")), help="vecinos por versículo")
+    parser.add_argument("--batch", type=int, default=1024, help="filas por bloque del producto de matrices")
+    args = parser.parse_args(argv)
+
+    adapter = PineconeAdapter(
+        api_key=os.getenv("PINECONE_API_KEY", ""),
+        environment=os.getenv("PINECONE_ENVIRONMENT", "us-east1-gcp"),
+        index_name=os.getenv("PINECONE_INDEX", "escrituras"),
+        namespace=os.getenv("PINECONE_NAMESPACE", "es"),
+        host=os.getenv("PINECONE_HOST") or None
+    )
+    ids = list(dict.fromkeys(_iter_corpus_ids(args.corpus)))
+    t0 = time.perf_counter()
+    found = adapter.fetch_vectors(ids)
+    dim = len(next(iter(found.values()))) if found else 0
+    vectors = np.zeros((len(ids), dim), dtype=np.float32)
+    for i, vid in enumerate(ids):
+        values = found.get(vid)
+        if values is not None:
+            vectors[i] = values
+    t1 = time.perf_counter()
+    index = RelatedIndex.build(ids, vectors, k=args.k, batch=args.batch)
+    t2 = time.perf_counter()
+    index.save(args.out)
+    print(f"{len(ids)} versículos, {len(found)} con embedding, k={args.k}: "
+          f"fetch {t1 - t0:.1f}s, kNN {t2 - t1:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Índice repartido en shards: un corpus (traducción / namespace de Pinecone) por shard.
+
+- ShardCache: shards cargados bajo demanda con expulsión LRU de los fríos; los fijados (pin)
+  no se expulsan. Cada ShardedSearch tiene la suya y se la pasa a search_shard en sus hilos; los
+  workers del pool de procesos usan la caché global de su proceso (configure), de modo que la
+  misma función sirve para los dos executors.
+- ShardedSearch: reparte la consulta literal entre los shards elegidos en un executor y
+  mezcla el top-k global; la semántica consulta cada namespace en paralelo con un solo embedding.
+  Los shards fijados (el corpus principal) se consultan siempre en hilos del proceso que los
+  tiene cargados; con executor="process" solo los demás van al pool de procesos.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.infra.metrics import stage
+from src.services.inverted_index import InvertedIndexService
+from src.usecases.search_usecase import SearchUseCase
+
+
+class ShardSpec(NamedTuple):
+    name: str
+    jsonl_path: str
+
+
+def parse_shard_specs(raw: str) -> Dict[str, ShardSpec]:
+    """
+    "es=/data/es.jsonl,en=/data/en.jsonl" -> {"es": ShardSpec(...), "en": ShardSpec(...)}.
+    """
+    specs: Dict[str, ShardSpec] = {}
+    for item in raw.split(","):
+        if not item.strip():
+            continue
+        name, sep, path = item.partition("=")
+        if not sep or not name.strip() or not path.strip():
+            raise ValueError(f"Shard mal definido (se espera nombre=ruta): {item.strip()}")
+        specs[name.strip()] = ShardSpec(name.strip(), path.strip())
+    return specs
+
+
+class ShardCache:
+    def __init__(self, max_loaded: int = 4, text_compression: Optional[str] = None):
+        self.max_loaded = max_loaded
+        self.text_compression = text_compression
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loaded: "OrderedDict[str, Any]" = OrderedDict()
+        self._pinned: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._loaded) + len(self._pinned)
+
+    def names(self) -> List[str]:
+        return list(self._pinned) + list(self._loaded)
+
+    def pin(self, name: str, usecase: Any) -> None:
+        self._pinned[name] = usecase
+
+    def is_pinned(self, name: str) -> bool:
+        return name in self._pinned
+
+    def get(self, spec: ShardSpec) -> Any:
+        """
+        Caso de uso literal del shard, cargándolo si hace falta (una sola carga por shard a la vez).
+        """
+        pinned = self._pinned.get(spec.name)
+        if pinned is not None:
+            self.hits += 1
+            return pinned
+        with self._lock:
+            usecase = self._loaded.get(spec.name)
+            if usecase is not None:
+                self._loaded.move_to_end(spec.name)
+                self.hits += 1
+                return usecase
+            loading = self._loading.setdefault(spec.name, threading.Lock())
+        with loading:
+            with self._lock:
+                usecase = self._loaded.get(spec.name)
+            if usecase is None:
+                self.misses += 1
+                usecase = _load(spec, self.text_compression)
+            with self._lock:
+                self._loaded[spec.name] = usecase
+                self._loaded.move_to_end(spec.name)
+                while len(self._loaded) > self.max_loaded:
+                    self._loaded.popitem(last=False)
+                    self.evictions += 1
+            return usecase
+
+
+def _load(spec: ShardSpec, text_compression: Optional[str]) -> SearchUseCase:
+    return SearchUseCase(InvertedIndexService(jsonl_path=spec.jsonl_path, text_compression=text_compression))
+
+
+_cache: Optional[ShardCache] = None
+
+
+def configure(max_loaded: int = 4, text_compression: Optional[str] = None) -> ShardCache:
+    """
+    Crea la caché de shards de un worker del pool de procesos (su initializer).
+    """
+    global _cache
+    _cache = ShardCache(max_loaded, text_compression)
+    return _cache
+
+
+def search_shard(spec: ShardSpec, query: str, top_k: int, filters: Optional[Dict[str, Any]],
+                 cache: Optional[ShardCache] = None) -> List[Dict[str, Any]]:
+    """
+    Top-k literal de un shard, en su orden estable (score descendente, ordinal).
+    Sin cache (en un worker de procesos) usa la caché global del proceso.
+    """
+    if cache is None:
+        cache = _cache if _cache is not None else configure()
+    usecase = cache.get(spec)
+    allowed = usecase.filter_bitmap(filters)
+    with stage("literal"):
+        return list(islice(usecase.iter_literal(query, allowed=allowed), top_k))
+
+
+def search_shard_counted(spec: ShardSpec, query: str, top_k: int,
+                         filters: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Tuple[int, int, int, int]]:
+    """
+    search_shard para el pool de procesos: devuelve además (pid, aciertos, fallos, cargados)
+    de la caché del proceso, para que el principal sume las métricas de todos.
+    """
+    results = search_shard(spec, query, top_k, filters)
+    return results, (os.getpid(), _cache.hits, _cache.misses, len(_cache))
+
+
+def merge_top_k(per_shard: List[List[Dict[str, Any]]], names: List[str], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Mezcla los top-k de cada shard: score descendente y, a igual score, orden de los shards
+    pedidos y orden dentro del shard. Cada resultado lleva el nombre de su shard.
+    """
+    streams = [
+        [(-float(r.get("score", 0.0)), s, i, r) for i, r in enumerate(results)]
+        for s, results in enumerate(per_shard)
+    ]
+    out = []
+    for _, s, _, r in islice(heapq.merge(*streams, key=lambda t: t[:3]), top_k):
+        out.append({**r, "shard": names[s]})
+    return out
+
+
+class ShardedSearch:
+    def __init__(self, specs: Dict[str, ShardSpec], executor: str = "thread", workers: Optional[int] = None,
+                 max_loaded: int = 4, text_compression: Optional[str] = None, semantic: Any = None):
+        self.specs = specs
+        self.semantic = semantic
+        workers = workers or os.cpu_count() or 1
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Executor de shards no soportado: {executor} (usa 'thread' o 'process')")
+        # Caché propia: los shards fijados y, con hilos, también los cargados bajo demanda
+        self.cache = ShardCache(max_loaded, text_compression)
+        self.threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard")
+        self.executor: Executor = self.threads
+        # Con procesos, (aciertos, fallos, cargados) de la caché de cada worker por pid
+        self._worker_stats: Dict[int, Tuple[int, int, int]] = {}
+        if executor == "process":
+            # Cada proceso tiene su propia caché LRU; los shards se cargan en el proceso que los consulta
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=configure, initargs=(max_loaded, text_compression))
+
+    def pin(self, name: str, usecase: Any) -> None:
+        """
+        Fija un shard ya cargado (el corpus principal): no se expulsa ni se recarga en los workers.
+        """
+        self.cache.pin(name, usecase)
+
+    @property
+    def hits(self) -> int:
+        return self.cache.hits + sum(h for h, _, _ in self._worker_stats.values())
+
+    @property
+    def misses(self) -> int:
+        return self.cache.misses + sum(m for _, m, _ in self._worker_stats.values())
+
+    @property
+    def loaded(self) -> int:
+        return len(self.cache) + sum(n for _, _, n in self._worker_stats.values())
+
+    def resolve(self, names: List[str]) -> List[ShardSpec]:
+        unknown = [n for n in names if n not in self.specs]
+        if unknown:
+            raise ValueError(f"Shards desconocidos: {', '.join(unknown)} (disponibles: {', '.join(self.specs)})")
+        return [self.specs[n] for n in dict.fromkeys(names)]
+
+    async def search(self, query: str, shards: List[str], top_k: int = 10, mode: str = "literal",
+                     filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        specs = self.resolve(shards)
+        names = [s.name for s in specs]
+        if mode == "semantic" and self.semantic is not None:
+            results = await self.semantic.search_namespaces(query, names, top_k=top_k, filters=filters)
+            if results is not None:
+                return results
+        loop = asyncio.get_running_loop()
+        calls = []
+        for spec in specs:
+            if self.executor is self.threads or self.cache.is_pinned(spec.name):
+                # En hilos se conservan las etapas (Server-Timing) de la petición en curso
+                call = partial(contextvars.copy_context().run, search_shard, spec, query, top_k, filters, self.cache)
+                calls.append(loop.run_in_executor(self.threads, call))
+            else:
+                calls.append(self._in_worker(loop, spec, query, top_k, filters))
+        per_shard = await asyncio.gather(*calls)
+        return merge_top_k(list(per_shard), names, top_k)
+
+    async def _in_worker(self, loop: asyncio.AbstractEventLoop, spec: ShardSpec, query: str, top_k: int,
+                         filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results, (pid, hits, misses, loaded) = await loop.run_in_executor(
+            self.executor, search_shard_counted, spec, query, top_k, filters)
+        self._worker_stats[pid] = (hits, misses, loaded)
+        return results
+
+    def shutdown(self) -> None:
+        if self.executor is not self.threads:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.threads.shutdown(wait=False, cancel_futures=True)
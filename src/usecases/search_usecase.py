@@ -1,5 +1,21 @@
 from src.services.inverted_index import InvertedIndexService
-from typing import List, Dict, Any
+from src.services.boolean_query import (
+    QueryPlanner, Node, gallop_intersect, parse_query, needs_planner, node_to_dict, sorted_union,
+)
+from src.services.bitmap import Bitmap
+from src.services.metadata_index import PINECONE_IN_MAX, to_pinecone_filter, validate_filters
+from src.services.pagination import InvalidCursor, SnapshotStore, decode_cursor, encode_cursor, query_fingerprint
+from src.domain.scripture_reference import RefRange, canon_sort_key, parse_reference_query
+from src.infra.metrics import DEGRADED_SEARCHES, stage
+from src.infra.resilience import BackendGuard, BackendUnavailable, call_timeout, note_degraded
+from src.infra.singleflight import SingleFlight
+from bisect import bisect_left, bisect_right
+from itertools import islice
+import asyncio
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+# top_k máximo de Pinecone con metadatos; tope de candidatos al filtrar después de la consulta
+PINECONE_TOP_K_MAX = 1000
 
 
 from src.services.embedder_ollama import OllamaEmbedder
@@ -9,93 +25,513 @@ class SearchUseCase:
     """
     Orquesta la búsqueda literal y semántica, aplicando optimizaciones y principios SOLID.
     """
-    def __init__(self, index_service: InvertedIndexService, embedder: OllamaEmbedder = None, pinecone_adapter: PineconeAdapter = None):
+    def __init__(self, index_service: InvertedIndexService, embedder: OllamaEmbedder = None, pinecone_adapter: PineconeAdapter = None,
+                 snapshots: Optional[SnapshotStore] = None, snapshot_k: int = 200,
+                 embed_guard: Optional[BackendGuard] = None, pinecone_guard: Optional[BackendGuard] = None):
         self.index_service = index_service
         self.embedder = embedder
         self.pinecone_adapter = pinecone_adapter
+        self.planner = QueryPlanner(index_service) if index_service else None
+        # Candidatos semánticos por consulta paginada (se consultan una vez y se reparten en páginas)
+        self.snapshots = snapshots if snapshots is not None else SnapshotStore()
+        self.snapshot_k = snapshot_k
+        # Plazos y circuitos de Ollama y Pinecone; si fallan, la búsqueda semántica degrada a literal
+        self.embed_guard = embed_guard or BackendGuard("ollama", timeout=10.0)
+        self.pinecone_guard = pinecone_guard or BackendGuard("pinecone", timeout=5.0)
+        # Embeddings del mismo texto en curso: una sola llamada a Ollama compartida
+        self.embed_flight = SingleFlight()
 
     def canon_sort_key(self, ref: str) -> tuple:
         # Orden canónico: AT, NT, BM, DyC, PGP
-        canon = [
-            "Génesis","Éxodo","Levítico","Números","Deuteronomio","Josué","Jueces","Rut",
-            "1 Samuel","2 Samuel","1 Reyes","2 Reyes","1 Crónicas","2 Crónicas","Esdras","Nehemías","Ester",
-            "Job","Salmos","Proverbios","Eclesiastés","Cantares","Isaías","Jeremías","Lamentaciones",
-            "Ezequiel","Daniel","Oseas","Joel","Amós","Abdías","Jonás","Miqueas","Nahúm","Habacuc",
-            "Sofonías","Hageo","Zacarías","Malaquías",
-            "Mateo","Marcos","Lucas","Juan","Hechos","Romanos","1 Corintios","2 Corintios","Gálatas",
-            "Efesios","Filipenses","Colosenses","1 Tesalonicenses","2 Tesalonicenses","1 Timoteo",
-            "2 Timoteo","Tito","Filemón","Hebreos","Santiago","1 Pedro","2 Pedro","1 Juan","2 Juan",
-            "3 Juan","Judas","Apocalipsis",
-            "1 Nefi","2 Nefi","Jacob","Enós","Jarom","Omni","Palabras de Mormón","Mosíah","Alma",
-            "Helamán","3 Nefi","4 Nefi","Mormón","Éter","Moroni",
-            "Doctrina y Convenios",
-            "Moisés","Abraham","José Smith—Mateo","José Smith—Historia","Artículos de Fe"
-        ]
-        import re
-        def norm_book_key(s):
-            s = s.replace("—","-").replace("–","-")
-            s = s.lower()
-            return re.sub(r"\s+", " ", s).strip()
-        book, chap, verse = None, 0, 0
-        m = re.match(r"^(.+?)\s+(\d+)(?::(\d+))?$", ref.strip())
-        if m:
-            book = m.group(1).strip()
-            chap = int(m.group(2))
-            verse = int(m.group(3) or 0)
-        idx = {norm_book_key(name): i for i, name in enumerate(canon)}
-        order = idx.get(norm_book_key(book or ref), len(canon)+1000)
-        return (order, chap, verse)
-
-    async def search(self, query: str, top_k: int = 10, mode: str = "literal") -> List[Dict[str, Any]]:
+        return canon_sort_key(ref)
+
+    async def search(self, query: str, top_k: int = 10, mode: str = "literal", filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         if mode == "semantic" and self.embedder and self.pinecone_adapter:
-            embedding = await self.embedder.embed(query)
-            results = self.pinecone_adapter.query(embedding, top_k=top_k)
-            # Ordenar por orden canónico
-            results.sort(key=lambda r: self.canon_sort_key(r.get("ref", "")))
-            return results
+            results = await self._semantic_query(query, top_k, filters)
+            if results is not None:
+                # Ordenar por orden canónico
+                with stage("rank"):
+                    results.sort(key=lambda r: self.canon_sort_key(r.get("ref", "")))
+                return results
+        # Filtros de metadatos: bitmap de ordinales permitidos, aplicado antes de puntuar
+        allowed = self.filter_bitmap(filters)
+        with stage("literal"):
+            return list(islice(self.iter_literal(query, allowed=allowed), top_k))
+
+    def iter_literal(self, query: str, allowed: Optional[Bitmap] = None, after: Optional[Tuple[float, int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Genera los resultados literales de forma perezosa, en orden estable
+        (score descendente, ordinal canónico ascendente). Quien consume decide cuándo
+        parar (top_k o streaming), así no se materializa ni se escanea más de lo necesario.
+        after=(score, ordinal) reanuda el recorrido justo después de esa clave (search_after).
+        """
+        doc_ids = self.index_service.doc_ids
+        with stage("parse"):
+            ref_ranges = parse_reference_query(query)
+            node = parse_query(query) if not ref_ranges else None
+        # Referencias directas ("Juan 3:16", "Alma 32:21-43"): búsqueda por rango, sin postings.
+        # Una referencia sin versículos (capítulo inexistente, filtro de otro libro) no tiene resultados
+        if ref_ranges:
+            with stage("postings"):
+                ordinals = self._reference_ordinals(ref_ranges, allowed)
+            start = _resume_from(3.0, after)
+            if start is not None:
+                if start:
+                    # Orden canónico, no de ordinal: se reanuda tras el último ordinal entregado
+                    try:
+                        ordinals = ordinals[ordinals.index(start - 1) + 1:]
+                    except ValueError:
+                        raise InvalidCursor("El cursor no corresponde a esta consulta")
+                for o in ordinals:
+                    yield self._literal_result(doc_ids[o], 3.0)
+            return
+        # Consultas con operadores (+, -, OR, paréntesis, varias frases): planificador booleano
+        if node is None:
+            with stage("parse"):
+                node = parse_query(query)
+        if needs_planner(node):
+            start = _resume_from(1.0, after)
+            if start is None:
+                return
+            within = allowed.to_list() if allowed is not None else None
+            if within is not None and start:
+                within = within[bisect_left(within, start):]
+            elif start:
+                within = list(range(start, len(doc_ids)))
+            with stage("postings"):
+                ordinals, _ = self.planner.execute(node, within=within)
+            for o in ordinals:
+                yield self._literal_result(doc_ids[o], 1.0)
+            return
         # Modo literal mejorado: si la consulta va entre comillas, buscar frase exacta
-        results = []
         import re
         match = re.match(r'^"(.+?)"$', query.strip())
         if match:
             phrase = match.group(1)
             phrase_norm = self.index_service.norm_words(phrase)
-            # Buscar coincidencia exacta en texto original
+            start = _resume_from(2.0, after)
+            if start is None:
+                return
             # Buscar coincidencia exacta insensible a mayúsculas y tildes
-            exact_ids = [vid for vid, txt in self.index_service.text_by_id.items()
-                         if self.index_service.norm_words(phrase) in self.index_service.norm_words(txt)]
-            for vid in exact_ids:
-                results.append({
-                    "id": vid,
-                    "score": 2.0,
-                    "snippet": self.index_service.text_by_id.get(vid, ""),
-                    "metadata": {"ref": self.index_service.ref_by_id.get(vid, "")}
-                })
-            return results[:top_k]
+            for o in self._phrase_matches(phrase_norm, allowed, start):
+                yield self._literal_result(doc_ids[o], 2.0)
+            return
         # Si no hay comillas, buscar frase exacta y luego por tokens
         phrase_norm = self.index_service.norm_words(query)
-        exact_ids = [vid for vid, txt in self.index_service.text_by_id.items()
-                     if phrase_norm in self.index_service.norm_words(txt)]
-        for vid in exact_ids:
-            results.append({
-                "id": vid,
-                "score": 2.0,
-                "snippet": self.index_service.text_by_id.get(vid, ""),
-                "metadata": {"ref": self.index_service.ref_by_id.get(vid, "")}
-            })
-        tokens = self.index_service.tokenize_words(query)
-        ids = set()
-        for t in tokens:
-            ids |= self.index_service.postings.get(t, set())
-        for vid in list(ids):
-            if vid not in exact_ids:
-                results.append({
-                    "id": vid,
-                    "score": 1.0,
-                    "snippet": self.index_service.text_by_id.get(vid, ""),
-                    "metadata": {"ref": self.index_service.ref_by_id.get(vid, "")}
-                })
-        return results[:top_k]
+        exact = None
+        start = _resume_from(2.0, after)
+        if start is not None:
+            exact = set()
+            for o in self._phrase_matches(phrase_norm, allowed, start):
+                exact.add(o)
+                yield self._literal_result(doc_ids[o], 2.0)
+            if start:
+                exact = None  # el escaneo no cubrió el corpus completo
+        start = _resume_from(1.0, after)
+        if start is None:
+            return
+        with stage("postings"):
+            tokens = self.index_service.tokenize_words(query)
+            ordinals = sorted_union([self.index_service.posting_list(t) for t in tokens])
+            if allowed is not None:
+                ordinals = allowed.filter_sorted(ordinals)
+        if exact is None:
+            exact = set(self._phrase_matches(phrase_norm, allowed))
+        for o in ordinals[bisect_left(ordinals, start):]:
+            if o not in exact:
+                yield self._literal_result(doc_ids[o], 1.0)
+
+    async def search_page(self, query: str, top_k: int = 10, mode: str = "literal", filters: Optional[Dict[str, Any]] = None,
+                          cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Búsqueda paginada por cursor (search_after). Devuelve la página y el cursor siguiente
+        (None en la última página).
+        - literal: orden estable (score, ordinal canónico); el cursor reanuda el recorrido
+          de postings/escaneo justo después de la última clave entregada.
+        - semantic: la primera página guarda un snapshot de candidatos; las siguientes
+          se sirven de él sin re-embeber ni consultar Pinecone.
+        """
+        fingerprint = query_fingerprint(query, mode, filters)
+        state = decode_cursor(cursor) if cursor else None
+        if state is not None and state.get("h") != fingerprint:
+            raise InvalidCursor("El cursor no corresponde a esta consulta")
+        if mode == "semantic" and self.embedder and self.pinecone_adapter:
+            page = await self._semantic_page(query, top_k, filters, fingerprint, state)
+            if page is not None:
+                return page
+            # Degradado a literal: una sola página, sin cursor (el cursor semántico no aplica)
+            with stage("literal"):
+                return list(islice(self.iter_literal(query, allowed=self.filter_bitmap(filters)), top_k)), None
+        allowed = self.filter_bitmap(filters)
+        after = None
+        if state is not None:
+            try:
+                after = (float(state["s"]), int(state["o"]))
+            except (KeyError, TypeError, ValueError):
+                raise InvalidCursor("Cursor inválido")
+        with stage("literal"):
+            page = list(islice(self.iter_literal(query, allowed=allowed, after=after), top_k + 1))
+        if len(page) <= top_k:
+            return page, None
+        page = page[:top_k]
+        last = page[-1]
+        ordinal = self.index_service.ordinal_by_id[last["id"]]
+        return page, encode_cursor({"h": fingerprint, "s": last["score"], "o": ordinal})
+
+    async def _semantic_page(self, query: str, top_k: int, filters: Optional[Dict[str, Any]], fingerprint: str,
+                             state: Optional[Dict[str, Any]]) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        snapshot_id = state.get("snap") if state else None
+        candidates = self.snapshots.get(snapshot_id) if snapshot_id else None
+        if candidates is None:
+            # Primera página o snapshot caducado: se vuelve a consultar y se reanuda por clave
+            candidates = await self._semantic_query(query, max(self.snapshot_k, top_k), filters)
+            if candidates is None:
+                return None
+            with stage("rank"):
+                candidates.sort(key=_semantic_key)
+            snapshot_id = self.snapshots.put(candidates)
+        start = 0
+        if state is not None:
+            after = (-float(state.get("s", 0.0)), str(state.get("id", "")))
+            start = bisect_right([_semantic_key(c) for c in candidates], after)
+        page = candidates[start:start + top_k]
+        next_cursor = None
+        if start + top_k < len(candidates) and page:
+            last = page[-1]
+            next_cursor = encode_cursor({"h": fingerprint, "snap": snapshot_id, "s": last.get("score", 0.0), "id": last.get("id")})
+        # Dentro de la página se conserva el orden canónico, como en search
+        page = sorted(page, key=lambda r: self.canon_sort_key(r.get("ref", "")))
+        return page, next_cursor
+
+    async def _semantic_query(self, query: str, top_k: int, filters: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Embedding en Ollama y consulta a Pinecone, cada uno tras su BackendGuard (plazo
+        derivado del presupuesto de la petición, circuito y hedging opcional).
+        None si algún backend no está disponible; el motivo queda anotado en el presupuesto.
+        """
+        allowed = self._semantic_filter(filters)
+        if allowed is not None and not allowed:
+            return []
+        try:
+            embedding = await self.embed_flight.do(
+                query, lambda: self.embed_guard.call(lambda: self.embedder.embed(query)))
+            return await self._pinecone_query(embedding, top_k, allowed)
+        except BackendUnavailable as e:
+            if self.index_service is None:
+                raise  # sin índice local no hay a qué degradar
+            note_degraded(str(e))
+            DEGRADED_SEARCHES.inc()
+            return None
+
+    def _semantic_filter(self, filters: Optional[Dict[str, Any]]) -> Optional[Bitmap]:
+        """
+        Valida los filtros de una búsqueda semántica y los resuelve con los bitmaps locales,
+        igual que en modo literal. Lanza ValueError ante campos u operadores desconocidos.
+        """
+        if not filters:
+            return None
+        validate_filters(filters)
+        if self.index_service is None:
+            raise ValueError("Los filtros en modo semántico requieren el índice local")
+        return self.filter_bitmap(filters)
+
+    def _pinecone_query(self, embedding: List[float], top_k: int, allowed: Optional[Bitmap],
+                        namespace: Optional[str] = None) -> Any:
+        """
+        Awaitable de _filtered_query tras el BackendGuard de Pinecone. El cliente es síncrono: corre en
+        un hilo para no bloquear el event loop, y con el mismo plazo que espera el guard como timeout
+        de la llamada HTTP, para que el hilo no siga bloqueado cuando el guard ya ha abandonado.
+        """
+        def call():
+            timeout = call_timeout(self.pinecone_guard.timeout)
+            return asyncio.to_thread(self._filtered_query, embedding, top_k, allowed, namespace, timeout)
+
+        return self.pinecone_guard.call(call)
+
+    def _filtered_query(self, embedding: List[float], top_k: int, allowed: Optional[Bitmap],
+                        namespace: Optional[str] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Consulta a Pinecone limitada a los ordinales permitidos (síncrona, se ejecuta en un hilo).
+        - Hasta PINECONE_IN_MAX versículos del namespace propio, si el corpus guarda la referencia en
+          metadata.reference (la clave del filtro): filtro nativo por referencia.
+        - En otro caso (conjuntos mayores, referencias en otra clave u otros namespaces, cuyas
+          referencias están en otro idioma): se piden más candidatos sin filtro y se descartan por id.
+        """
+        kwargs: Dict[str, Any] = {"timeout": timeout}
+        if namespace is not None:
+            kwargs["namespace"] = namespace
+        if allowed is None:
+            return self.pinecone_adapter.query(embedding, top_k=top_k, **kwargs)
+        if not allowed:
+            return []
+        own = namespace is None or namespace == getattr(self.pinecone_adapter, "namespace", None)
+        if own and len(allowed) <= PINECONE_IN_MAX and self.index_service.references_in_metadata:
+            ref = self.index_service.ref
+            return self.pinecone_adapter.query(
+                embedding, top_k=top_k, filter=to_pinecone_filter([ref(o) for o in allowed]), **kwargs)
+        total = len(self.index_service.doc_ids)
+        fetch_k = min(PINECONE_TOP_K_MAX, max(top_k, -(-top_k * total // len(allowed)) * 2))
+        ordinal_by_id = self.index_service.ordinal_by_id
+        matches = self.pinecone_adapter.query(embedding, top_k=fetch_k, **kwargs)
+        kept = []
+        for m in matches:
+            o = ordinal_by_id.get(m.get("id"))
+            if o is not None and o in allowed:
+                kept.append(m)
+        return kept[:top_k]
+
+    async def search_namespaces(self, query: str, namespaces: List[str], top_k: int = 10,
+                                filters: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Búsqueda semántica en varios namespaces de Pinecone (uno por shard): un solo embedding,
+        consultas en paralelo y top-k global por score, mostrado en orden canónico.
+        Cada resultado lleva su shard. None si algún backend no está disponible (degradación anotada);
+        sin índice local no hay degradación y se propaga BackendUnavailable.
+        """
+        if not (self.embedder and self.pinecone_adapter):
+            return None
+        allowed = self._semantic_filter(filters)
+        if allowed is not None and not allowed:
+            return []
+        try:
+            embedding = await self.embed_flight.do(
+                query, lambda: self.embed_guard.call(lambda: self.embedder.embed(query)))
+
+            answers = await asyncio.gather(*(self._pinecone_query(embedding, top_k, allowed, ns) for ns in namespaces))
+        except BackendUnavailable as e:
+            if self.index_service is None:
+                raise  # sin índice local no hay a qué degradar
+            note_degraded(str(e))
+            DEGRADED_SEARCHES.inc()
+            return None
+        merged = [{**r, "shard": ns} for ns, results in zip(namespaces, answers) for r in results]
+        with stage("rank"):
+            merged.sort(key=_semantic_key)
+            merged = merged[:top_k]
+            merged.sort(key=lambda r: self.canon_sort_key(r.get("ref", "")))
+        return merged
+
+    async def search_batch(self, queries: List[Dict[str, Any]]) -> List[Tuple[Optional[List[Dict[str, Any]]], Optional[Exception], List[str]]]:
+        """
+        Varias búsquedas a la vez; cada consulta es {"query", "top_k", "mode", "filters"}.
+        Devuelve, en el mismo orden, (resultados, error, motivos de degradación) por consulta:
+        un error en una consulta no afecta a las demás.
+        - semánticas: un solo embedding por lotes para los textos distintos y consultas a
+          Pinecone concurrentes; si un backend falla, esas consultas degradan a literal.
+        - literales: en paralelo en hilos sobre el mismo índice (solo lectura).
+        """
+        out: List[Any] = [None] * len(queries)
+        semantic_mode = bool(self.embedder and self.pinecone_adapter)
+        literal: List[int] = []
+        semantic: Dict[int, Optional[Bitmap]] = {}
+        for i, q in enumerate(queries):
+            if q.get("mode") == "semantic" and semantic_mode:
+                try:
+                    allowed = self._semantic_filter(q.get("filters"))
+                except ValueError as e:
+                    out[i] = (None, e, [])
+                    continue
+                if allowed is not None and not allowed:
+                    out[i] = ([], None, [])
+                else:
+                    semantic[i] = allowed
+            else:
+                literal.append(i)
+        degraded: Dict[int, List[str]] = {}
+        if semantic:
+            for i, answer in zip(semantic, await self._semantic_batch(queries, semantic)):
+                if isinstance(answer, BackendUnavailable) and self.index_service is not None:
+                    degraded[i] = [str(answer)]
+                    DEGRADED_SEARCHES.inc()
+                    literal.append(i)
+                elif isinstance(answer, Exception):
+                    out[i] = (None, answer, [])
+                else:
+                    with stage("rank"):
+                        answer.sort(key=lambda r: self.canon_sort_key(r.get("ref", "")))
+                    out[i] = (answer, None, [])
+        if literal:
+            if self.index_service is None:
+                answers = [ValueError("Índice local no disponible")] * len(literal)
+            else:
+                answers = await asyncio.gather(
+                    *(asyncio.to_thread(self._literal_top, queries[i]) for i in literal), return_exceptions=True)
+            for i, answer in zip(literal, answers):
+                if isinstance(answer, Exception):
+                    out[i] = (None, answer, degraded.get(i, []))
+                else:
+                    out[i] = (answer, None, degraded.get(i, []))
+        return out
+
+    async def _semantic_batch(self, queries: List[Dict[str, Any]], filters: Dict[int, Optional[Bitmap]]) -> List[Any]:
+        """
+        Resultados de Pinecone (o la excepción) por cada índice de filters (ordinales permitidos), en su orden.
+        """
+        texts = list(dict.fromkeys(queries[i]["query"] for i in filters))
+        try:
+            vectors = await self.embed_guard.call(lambda: self._embed_many(texts))
+        except BackendUnavailable as e:
+            return [e] * len(filters)
+        by_text = dict(zip(texts, vectors))
+
+        return await asyncio.gather(*(
+            self._pinecone_query(by_text[queries[i]["query"]], queries[i].get("top_k") or 10, filters[i])
+            for i in filters), return_exceptions=True)
+
+    async def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        embed_batch = getattr(self.embedder, "embed_batch", None)
+        if embed_batch is not None:
+            return await embed_batch(texts)
+        return list(await asyncio.gather(*(self.embedder.embed(t) for t in texts)))
+
+    def _literal_top(self, q: Dict[str, Any]) -> List[Dict[str, Any]]:
+        allowed = self.filter_bitmap(q.get("filters"))
+        with stage("literal"):
+            return list(islice(self.iter_literal(q["query"], allowed=allowed), q.get("top_k") or 10))
+
+    async def stream(self, query: str, mode: str = "literal", filters: Optional[Dict[str, Any]] = None, top_k: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Devuelve un iterador de resultados para respuestas en streaming.
+        El modo literal es perezoso; el semántico depende de una única consulta a Pinecone.
+        Los filtros se evalúan aquí para que los errores salgan antes de empezar a enviar.
+        """
+        if mode == "semantic" and self.embedder and self.pinecone_adapter:
+            return iter(await self.search(query, top_k=top_k or 10, mode=mode, filters=filters))
+        results = self.iter_literal(query, allowed=self.filter_bitmap(filters))
+        return islice(results, top_k) if top_k else results
+
+    def reference_search(self, ranges: List[RefRange], top_k: int = 10, allowed: Optional[Bitmap] = None) -> List[Dict[str, Any]]:
+        """
+        Resuelve referencias con el índice (libro, capítulo, versículo) -> ordinal.
+        Los resultados salen en orden canónico y exactos.
+        """
+        ordinals = self._reference_ordinals(ranges, allowed)
+        doc_ids = self.index_service.doc_ids
+        return [self._literal_result(doc_ids[o], 3.0) for o in ordinals[:top_k]]
+
+    def _reference_ordinals(self, ranges: List[RefRange], allowed: Optional[Bitmap]) -> List[int]:
+        """
+        Ordinales de las referencias en orden canónico (libro, capítulo, versículo) dentro de cada
+        rango y los rangos en el orden pedido, no en el orden del corpus.
+        """
+        ordinals = self.index_service.lookup_references(ranges)
+        if allowed is not None:
+            ordinals = allowed.filter_sorted(ordinals)
+        return ordinals
+
+    def filter_bitmap(self, filters: Optional[Dict[str, Any]]) -> Optional[Bitmap]:
+        """
+        Evalúa los filtros de metadatos sobre los índices de bitmaps. None si no hay filtros.
+        """
+        if not filters or not self.index_service:
+            return None
+        with stage("filters"):
+            return self.index_service.metadata_index.evaluate(filters)
+
+    def _phrase_candidates(self, phrase_norm: str) -> Optional[List[int]]:
+        """
+        Ordinales que pueden contener phrase_norm (ya normalizada) como subcadena del contenido
+        normalizado, deducidos de las postings sin leer texto. Las palabras interiores de la
+        frase son completas: se intersecan sus postings. Sin interiores, la primera palabra
+        debe ser final de una del vocabulario y la última, comienzo de otra. None = todo el corpus.
+        """
+        idx = self.index_service
+        tokens = phrase_norm.split()
+        if not tokens:
+            return None
+        inner = tokens[1:-1]
+        if inner:
+            cand: Optional[List[int]] = None
+            for token in sorted(inner, key=idx.posting_size):
+                postings = idx.posting_list(token)
+                cand = postings if cand is None else gallop_intersect(cand, postings)
+                if not cand:
+                    return []
+            return cand
+        vocabulary = idx.postings
+        if len(tokens) == 1:
+            return sorted_union([p for w, p in vocabulary.items() if tokens[0] in w])
+        first = sorted_union([p for w, p in vocabulary.items() if w.endswith(tokens[0])])
+        last = sorted_union([p for w, p in vocabulary.items() if w.startswith(tokens[-1])])
+        return gallop_intersect(first, last)
+
+    def _phrase_matches(self, phrase_norm: str, allowed: Optional[Bitmap], start: int = 0) -> Iterator[int]:
+        """
+        Ordinales (desde start, en orden) cuyo contenido normalizado contiene phrase_norm.
+        Solo se lee (y descomprime) el texto de los candidatos que dan las postings.
+        """
+        idx = self.index_service
+        cand = self._phrase_candidates(phrase_norm)
+        if cand is None:
+            ordinals = range(start, len(idx.doc_ids)) if allowed is None else allowed.iter_from(start)
+        else:
+            if allowed is not None:
+                cand = allowed.filter_sorted(cand)
+            ordinals = cand[bisect_left(cand, start):]
+        for o in ordinals:
+            if phrase_norm in idx.norm_text(o):
+                yield o
+
+    def boolean_search(self, node: Node, top_k: int = 10, explain: bool = False, allowed: Optional[Bitmap] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Ejecuta una consulta booleana ya parseada. Los resultados salen en orden canónico
+        (ordinal del corpus); con explain devuelve además el plan con cardinalidades.
+        allowed restringe la evaluación a los ordinales que cumplen los filtros de metadatos.
+        """
+        within = allowed.to_list() if allowed is not None else None
+        ordinals, trace = self.planner.execute(node, explain=explain, within=within)
+        doc_ids = self.index_service.doc_ids
+        results = [self._literal_result(doc_ids[o], 1.0) for o in ordinals[:top_k]]
+        plan = None
+        if explain:
+            plan = {"strategy": "boolean", "query": node_to_dict(node), "total": len(ordinals), "tree": trace}
+            if allowed is not None:
+                plan["filter_cardinality"] = len(within)
+        return results, plan
+
+    async def explain(self, query: str, top_k: int = 10, mode: str = "literal", filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Igual que search, pero devuelve también el plan de ejecución.
+        Solo las consultas booleanas tienen plan detallado; el resto indica la estrategia usada.
+        """
+        if mode != "semantic" and self.planner:
+            allowed = self.filter_bitmap(filters)
+            ranges = parse_reference_query(query)
+            if ranges:
+                results = self.reference_search(ranges, top_k, allowed=allowed)
+                return results, {"strategy": "reference", "ranges": [r._asdict() for r in ranges], "total": len(results)}
+            node = parse_query(query)
+            if needs_planner(node):
+                return self.boolean_search(node, top_k, explain=True, allowed=allowed)
+        results = await self.search(query, top_k=top_k, mode=mode, filters=filters)
+        strategy = "semantic" if mode == "semantic" and self.embedder and self.pinecone_adapter else "phrase+tokens"
+        return results, {"strategy": strategy, "total": len(results)}
+
+    def _literal_result(self, vid: str, score: float) -> Dict[str, Any]:
+        return {
+            "id": vid,
+            "score": score,
+            "snippet": self.index_service.text_by_id.get(vid, ""),
+            "metadata": {"ref": self.index_service.ref_by_id.get(vid, "")}
+        }
+
+def _semantic_key(result: Dict[str, Any]) -> Tuple[float, str]:
+    return (-float(result.get("score", 0.0)), str(result.get("id") or ""))
+
+
+def _resume_from(score: float, after: Optional[Tuple[float, int]]) -> Optional[int]:
+    """
+    Ordinal desde el que continuar un nivel de score dado el cursor (score, ordinal).
+    None si el nivel ya se entregó completo en páginas anteriores.
+    """
+    if after is None:
+        return 0
+    after_score, after_ordinal = after
+    if score > after_score:
+        return None
+    if score == after_score:
+        return after_ordinal + 1
+    return 0
 
 # Ejemplo de inicialización (debe usarse en controller/router)
 # index_service = InvertedIndexService(jsonl_path="versiculos.jsonl")
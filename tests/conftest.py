@@ -0,0 +1,28 @@
+import orjson
+import pytest
+
+from src.services.inverted_index import InvertedIndexService
+
+SAMPLE_VERSES = [
+    ("AT-genesis-01-001", "Génesis 1:1", "En el principio creó Dios los cielos y la tierra."),
+    ("AT-genesis-28-019", "Génesis 28:19", "Y llamó el nombre de aquel lugar Bet-el."),
+    ("NT-juan-03-016", "Juan 3:16", "Porque de tal manera amó Dios al mundo, que ha dado a su Hijo unigénito."),
+    ("NT-juan-03-017", "Juan 3:17", "Porque no envió Dios a su Hijo al mundo para condenar al mundo."),
+    ("NT-1-juan-04-008", "1 Juan 4:8", "El que no ama no ha conocido a Dios, porque Dios es amor."),
+    ("BM-alma-32-021", "Alma 32:21", "La fe no es tener un conocimiento perfecto de las cosas."),
+    ("BM-alma-32-028", "Alma 32:28", "Comparemos la palabra a una semilla; si dais lugar para que sea plantada una semilla."),
+]
+
+
+@pytest.fixture
+def corpus_path(tmp_path):
+    path = tmp_path / "versiculos.jsonl"
+    with open(path, "wb") as f:
+        for vid, ref, text in SAMPLE_VERSES:
+            f.write(orjson.dumps({"id": vid, "text": text, "metadata": {"reference": ref}}) + b"\n")
+    return str(path)
+
+
+@pytest.fixture
+def index_service(corpus_path):
+    return InvertedIndexService(jsonl_path=corpus_path)
@@ -19,3 +19,21 @@ def test_admin_reindex_dry_run():
     data = response.json()
     assert "job_id" in data
     assert data["status"] == "dry_run"
+
+
+def test_admin_profile_requires_key():
+    client = TestClient(app)
+    response = client.post("/api/v1/admin/profile", params={"seconds": 0.1})
+    assert response.status_code == 403
+
+
+def test_search_profile_requires_key():
+    client = TestClient(app)
+    response = client.post("/api/v1/search", json={"q": "amor", "profile": True})
+    assert response.status_code == 403
+
+
+def test_admin_slow_queries_requires_key():
+    client = TestClient(app)
+    response = client.get("/api/v1/admin/slow-queries", headers={"X-Admin-Key": "incorrecta"})
+    assert response.status_code == 403
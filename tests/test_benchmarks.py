@@ -0,0 +1,65 @@
+import orjson
+from fastapi.testclient import TestClient
+
+from benchmarks.corpus import generate_corpus, parse_size
+from benchmarks.fakes import FakePineconeIndex
+from benchmarks.standins import Behaviour, create_ollama_app, create_pinecone_app
+from benchmarks.stats import compare_results, histogram, percentile, summarize
+from src.services.inverted_index import InvertedIndexService
+
+
+def test_synthetic_corpus_is_deterministic_and_indexable(tmp_path):
+    a = generate_corpus(str(tmp_path / "a.jsonl"), 500, seed=3)
+    b = generate_corpus(str(tmp_path / "b.jsonl"), 500, seed=3)
+    assert open(a, "rb").read() == open(b, "rb").read()
+    docs = [orjson.loads(line) for line in open(a, "rb")]
+    assert len(docs) == 500
+    assert docs[0]["id"] == "AT-genesis-01-001"
+    assert docs[0]["metadata"]["reference"] == "Génesis 1:1"
+    index = InvertedIndexService(jsonl_path=a)
+    assert len(index.doc_ids) == 500
+    assert index.lookup_references([]) == []
+
+
+def test_parse_size():
+    assert parse_size("42k") == 42_000
+    assert parse_size("1M") == 1_000_000
+    assert parse_size("1500") == 1500
+
+
+def test_summary_and_regressions():
+    summary = summarize([0.001 * i for i in range(1, 101)], wall_seconds=2.0)
+    assert summary["ops"] == 100
+    assert summary["throughput"] == 50.0
+    assert summary["p50_ms"] == 50.0 and summary["p99_ms"] == 99.0
+    assert percentile([], 95) == 0.0
+
+    baseline = {"results": {"42k/literal_token": {"throughput": 100.0, "p95_ms": 10.0, "peak_rss_mb": 100.0}}}
+    current = {"results": {"42k/literal_token": {"throughput": 95.0, "p95_ms": 15.0, "peak_rss_mb": 101.0}}}
+    regressions = compare_results(current, baseline, tolerance=0.2)
+    assert [(r["metric"], r["change_pct"]) for r in regressions] == [("p95_ms", 50.0)]
+
+
+def test_histogram_buckets():
+    buckets = histogram([0.0005, 0.003, 0.003, 20.0])
+    counts = {b["le_ms"]: b["count"] for b in buckets}
+    assert counts["1"] == 1 and counts["5"] == 2 and counts["+Inf"] == 1
+    assert sum(counts.values()) == 4
+
+
+def test_standins_inject_latency_and_errors(corpus_path):
+    ollama = TestClient(create_ollama_app(Behaviour(), dim=8))
+    first = ollama.post("/api/embeddings", json={"model": "m", "prompt": "amor"}).json()["embedding"]
+    assert len(first) == 8
+    assert ollama.post("/api/embeddings", json={"prompt": "amor"}).json()["embedding"] == first
+    assert len(ollama.post("/api/embed", json={"input": ["a", "b"]}).json()["embeddings"]) == 2
+
+    failing = TestClient(create_ollama_app(Behaviour(error_rate=1.0)))
+    assert failing.post("/api/embeddings", json={"prompt": "x"}).status_code == 503
+    assert failing.get("/__standin/stats").json() == {"requests": 1, "errors": 1}
+
+    pinecone = TestClient(create_pinecone_app(Behaviour(), FakePineconeIndex.from_corpus(corpus_path)))
+    matches = pinecone.post("/query", json={"vector": [0.1] * 8, "topK": 3, "includeMetadata": True}).json()["matches"]
+    assert len(matches) == 3 and "reference" in matches[0]["metadata"]
+    fetched = pinecone.get("/vectors/fetch", params={"ids": ["NT-juan-03-016"]}).json()["vectors"]
+    assert fetched["NT-juan-03-016"]["metadata"]["reference"] == "Juan 3:16"
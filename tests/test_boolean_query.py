@@ -0,0 +1,64 @@
+import asyncio
+
+from src.services.boolean_query import (
+    Group, Or, Phrase, Term, QueryPlanner, gallop_intersect, needs_planner, parse_query, sorted_difference,
+)
+from src.usecases.search_usecase import SearchUseCase
+
+
+def ids(index_service, ordinals):
+    return [index_service.doc_ids[o] for o in ordinals]
+
+
+def test_parse_operators():
+    node = parse_query('+dios -mundo "porque dios" (amor OR fe)')
+    assert isinstance(node, Group)
+    assert node.must == [Term("dios"), Phrase("porque dios", ["porque", "dios"])]
+    assert node.must_not == [Term("mundo")]
+    assert node.should == [Or([Term("amor"), Term("fe")])]
+
+
+def test_plain_tokens_keep_legacy_path():
+    assert not needs_planner(parse_query("amor de dios"))
+    assert not needs_planner(parse_query('"amor de dios"'))
+    assert needs_planner(parse_query("amor OR fe"))
+    assert needs_planner(parse_query('"hijo" "mundo"'))
+
+
+def test_gallop_and_difference():
+    large = list(range(0, 1000, 3))
+    assert gallop_intersect([3, 4, 300, 999, 5000], large) == [3, 300, 999]
+    assert gallop_intersect([], large) == []
+    assert sorted_difference([1, 2, 3, 4, 5], [2, 4, 9]) == [1, 3, 5]
+
+
+def test_must_and_exclude(index_service):
+    planner = QueryPlanner(index_service)
+    result, _ = planner.execute(parse_query("+dios +hijo -condenar"))
+    assert ids(index_service, result) == ["NT-juan-03-016"]
+
+
+def test_or_and_phrases(index_service):
+    planner = QueryPlanner(index_service)
+    result, _ = planner.execute(parse_query('"dios es amor" OR semilla'))
+    assert ids(index_service, result) == ["NT-1-juan-04-008", "BM-alma-32-028"]
+    result, _ = planner.execute(parse_query('"porque" "al mundo"'))
+    assert ids(index_service, result) == ["NT-juan-03-016", "NT-juan-03-017"]
+
+
+def test_explain_short_circuits(index_service):
+    planner = QueryPlanner(index_service)
+    result, plan = planner.execute(parse_query("+inexistente +dios +mundo"), explain=True)
+    assert result == []
+    assert plan["short_circuit"] is True
+    assert plan["must"][0]["token"] == "inexistente"
+    assert plan["must"][0]["cardinality"] == 0
+    assert all(step["op"] == "SKIPPED" for step in plan["must"][1:])
+
+
+def test_usecase_explain(index_service):
+    usecase = SearchUseCase(index_service)
+    results, plan = asyncio.run(usecase.explain("+juan -amo", top_k=5))
+    assert [r["id"] for r in results] == ["NT-juan-03-017", "NT-1-juan-04-008"]
+    assert plan["strategy"] == "boolean"
+    assert plan["total"] == 2
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import tracemalloc
+
+import orjson
+import pytest
+
+from src.services.boolean_query import QueryPlanner, parse_query
+from src.services.columnar_store import ColumnarStore, StringColumn
+from src.services.inverted_index import InvertedIndexService
+from src.usecases.search_usecase import SearchUseCase
+
+from tests.conftest import SAMPLE_VERSES
+
+
+VALUES = ["", "En el principio", "ñandú cigüeña", "", "x" * 1000]
+
+
+@pytest.mark.parametrize("codec", ["none", "zlib"])
+def test_string_column_roundtrip(tmp_path, codec):
+    column = StringColumn.build(VALUES, codec=codec, block_size=2)
+    assert len(column) == len(VALUES)
+    assert [column.get(i) for i in range(len(column))] == VALUES
+
+    path = str(tmp_path / "cols")
+    ColumnarStore({"text": column}).save(path)
+    loaded = ColumnarStore.load(path)["text"]
+    assert loaded.codec == codec
+    assert [loaded.get(i) for i in range(len(loaded))] == VALUES
+
+
+def test_load_keeps_only_the_column_payloads(tmp_path):
+    texts = [os.urandom(200).hex() for _ in range(2000)]
+    path = str(tmp_path / "cols")
+    ColumnarStore({
+        "text": StringColumn.build(texts, codec="zlib"),
+        "ref": StringColumn.build(f"Juan 1:{i}" for i in range(2000)),
+    }).save(path)
+    tracemalloc.start()
+    store = ColumnarStore.load(path)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Con el archivo entero retenido (más la copia de los bloques) serían ~2x su tamaño
+    assert retained < 1.2 * os.path.getsize(path)
+    assert store["text"].get(1999) == texts[1999] and store["ref"].get(5) == "Juan 1:5"
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        StringColumn.build(VALUES, codec="lz4")
+
+
+def test_index_exposes_columns_by_id_and_ordinal(index_service):
+    for ordinal, (vid, ref, text) in enumerate(SAMPLE_VERSES):
+        assert index_service.text(ordinal) == text
+        assert index_service.ref_by_id[vid] == ref
+        assert index_service.text_by_id.get(vid) == text
+    assert index_service.text_by_id.get("no-existe") is None
+    assert not hasattr(index_service, "normwords_by_id")
+
+
+def test_compressed_index_reloads_and_matches_phrases(corpus_path):
+    built = InvertedIndexService(jsonl_path=corpus_path, text_compression="zlib")
+    assert os.path.exists(built.columns_path)
+    reloaded = InvertedIndexService(jsonl_path=corpus_path, text_compression="zlib")
+    assert reloaded.columns["text"].codec == "zlib"
+    assert dict(reloaded.text_by_id.items()) == {vid: text for vid, _, text in SAMPLE_VERSES}
+
+    ordinals, _ = QueryPlanner(reloaded).execute(parse_query('"hijo al mundo"'))
+    assert [reloaded.doc_ids[o] for o in ordinals] == ["NT-juan-03-017"]
+
+
+def test_legacy_index_file_is_converted(corpus_path):
+    legacy = {
+        "text_by_id": {vid: text for vid, _, text in SAMPLE_VERSES},
+        "ref_by_id": {vid: ref for vid, ref, _ in SAMPLE_VERSES},
+        "normwords_by_id": {},
+        "postings": {"dios": [v for v, _, t in SAMPLE_VERSES if "Dios" in t]},
+    }
+    with open(corpus_path + ".idx", "wb") as f:
+        f.write(orjson.dumps(legacy))
+    service = InvertedIndexService(jsonl_path=corpus_path)
+    assert service.doc_ids == [vid for vid, _, _ in SAMPLE_VERSES]
+    assert service.ref(2) == "Juan 3:16"
+    assert service.metadata_index.evaluate({"book": "juan"}) is not None
+
+
+def test_phrase_scan_only_decompresses_blocks_with_hits(tmp_path):
+    path = tmp_path / "grande.jsonl"
+    with open(path, "wb") as f:
+        for i in range(700):
+            text = "Porque de tal manera amó Dios al mundo" if i == 600 else f"Versículo de relleno número {i}"
+            f.write(orjson.dumps({"id": f"X-{i}", "text": text, "metadata": {"reference": f"Juan 1:{i + 1}"}}) + b"\n")
+    service = InvertedIndexService(jsonl_path=str(path), text_compression="zlib")
+    usecase = SearchUseCase(service)
+    results = asyncio.run(usecase.search('"AMO DIOS al mundo"', top_k=10))
+    assert [r["id"] for r in results] == ["X-600"]
+    assert list(service.columns["text"]._cache) == [600 // service.columns["text"].block_size]
+    assert set(service.columns.columns) == {"text", "ref", "meta"}
+
+
+@pytest.mark.parametrize("phrase", ["amó dios al mundo", "mor de tal", "ios", "de tal", "dios a", "su hijo al mundo", "xyz", "l"])
+def test_phrase_candidates_from_postings_match_full_scan(index_service, phrase):
+    usecase = SearchUseCase(index_service)
+    phrase_norm = index_service.norm_words(phrase)
+    expected = [o for o in index_service.all_ordinals() if phrase_norm in index_service.norm_text(o)]
+    assert list(usecase._phrase_matches(phrase_norm, None)) == expected
+    assert list(usecase._phrase_matches(phrase_norm, None, start=3)) == [o for o in expected if o >= 3]
@@ -49,3 +49,19 @@ def test_post_document():
         data = response.json()
         assert "id" in data
         assert data["status"] in ("created", "updated")
+
+
+def test_export_documents_ndjson():
+    import json
+    client = TestClient(app)
+    response = client.get("/api/v1/documents/export", params={"filters": '{"volume": "AT"}'})
+    assert response.status_code in (200, 500)
+    if response.status_code == 200:
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        for line in response.text.splitlines()[:5]:
+            doc = json.loads(line)
+            assert "id" in doc
+            assert "text" in doc
+            assert "metadata" in doc
+    bad = client.get("/api/v1/documents/export", params={"filters": '{"autor": "x"}'})
+    assert bad.status_code == 400
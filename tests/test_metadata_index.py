@@ -0,0 +1,97 @@
+import asyncio
+import random
+
+import pytest
+
+from src.services.bitmap import Bitmap
+from src.services.inverted_index import InvertedIndexService
+from src.services.metadata_index import to_pinecone_filter
+from src.usecases.search_usecase import SearchUseCase
+
+
+def test_bitmap_set_operations():
+    rng = random.Random(7)
+    a = set(rng.sample(range(200000), 60000))
+    b = set(rng.sample(range(200000), 3000)) | set(range(70000, 140000))
+    ba, bb = Bitmap.from_iterable(a), Bitmap.from_iterable(b)
+    assert (ba & bb).to_list() == sorted(a & b)
+    assert (ba | bb).to_list() == sorted(a | b)
+    assert (ba - bb).to_list() == sorted(a - b)
+    assert len(ba) == len(a)
+    assert all((x in ba) == (x in a) for x in range(0, 200000, 97))
+    assert Bitmap.full(70000).to_list() == list(range(70000))
+
+
+def test_filters_evaluate(index_service):
+    meta = index_service.metadata_index
+    alma = meta.evaluate({"book": "Alma", "chapter": {"gte": 30}})
+    assert [index_service.doc_ids[o] for o in alma] == ["BM-alma-32-021", "BM-alma-32-028"]
+    nt = meta.evaluate({"volume": "NT", "verse": {"lte": 16}})
+    assert [index_service.doc_ids[o] for o in nt] == ["NT-juan-03-016", "NT-1-juan-04-008"]
+    assert not meta.evaluate({"book": "genesis", "chapter": {"gt": 30}})
+    with pytest.raises(ValueError):
+        meta.evaluate({"autor": "Juan"})
+
+
+def test_filters_survive_reload(index_service, corpus_path):
+    reloaded = InvertedIndexService(jsonl_path=corpus_path)
+    assert reloaded.metadata_index.evaluate({"book": ["Juan", "1 Juan"]}).to_list() == [2, 3, 4]
+
+
+def test_search_with_filters(index_service):
+    usecase = SearchUseCase(index_service)
+    results = asyncio.run(usecase.search("dios", top_k=10, filters={"book": "Juan"}))
+    assert sorted(r["id"] for r in results) == ["NT-juan-03-016", "NT-juan-03-017"]
+    results = asyncio.run(usecase.search("+dios -amo", top_k=10, filters={"volume": {"in": ["NT", "AT"]}}))
+    assert [r["id"] for r in results] == ["AT-genesis-01-001", "NT-juan-03-017", "NT-1-juan-04-008"]
+
+
+def test_pinecone_filter_translation():
+    assert to_pinecone_filter(["Alma 32:21", "Alma 32:28", "Alma 32:21"]) == {
+        "reference": {"$in": ["Alma 32:21", "Alma 32:28"]},
+    }
+
+
+class Embedder:
+    async def embed(self, text):
+        return [0.1]
+
+
+class RecordingAdapter:
+    namespace = "es"
+
+    def __init__(self, ids=()):
+        self.ids = list(ids)
+        self.calls = []
+
+    def query(self, embedding, top_k=10, filter=None, namespace=None, timeout=None):
+        self.calls.append((top_k, filter, namespace))
+        return [{"id": vid, "ref": "", "snippet": "", "score": 0.5} for vid in self.ids][:top_k]
+
+
+def test_semantic_filters_are_validated_before_querying(index_service):
+    adapter = RecordingAdapter()
+    usecase = SearchUseCase(index_service, embedder=Embedder(), pinecone_adapter=adapter)
+    for filters in ({"autor": "x"}, {"chapter": {"foo": 1}}):
+        with pytest.raises(ValueError):
+            asyncio.run(usecase.search("amor", mode="semantic", filters=filters))
+    assert adapter.calls == []
+
+
+def test_semantic_filters_match_literal_normalization(index_service):
+    adapter = RecordingAdapter()
+    usecase = SearchUseCase(index_service, embedder=Embedder(), pinecone_adapter=adapter)
+    asyncio.run(usecase.search("amor", mode="semantic", filters={"book": "JUAN", "verse": {"gte": 16}}))
+    assert adapter.calls == [(10, {"reference": {"$in": ["Juan 3:16", "Juan 3:17"]}}, None)]
+    # Ningún versículo cumple el filtro: no se consulta Pinecone
+    assert asyncio.run(usecase.search("amor", mode="semantic", filters={"book": "Éxodo"})) == []
+    assert len(adapter.calls) == 1
+
+
+def test_semantic_filters_post_filter_other_namespaces(index_service):
+    adapter = RecordingAdapter(ids=["BM-alma-32-021", "NT-juan-03-016", "NT-juan-03-017"])
+    usecase = SearchUseCase(index_service, embedder=Embedder(), pinecone_adapter=adapter)
+    results = asyncio.run(usecase.search_namespaces("amor", ["en"], top_k=1, filters={"book": "juan"}))
+    assert [r["id"] for r in results] == ["NT-juan-03-016"]
+    top_k, pinecone_filter, namespace = adapter.calls[0]
+    assert pinecone_filter is None and namespace == "en" and top_k > 1
@@ -0,0 +1,48 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.infra.metrics import (
+    Counter, Histogram, Registry, RequestTimingMiddleware, STAGE_DURATION, record_stage, server_timing, stage,
+)
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.register(Counter("demo_requests_total", "Peticiones", ("route",)))
+    latency = registry.register(Histogram("demo_seconds", "Latencia", buckets=(0.1, 1.0)))
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    latency.observe(0.05)
+    latency.observe(5.0)
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{route="/a"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 1' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 2' in text
+    assert "demo_seconds_count 2" in text
+
+
+def test_server_timing_merges_repeated_stages():
+    header = server_timing([("postings", 0.001), ("parse", 0.0005), ("postings", 0.002)], total=0.01)
+    assert header == "postings;dur=3.000, parse;dur=0.500, total;dur=10.000"
+
+
+def test_middleware_adds_server_timing_and_feeds_histograms():
+    app = FastAPI()
+    app.add_middleware(RequestTimingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        with stage("lookup"):
+            pass
+        record_stage("serialize", 0.002)
+        return {"id": item_id}
+
+    before = STAGE_DURATION.count(stage="lookup")
+    response = TestClient(app).get("/items/42")
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("lookup;dur=")
+    assert "serialize;dur=2.000" in timing and "total;dur=" in timing
+    assert STAGE_DURATION.count(stage="lookup") == before + 1
@@ -0,0 +1,87 @@
+import asyncio
+
+import orjson
+import pytest
+
+from src.services.inverted_index import InvertedIndexService
+from src.services.pagination import InvalidCursor, SnapshotStore, decode_cursor, encode_cursor
+from src.usecases.search_usecase import SearchUseCase
+
+
+def collect_pages(usecase, query, top_k, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page, cursor = asyncio.run(usecase.search_page(query, top_k=top_k, cursor=cursor, **kwargs))
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("query", ["dios mundo", '"porque"', "+dios -tierra", "Juan 3; 1 Juan 4"])
+def test_literal_pages_are_stable_and_disjoint(index_service, query):
+    usecase = SearchUseCase(index_service)
+    full = asyncio.run(usecase.search(query, top_k=100))
+    pages = collect_pages(usecase, query, top_k=2)
+    flat = [r["id"] for page in pages for r in page]
+    assert flat == [r["id"] for r in full]
+    assert len(flat) == len(set(flat))
+    keys = [(-r["score"], index_service.ordinal_by_id[r["id"]]) for page in pages for r in page]
+    assert keys == sorted(keys)
+
+
+def test_reference_pages_follow_canonical_order(tmp_path):
+    path = tmp_path / "desordenado.jsonl"
+    with open(path, "wb") as f:
+        for vid, ref in [("NT-juan-03-017", "Juan 3:17"), ("NT-juan-03-002", "Juan 3:2"),
+                         ("NT-juan-03-016", "Juan 3:16"), ("AT-genesis-01-001", "Génesis 1:1")]:
+            f.write(orjson.dumps({"id": vid, "text": "texto", "metadata": {"reference": ref}}) + b"\n")
+    usecase = SearchUseCase(InvertedIndexService(jsonl_path=str(path)))
+    expected = ["NT-juan-03-002", "NT-juan-03-016", "NT-juan-03-017", "AT-genesis-01-001"]
+    assert [r["id"] for r in asyncio.run(usecase.search("Juan 3; Génesis 1", top_k=10))] == expected
+    pages = collect_pages(usecase, "Juan 3; Génesis 1", top_k=1)
+    assert [r["id"] for page in pages for r in page] == expected
+
+
+def test_cursor_is_bound_to_query(index_service):
+    usecase = SearchUseCase(index_service)
+    _, cursor = asyncio.run(usecase.search_page("dios", top_k=1))
+    with pytest.raises(InvalidCursor):
+        asyncio.run(usecase.search_page("mundo", top_k=1, cursor=cursor))
+    with pytest.raises(InvalidCursor):
+        asyncio.run(usecase.search_page("dios", top_k=1, cursor="no-es-un-cursor"))
+    assert decode_cursor(encode_cursor({"s": 1.0, "o": 3})) == {"s": 1.0, "o": 3}
+
+
+class CountingEmbedder:
+    calls = 0
+
+    async def embed(self, text):
+        self.calls += 1
+        return [0.0]
+
+
+class FakeAdapter:
+    calls = 0
+
+    def query(self, embedding, top_k=10, filter=None, timeout=None):
+        self.calls += 1
+        return [{"id": f"v{i}", "ref": "", "snippet": "", "score": 1.0 - i / 100} for i in range(min(top_k, 25))]
+
+
+def test_semantic_pages_reuse_snapshot(index_service):
+    embedder, adapter = CountingEmbedder(), FakeAdapter()
+    usecase = SearchUseCase(index_service, embedder=embedder, pinecone_adapter=adapter, snapshots=SnapshotStore(), snapshot_k=25)
+    pages = collect_pages(usecase, "amor", top_k=10, mode="semantic")
+    assert [len(p) for p in pages] == [10, 10, 5]
+    assert embedder.calls == 1 and adapter.calls == 1
+    ids = [r["id"] for page in pages for r in page]
+    assert sorted(ids) == sorted(f"v{i}" for i in range(25))
+
+
+def test_semantic_cursor_survives_expired_snapshot(index_service):
+    embedder, adapter = CountingEmbedder(), FakeAdapter()
+    usecase = SearchUseCase(index_service, embedder=embedder, pinecone_adapter=adapter, snapshots=SnapshotStore(ttl_seconds=-1), snapshot_k=25)
+    first, cursor = asyncio.run(usecase.search_page("amor", top_k=10, mode="semantic"))
+    second, _ = asyncio.run(usecase.search_page("amor", top_k=10, mode="semantic", cursor=cursor))
+    assert not {r["id"] for r in first} & {r["id"] for r in second}
+    assert adapter.calls == 2
@@ -0,0 +1,69 @@
+import orjson
+
+from benchmarks.fakes import FakePineconeAdapter, FakePineconeIndex
+from src.services.inverted_index import InvertedIndexService
+
+
+class RecordingIndex(FakePineconeIndex):
+    def __init__(self, records):
+        super().__init__(records)
+        self.include_metadata = []
+        self.fetched = []
+
+    def query(self, vector, include_metadata=True, **kwargs):
+        self.include_metadata.append(include_metadata)
+        return super().query(vector, include_metadata=include_metadata, **kwargs)
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        self.fetched.append(list(ids))
+        return super().fetch(ids, namespace=namespace, **kwargs)
+
+
+def _records(index_service):
+    records = [
+        {"id": vid, "metadata": {"reference": index_service.ref_by_id[vid], "contenido": index_service.text_by_id[vid], "libro": "x"}}
+        for vid in index_service.doc_ids
+    ]
+    records.append({"id": "solo-remoto", "metadata": {"reference": "Remoto 1:1", "contenido": "texto remoto"}})
+    return records
+
+
+def test_id_only_queries_hydrate_locally_and_fetch_missing(index_service):
+    index = RecordingIndex(_records(index_service))
+    adapter = FakePineconeAdapter(index=index, hydrate_from=index_service)
+    results = adapter.query([0.1, 0.2], top_k=len(index.records))
+    assert index.include_metadata == [False]
+    assert index.fetched == [["solo-remoto"]]
+    by_id = {r["id"]: r for r in results}
+    assert by_id["NT-juan-03-016"]["ref"] == "Juan 3:16"
+    assert by_id["NT-juan-03-016"]["snippet"] == index_service.text_by_id["NT-juan-03-016"]
+    assert by_id["solo-remoto"]["snippet"] == "texto remoto"
+    assert [r["id"] for r in results] == [m["id"] for m in index.query([0.1, 0.2], top_k=len(index.records))["matches"]]
+
+
+def test_metadata_mode_is_unchanged(index_service):
+    index = RecordingIndex(_records(index_service))
+    results = FakePineconeAdapter(index=index).query([0.3], top_k=3)
+    assert index.include_metadata == [True]
+    assert index.fetched == []
+    assert all(r["metadata"].get("libro") == "x" or r["id"] == "solo-remoto" for r in results)
+
+
+def test_documents_bulk_lookup(index_service):
+    docs = index_service.documents(["NT-juan-03-017", "no-existe", "AT-genesis-01-001"])
+    assert list(docs) == ["AT-genesis-01-001", "NT-juan-03-017"]
+    assert docs["NT-juan-03-017"][0] == "Juan 3:17"
+
+
+def test_id_only_and_metadata_modes_return_same_metadata(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    with open(path, "wb") as f:
+        for i in range(1, 4):
+            md = {"reference": f"Juan 1:{i}", "libro": "Juan", "capitulo": 1, "tags": ["logos"]}
+            f.write(orjson.dumps({"id": f"NT-juan-01-00{i}", "text": f"versículo {i}", "metadata": md}) + b"\n")
+    service = InvertedIndexService(jsonl_path=str(path))
+    index = FakePineconeIndex.from_corpus(str(path))
+    with_metadata = FakePineconeAdapter(index=index).query([0.5], top_k=3)
+    id_only = FakePineconeAdapter(index=index, hydrate_from=service).query([0.5], top_k=3)
+    assert id_only == with_metadata
+    assert id_only[0]["metadata"]["tags"] == ["logos"]
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from src.infra.profiling import SlowQueryLog, StackSampler
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(200))
+
+
+def test_sampler_collapses_stacks_of_target_thread():
+    with StackSampler(0.001, thread_id=threading.get_ident()) as sampler:
+        _busy(0.1)
+    assert sampler.samples > 0
+    folded = sampler.collapsed().splitlines()
+    assert folded
+    stack, count = folded[0].rsplit(" ", 1)
+    assert int(count) >= 1
+    assert any("_busy (test_profiling.py" in line for line in folded)
+    assert stack.split(";")[-1]
+    assert sampler.summary(top=1)["stacks"][0]["count"] == int(count)
+
+
+def test_sampler_without_thread_id_samples_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=lambda: stop.wait(1.0))
+    worker.start()
+    with StackSampler(0.001) as sampler:
+        time.sleep(0.05)
+    stop.set()
+    worker.join()
+    assert sampler.samples > 0
+    assert "stack-sampler" not in sampler.collapsed()
+    assert "<lambda> (test_profiling.py" in sampler.collapsed()
+
+
+def test_slow_query_log_threshold():
+    log = SlowQueryLog(threshold_ms=100, max_entries=2)
+    assert not log.record(50, {"q": "rápida"})
+    assert log.record(150, {"q": "lenta", "stages": {"postings": 120.0}})
+    log.record(200, {"q": "b"})
+    log.record(300, {"q": "c"})
+    entries = log.entries()
+    assert [e["q"] for e in entries] == ["b", "c"]
+    assert entries[-1]["duration_ms"] == 300
+
+
+def test_slow_query_log_disabled_with_zero_threshold():
+    log = SlowQueryLog(threshold_ms=0)
+    assert not log.record(10_000, {"q": "x"})
+    assert log.entries() == []
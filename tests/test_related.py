@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from src.services.related import NO_NEIGHBOR, RelatedIndex
+
+
+def _brute_force(vectors, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    sims = vectors @ vectors.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.argsort(-sims, axis=1, kind="stable")[:, :k]
+
+
+def _random(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_build_matches_brute_force_across_blocks():
+    vectors = _random(50)
+    ids = [f"v{i}" for i in range(50)]
+    index = RelatedIndex.build(ids, vectors, k=5, batch=7)
+    assert (index.neighbors == _brute_force(vectors, 5)).all()
+    assert (np.diff(index.scores, axis=1) <= 0).all()
+
+
+def test_related_returns_ids_and_respects_limit():
+    vectors = np.array([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9]], dtype=np.float32)
+    index = RelatedIndex.build(["a", "b", "c", "d"], vectors, k=3)
+    assert [vid for vid, _ in index.related("a")] == ["b", "d", "c"]
+    assert [vid for vid, _ in index.related("c", limit=1)] == ["d"]
+    assert index.related("zzz") is None
+
+
+def test_missing_vectors_are_not_neighbors_and_lists_are_padded():
+    vectors = np.array([[1, 0], [0, 0], [0.5, 0.5]], dtype=np.float32)
+    index = RelatedIndex.build(["a", "b", "c"], vectors, k=4)
+    assert index.related("a") == [("c", index.related("a")[0][1])]
+    assert index.related("b") == []
+    assert index.neighbors[0, 1] == NO_NEIGHBOR
+
+
+def test_update_matches_full_rebuild():
+    vectors = _random(40, seed=1)
+    ids = [f"v{i}" for i in range(40)]
+    index = RelatedIndex.build(ids, vectors, k=4, batch=16)
+    changed = {"v3": _random(1, seed=2)[0], "v17": vectors[5] * 2 + 0.01, "nuevo": vectors[9] + 0.001}
+    recomputed = index.update(changed)
+    assert 3 <= recomputed < 41
+
+    expected = np.vstack([vectors, changed["nuevo"]])
+    expected[3] = changed["v3"]
+    expected[17] = changed["v17"]
+    rebuilt = RelatedIndex.build(ids + ["nuevo"], expected, k=4)
+    assert index.ids == rebuilt.ids
+    assert (index.neighbors == rebuilt.neighbors).all()
+    assert np.allclose(index.scores, rebuilt.scores, atol=1e-6)
+    assert index.related("nuevo")[0][0] == "v9"
+
+
+def test_save_load_and_persisted_update(tmp_path):
+    vectors = _random(12, seed=3)
+    ids = [f"v{i}" for i in range(12)]
+    RelatedIndex.build(ids, vectors, k=3).save(str(tmp_path))
+    loaded = RelatedIndex.load(str(tmp_path))
+    assert loaded.related("v0") == RelatedIndex.build(ids, vectors, k=3).related("v0")
+
+    loaded.update({"v12": vectors[0]})
+    assert RelatedIndex.load(str(tmp_path)).related("v12") is None
+    assert loaded.flush() and not loaded.flush()
+    reloaded = RelatedIndex.load(str(tmp_path))
+    assert reloaded.related("v12")[0][0] == "v0"
+    assert reloaded.related("v0")[0][0] == "v12"
+    assert len([p for p in tmp_path.iterdir() if p.name.startswith("v-")]) == 1
+
+
+def test_updates_write_rows_in_place_with_spare_capacity():
+    vectors = _random(10, seed=4)
+    index = RelatedIndex.build([f"v{i}" for i in range(10)], vectors, k=3)
+    index.update({"n0": vectors[1]})
+    buffer = index._neighbors
+    assert len(buffer) == 20
+    for i in range(1, 5):
+        index.update({f"n{i}": vectors[i + 1], "v0": vectors[i]})
+    assert index._neighbors is buffer
+    assert len(index.neighbors) == 15 and index.related("n4")[0][0] == "v5"
+
+
+def _current_version(path):
+    return (path / "CURRENT").read_text()
+
+
+def test_failed_save_keeps_previous_version(tmp_path, monkeypatch):
+    vectors = _random(6, seed=5)
+    index = RelatedIndex.build([f"v{i}" for i in range(6)], vectors, k=2)
+    index.save(str(tmp_path))
+    index.update({"nuevo": vectors[2]})
+    real_save = np.save
+
+    def failing_save(file, array):
+        if file.endswith("scores.npy"):
+            raise OSError("disco lleno")
+        real_save(file, array)
+
+    monkeypatch.setattr(np, "save", failing_save)
+    with pytest.raises(OSError):
+        index.flush()
+    assert index.dirty
+    loaded = RelatedIndex.load(str(tmp_path))
+    assert loaded.ids == [f"v{i}" for i in range(6)] and loaded.related("nuevo") is None
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith("v-")] == [_current_version(tmp_path)]
+
+
+def test_update_rejects_other_dimension_without_changes():
+    index = RelatedIndex.build(["a", "b"], np.eye(2, dtype=np.float32), k=1)
+    with pytest.raises(ValueError):
+        index.update({"c": [1.0, 0.0, 0.0]})
+    assert index.ids == ["a", "b"] and index.related("c") is None
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+
+import pytest
+
+from benchmarks.fakes import FakeEmbedder, FakePineconeAdapter, FakePineconeIndex, Latency
+from src.infra.resilience import (
+    BackendGuard, BackendUnavailable, CircuitBreaker, call_timeout, request_budget,
+)
+from src.usecases.search_usecase import SearchUseCase
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_allows_single_probe():
+    clock = Clock()
+    breaker = CircuitBreaker("demo", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_budget_caps_call_timeout():
+    assert call_timeout(5.0) == 5.0
+    with request_budget(0.5):
+        assert 0.4 < call_timeout(5.0) <= 0.5
+
+
+def test_guard_times_out_and_opens_circuit():
+    guard = BackendGuard("lento", timeout=0.02, breaker=CircuitBreaker("lento", failure_threshold=1))
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(1)
+
+    with pytest.raises(BackendUnavailable):
+        asyncio.run(guard.call(slow))
+    assert guard.breaker.state == "open"
+    with pytest.raises(BackendUnavailable, match="circuito abierto"):
+        asyncio.run(guard.call(slow))
+    assert len(calls) == 1
+
+
+def test_guard_hedges_after_p95():
+    guard = BackendGuard("hedge", timeout=1.0, hedge=True, hedge_min_delay=0.01, hedge_min_samples=1)
+    guard.latency.observe(0.01)
+    delays = iter([0.5, 0.0])
+
+    async def call():
+        await asyncio.sleep(next(delays))
+        return "ok"
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        result = await guard.call(call)
+        return result, asyncio.get_running_loop().time() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == "ok"
+    assert elapsed < 0.3
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_rejected_requests_do_not_open_circuit():
+    guard = BackendGuard("pc", timeout=1.0, breaker=CircuitBreaker("pc", failure_threshold=1))
+
+    async def fail(status):
+        raise StatusError(status)
+
+    for _ in range(3):
+        with pytest.raises(BackendUnavailable, match="rechazada"):
+            asyncio.run(guard.call(lambda: fail(400)))
+    assert guard.breaker.state == "closed"
+    with pytest.raises(BackendUnavailable):
+        asyncio.run(guard.call(lambda: fail(503)))
+    assert guard.breaker.state == "open"
+
+
+def test_cancelled_probe_releases_half_open_circuit():
+    clock = Clock()
+    guard = BackendGuard("pc", timeout=5.0, breaker=CircuitBreaker("pc", failure_threshold=1, clock=clock))
+    guard.breaker.record_failure()
+    clock.now = 60
+
+    async def run():
+        task = asyncio.ensure_future(guard.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await guard.call(lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(run()) == "ok"
+    assert guard.breaker.state == "closed"
+
+
+class FailingEmbedder:
+    async def embed(self, text):
+        raise ConnectionError("ollama caído")
+
+
+class UnusedAdapter:
+    def query(self, embedding, top_k=10, filter=None, timeout=None):
+        raise AssertionError("no debería consultarse")
+
+
+def test_semantic_search_degrades_to_literal(index_service):
+    usecase = SearchUseCase(index_service, embedder=FailingEmbedder(), pinecone_adapter=UnusedAdapter())
+
+    async def run():
+        with request_budget(1.0) as budget:
+            results = await usecase.search("mundo", top_k=5, mode="semantic")
+        return results, budget.degraded
+
+    results, degraded = asyncio.run(run())
+    assert [r["id"] for r in results] == ["NT-juan-03-016", "NT-juan-03-017"]
+    assert degraded and degraded[0].startswith("ollama")
+
+
+class SlowIndex(FakePineconeIndex):
+    def __init__(self, records):
+        super().__init__(records, Latency(base_ms=2000))
+        self.timeouts = []
+        self.finished = threading.Event()
+
+    def query(self, vector, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        try:
+            return super().query(vector, timeout=timeout, **kwargs)
+        finally:
+            self.finished.set()
+
+
+def test_timed_out_pinecone_call_releases_its_thread(index_service):
+    index = SlowIndex([{"id": vid, "metadata": {}} for vid in index_service.doc_ids])
+    usecase = SearchUseCase(index_service, embedder=FakeEmbedder(), pinecone_adapter=FakePineconeAdapter(index=index),
+                            pinecone_guard=BackendGuard("pinecone", timeout=0.1))
+
+    async def run():
+        with request_budget(1.0) as budget:
+            results = await usecase.search("mundo", top_k=5, mode="semantic")
+        return results, budget.degraded
+
+    results, degraded = asyncio.run(run())
+    assert degraded and degraded[0].startswith("pinecone")
+    assert [r["id"] for r in results] == ["NT-juan-03-016", "NT-juan-03-017"]
+    # El timeout de la llamada es el del guard: el hilo termina enseguida y no a los 2 s de latencia
+    assert 0 < index.timeouts[0] <= 0.1
+    assert index.finished.wait(0.5)
@@ -0,0 +1,59 @@
+import asyncio
+
+from src.domain.scripture_reference import book_order, canon_sort_key, parse_reference_query
+from src.usecases.search_usecase import SearchUseCase
+
+
+def test_parse_reference_query_forms():
+    juan = book_order("Juan")
+    assert parse_reference_query("Juan 3:16")[0].start_key() == (juan, 3, 16)
+    r = parse_reference_query("alma 32:21-43")[0]
+    assert (r.chapter, r.verse, r.end_chapter, r.end_verse) == (32, 21, 32, 43)
+    whole = parse_reference_query("Juan 3")[0]
+    assert (whole.verse, whole.end_chapter) == (0, 3) and whole.end_verse > 1000
+    listed = parse_reference_query("Juan 3:16,18,20-22; 4:2")
+    assert [(x.chapter, x.verse, x.end_verse) for x in listed] == [(3, 16, 16), (3, 18, 18), (3, 20, 22), (4, 2, 2)]
+    assert parse_reference_query("1 Juan 4:8")[0].book == book_order("1 Juan")
+    assert parse_reference_query("Mosiah 2:17")[0].book == book_order("Mosíah")
+
+
+def test_non_references():
+    assert parse_reference_query("amor de dios") is None
+    assert parse_reference_query("juan") is None
+    assert parse_reference_query("capitulo 3") is None
+
+
+def test_canon_sort_key_aliases():
+    assert canon_sort_key("Genesis 1:1") < canon_sort_key("Juan 3:16") < canon_sort_key("Alma 32:21")
+
+
+def test_reference_fast_path(index_service):
+    usecase = SearchUseCase(index_service)
+    results = asyncio.run(usecase.search("Juan 3:16", top_k=10))
+    assert [r["id"] for r in results] == ["NT-juan-03-016"]
+    results = asyncio.run(usecase.search("Alma 32:21-43", top_k=10))
+    assert [r["id"] for r in results] == ["BM-alma-32-021", "BM-alma-32-028"]
+    results = asyncio.run(usecase.search("Juan 3; Génesis 1:1", top_k=10))
+    assert [r["id"] for r in results] == ["NT-juan-03-016", "NT-juan-03-017", "AT-genesis-01-001"]
+    _, plan = asyncio.run(usecase.explain("Juan 3:17", top_k=10))
+    assert plan["strategy"] == "reference"
+
+
+def test_unmatched_reference_returns_nothing(index_service):
+    usecase = SearchUseCase(index_service)
+    assert asyncio.run(usecase.search("Juan 99:1", top_k=10)) == []
+    assert asyncio.run(usecase.search("Juan 3:99", top_k=10)) == []
+    assert asyncio.run(usecase.search("Juan 3:16", top_k=10, filters={"book": "1 Juan"})) == []
+    results, plan = asyncio.run(usecase.explain("Juan 99:1", top_k=10))
+    assert results == [] and plan["strategy"] == "reference" and plan["total"] == 0
+
+
+def test_reversed_ranges_swap_bounds(index_service):
+    juan = book_order("Juan")
+    assert parse_reference_query("Juan 3:20-16") == parse_reference_query("Juan 3:16-20")
+    assert parse_reference_query("Juan 3:16,18-17")[1] == parse_reference_query("Juan 3:17-18")[0]
+    assert parse_reference_query("Juan 4-3") == parse_reference_query("Juan 3-4")
+    reversed_chapters = parse_reference_query("Juan 4:2-3:16")[0]
+    assert (reversed_chapters.start_key(), reversed_chapters.end_key()) == ((juan, 3, 16), (juan, 4, 2))
+    results = asyncio.run(SearchUseCase(index_service).search("Juan 3:17-16", top_k=10))
+    assert [r["id"] for r in results] == ["NT-juan-03-016", "NT-juan-03-017"]
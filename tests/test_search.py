@@ -30,3 +30,41 @@ def test_search_semantic():
         assert "score" in data["results"][0]
         assert "snippet" in data["results"][0]
         assert "metadata" in data["results"][0]
+
+def test_search_stream_ndjson():
+    import json
+    client = TestClient(app)
+    payload = {"q": "amor", "top_k": 5}
+    response = client.post("/api/v1/search/stream", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert len(lines) <= 5
+    for item in lines:
+        assert "id" in item
+        assert "score" in item
+
+def test_search_cursor_pagination():
+    client = TestClient(app)
+    first = client.post("/api/v1/search", json={"q": "amor", "top_k": 2, "paginate": True})
+    assert first.status_code == 200
+    data = first.json()
+    assert "next_cursor" in data
+    if data["next_cursor"]:
+        second = client.post("/api/v1/search", json={"q": "amor", "top_k": 2, "search_after": data["next_cursor"]})
+        assert second.status_code == 200
+        first_ids = {r["id"] for r in data["results"]}
+        assert not first_ids & {r["id"] for r in second.json()["results"]}
+    bad = client.post("/api/v1/search", json={"q": "amor", "search_after": "cursor-invalido"})
+    assert bad.status_code == 400
+
+
+def test_search_batch_keeps_order_and_errors():
+    client = TestClient(app)
+    payload = {"queries": [{"q": "amor", "top_k": 2}, {"q": "fe", "filters": {"no_existe": 1}}]}
+    response = client.post("/api/v1/search/batch", json=payload)
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == 2
+    assert len(items[0]["results"]) <= 2
+    assert items[1]["error"]["status"] == 400
@@ -0,0 +1,94 @@
+import asyncio
+
+import orjson
+
+from src.services.inverted_index import InvertedIndexService
+from src.usecases.search_usecase import SearchUseCase
+
+
+class BatchEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    async def embed(self, text):
+        raise AssertionError("debe usarse embed_batch")
+
+    async def embed_batch(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+class Adapter:
+    def __init__(self):
+        self.calls = []
+
+    def query(self, embedding, top_k=10, filter=None, timeout=None):
+        self.calls.append((embedding, top_k, filter))
+        return [{"id": f"v{embedding[0]:.0f}", "ref": "", "snippet": "", "score": 1.0}]
+
+
+def test_batch_keeps_order_and_isolates_errors(index_service):
+    embedder, adapter = BatchEmbedder(), Adapter()
+    usecase = SearchUseCase(index_service, embedder=embedder, pinecone_adapter=adapter)
+    queries = [
+        {"query": "amor", "mode": "semantic", "top_k": 3},
+        {"query": "mundo", "mode": "literal", "top_k": 5},
+        {"query": "amor", "mode": "semantic", "top_k": 1, "filters": {"book": "Juan"}},
+        {"query": "fe", "mode": "literal", "filters": {"no_existe": 1}},
+    ]
+    out = asyncio.run(usecase.search_batch(queries))
+    assert [r[0][0]["id"] for r in (out[0], out[2])] == ["v4", "v4"]
+    assert [r["id"] for r in out[1][0]] == ["NT-juan-03-016", "NT-juan-03-017"]
+    assert isinstance(out[3][1], ValueError) and out[3][0] is None
+    assert embedder.batches == [["amor"]]
+    assert len(adapter.calls) == 2
+    assert adapter.calls[1][2] == {"reference": {"$in": ["Juan 3:16", "Juan 3:17"]}}
+    assert all(not degraded for _, _, degraded in out)
+
+
+def test_batch_rejects_invalid_semantic_filters_per_item(index_service):
+    embedder, adapter = BatchEmbedder(), Adapter()
+    usecase = SearchUseCase(index_service, embedder=embedder, pinecone_adapter=adapter)
+    out = asyncio.run(usecase.search_batch([
+        {"query": "amor", "mode": "semantic", "filters": {"chapter": {"foo": 1}}},
+        {"query": "amor", "mode": "semantic", "filters": {"book": "Éxodo"}},
+        {"query": "amor", "mode": "semantic"},
+    ]))
+    assert isinstance(out[0][1], ValueError)
+    assert out[1] == ([], None, [])
+    assert out[2][0][0]["id"] == "v4"
+    assert len(adapter.calls) == 1
+
+
+class DownEmbedder:
+    async def embed_batch(self, texts):
+        raise ConnectionError("ollama caído")
+
+
+def test_batch_degrades_semantic_queries_to_literal(index_service):
+    usecase = SearchUseCase(index_service, embedder=DownEmbedder(), pinecone_adapter=Adapter())
+    out = asyncio.run(usecase.search_batch([{"query": "mundo", "mode": "semantic"}]))
+    results, error, degraded = out[0]
+    assert error is None
+    assert [r["id"] for r in results] == ["NT-juan-03-016", "NT-juan-03-017"]
+    assert degraded and degraded[0].startswith("ollama")
+
+
+def test_large_filtered_sets_post_filter_instead_of_pushing_references(index_service, monkeypatch):
+    monkeypatch.setattr("src.usecases.search_usecase.PINECONE_IN_MAX", 1)
+    adapter = Adapter()
+    usecase = SearchUseCase(index_service, embedder=BatchEmbedder(), pinecone_adapter=adapter)
+    asyncio.run(usecase.search_batch([{"query": "amor", "mode": "semantic", "top_k": 1, "filters": {"book": "Juan"}}]))
+    assert adapter.calls[0][2] is None and adapter.calls[0][1] > 1
+
+
+def test_references_outside_metadata_are_not_pushed_down(tmp_path):
+    path = tmp_path / "legado.jsonl"
+    path.write_bytes(orjson.dumps({"id": "NT-juan-03-016", "Referencia": "Juan 3:16", "text": "amó Dios al mundo"}) + b"\n")
+    service = InvertedIndexService(jsonl_path=str(path))
+    assert not service.references_in_metadata
+    assert not InvertedIndexService(jsonl_path=str(path)).references_in_metadata
+    adapter = Adapter()
+    usecase = SearchUseCase(service, embedder=BatchEmbedder(), pinecone_adapter=adapter)
+    asyncio.run(usecase.search_batch([{"query": "amor", "mode": "semantic", "filters": {"book": "Juan"}}]))
+    assert adapter.calls[0][2] is None
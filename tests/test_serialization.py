@@ -0,0 +1,57 @@
+import orjson
+
+from src.api.serialization import FragmentCache, encode_result, search_response
+
+
+def test_cached_fragments_match_generic_encoding(index_service):
+    cache = FragmentCache(index_service)
+    results = [
+        {"id": "NT-juan-03-016", "score": 3.0, "snippet": index_service.text_by_id["NT-juan-03-016"],
+         "metadata": {"ref": "Juan 3:16"}},
+        {"id": "AT-genesis-01-001", "score": 1, "snippet": index_service.text_by_id["AT-genesis-01-001"],
+         "metadata": {"ref": "Génesis 1:1"}},
+    ]
+    body = search_response(results, cache=cache, next_cursor=None).body
+    expected = b'{"results":[' + b",".join(encode_result(r) for r in results) + b'],"query_embedding":null,"next_cursor":null}'
+    assert body == expected
+    assert orjson.loads(body)["results"][1]["score"] == 1.0
+    search_response(results, cache=cache)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_extra_keys_are_kept_and_not_cached(index_service):
+    cache = FragmentCache(index_service, max_entries=1)
+    semantic = {"id": "x", "score": 0.5, "snippet": "s", "metadata": {"contenido": "s"}, "ref": "Juan 1:1"}
+    data = orjson.loads(search_response([semantic], cache=cache).body)
+    assert data["results"] == [{"id": "x", "score": 0.5, "snippet": "s", "metadata": {"contenido": "s"}, "ref": "Juan 1:1"}]
+    assert len(cache) == 0
+
+
+def test_batch_response_mixes_results_and_errors(index_service):
+    from src.api.serialization import batch_response
+    cache = FragmentCache(index_service)
+    result = {"id": "NT-juan-03-016", "score": 1.0, "snippet": index_service.text_by_id["NT-juan-03-016"],
+              "metadata": {"ref": "Juan 3:16"}}
+    items = [{"results": [result]}, {"error": {"status": 400, "detail": "mal"}}, {"results": [], "degraded": {"mode": "literal"}}]
+    data = orjson.loads(batch_response(items, cache=cache).body)
+    assert data["items"][0] == orjson.loads(search_response([result]).body)
+    assert data["items"][1] == {"error": {"status": 400, "detail": "mal"}}
+    assert data["items"][2] == {"results": [], "query_embedding": None, "degraded": {"mode": "literal"}}
+
+
+class MutableIndex:
+    def __init__(self):
+        self.text_by_id = {"a": "antes"}
+        self.ref_by_id = {"a": "Juan 1:1"}
+
+
+def test_invalidate_drops_stale_fragments():
+    index = MutableIndex()
+    cache = FragmentCache(index)
+    result = {"id": "a", "score": 1.0, "snippet": "antes", "metadata": {"ref": "Juan 1:1"}}
+    assert orjson.loads(search_response([result], cache=cache).body)["results"][0]["snippet"] == "antes"
+    index.text_by_id["a"] = "después"
+    cache.invalidate(["a", "otro"])
+    assert orjson.loads(search_response([result], cache=cache).body)["results"][0]["snippet"] == "después"
+    cache.invalidate()
+    assert len(cache) == 0
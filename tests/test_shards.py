@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import orjson
+import pytest
+
+from src.infra.resilience import BackendUnavailable
+from src.services.inverted_index import InvertedIndexService
+from src.services.shards import ShardCache, ShardSpec, ShardedSearch, merge_top_k, parse_shard_specs
+from src.usecases.search_usecase import SearchUseCase
+
+
+def _corpus(tmp_path, name, verses):
+    path = tmp_path / f"{name}.jsonl"
+    with open(path, "wb") as f:
+        for vid, ref, text in verses:
+            f.write(orjson.dumps({"id": vid, "text": text, "metadata": {"reference": ref}}) + b"\n")
+    return ShardSpec(name, str(path))
+
+
+@pytest.fixture
+def specs(tmp_path):
+    return {
+        "es": _corpus(tmp_path, "es", [("NT-juan-03-016", "Juan 3:16", "Porque de tal manera amó Dios al mundo"),
+                                       ("NT-juan-03-017", "Juan 3:17", "Porque no envió Dios a su Hijo al mundo")]),
+        "en": _corpus(tmp_path, "en", [("NT-juan-03-016", "John 3:16", "For God so loved the world"),
+                                       ("NT-juan-01-001", "John 1:1", "In the beginning was the Word, and the Word was with God")]),
+        "pt": _corpus(tmp_path, "pt", [("NT-juan-03-016", "João 3:16", "Porque Deus amou o mundo de tal maneira")]),
+    }
+
+
+def test_parse_shard_specs():
+    assert parse_shard_specs(" es=/a.jsonl, en=/b.jsonl ,") == {
+        "es": ShardSpec("es", "/a.jsonl"), "en": ShardSpec("en", "/b.jsonl")}
+    with pytest.raises(ValueError):
+        parse_shard_specs("es")
+
+
+def test_cache_evicts_least_recently_used(specs):
+    cache = ShardCache(max_loaded=2)
+    es = cache.get(specs["es"])
+    cache.get(specs["en"])
+    assert cache.get(specs["es"]) is es
+    cache.get(specs["pt"])
+    assert cache.names() == ["es", "pt"]
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 3, 1)
+    cache.pin("fijo", es)
+    assert cache.get(ShardSpec("fijo", "/no/existe.jsonl")) is es
+
+
+def test_merge_orders_by_score_then_requested_shard():
+    merged = merge_top_k([[{"id": "a", "score": 1.0}], [{"id": "b", "score": 2.0}, {"id": "c", "score": 1.0}]], ["x", "y"], 3)
+    assert [(r["id"], r["shard"]) for r in merged] == [("b", "y"), ("a", "x"), ("c", "y")]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_fan_out_merges_global_top_k(specs, executor):
+    sharded = ShardedSearch(specs, executor=executor, workers=2, max_loaded=2)
+    try:
+        results = asyncio.run(sharded.search("god", ["en", "es", "pt"], top_k=5))
+        assert [(r["id"], r["shard"]) for r in results] == [("NT-juan-03-016", "en"), ("NT-juan-01-001", "en")]
+        results = asyncio.run(sharded.search("mundo", ["es", "pt"], top_k=2))
+        assert [r["shard"] for r in results] == ["es", "es"]
+        with pytest.raises(ValueError):
+            asyncio.run(sharded.search("mundo", ["xx"]))
+    finally:
+        sharded.shutdown()
+
+
+def test_instances_keep_their_own_cache(specs):
+    main = SearchUseCase(InvertedIndexService(jsonl_path=specs["es"].jsonl_path))
+    os.remove(specs["es"].jsonl_path)
+    first = ShardedSearch(specs, workers=1)
+    first.pin("es", main)
+    second = ShardedSearch(specs, workers=1)
+    try:
+        results = asyncio.run(first.search("mundo", ["es"], top_k=5))
+        assert {r["shard"] for r in results} == {"es"}
+        asyncio.run(second.search("god", ["en"], top_k=5))
+        assert (first.hits, first.misses, first.cache.names()) == (1, 0, ["es"])
+        assert (second.hits, second.misses, second.cache.names()) == (0, 1, ["en"])
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+
+def test_process_mode_searches_pinned_shard_in_process_and_counts_workers(specs):
+    main = SearchUseCase(InvertedIndexService(jsonl_path=specs["es"].jsonl_path))
+    os.remove(specs["es"].jsonl_path)
+    sharded = ShardedSearch(specs, executor="process", workers=1, max_loaded=2)
+    sharded.pin("es", main)
+    try:
+        results = asyncio.run(sharded.search("mundo", ["es", "en"], top_k=5))
+        assert {r["shard"] for r in results} == {"es"}
+        asyncio.run(sharded.search("god", ["en"], top_k=5))
+        assert (sharded.hits, sharded.misses, sharded.loaded) == (2, 1, 2)
+    finally:
+        sharded.shutdown()
+
+
+class Embedder:
+    async def embed(self, text):
+        return [0.0]
+
+
+class NamespaceAdapter:
+    def query(self, embedding, top_k=10, filter=None, namespace=None, timeout=None):
+        score = {"es": 0.9, "en": 0.8}[namespace]
+        return [{"id": f"{namespace}-{i}", "ref": "", "snippet": "", "score": score - i / 100} for i in range(top_k)]
+
+
+def test_semantic_fan_out_queries_each_namespace(specs):
+    usecase = SearchUseCase(None, embedder=Embedder(), pinecone_adapter=NamespaceAdapter())
+    sharded = ShardedSearch(specs, workers=1, semantic=usecase)
+    results = asyncio.run(sharded.search("amor", ["es", "en"], top_k=3, mode="semantic"))
+    sharded.shutdown()
+    assert sorted((r["id"], r["shard"]) for r in results) == [("es-0", "es"), ("es-1", "es"), ("es-2", "es")]
+
+
+class DownAdapter:
+    def query(self, embedding, top_k=10, filter=None, namespace=None, timeout=None):
+        raise ConnectionError("pinecone caído")
+
+
+def test_semantic_fan_out_without_local_index_propagates_outage(specs):
+    usecase = SearchUseCase(None, embedder=Embedder(), pinecone_adapter=DownAdapter())
+    with pytest.raises(BackendUnavailable):
+        asyncio.run(usecase.search_namespaces("amor", ["es", "en"]))
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from src.infra.singleflight import SingleFlight
+from src.usecases.search_usecase import SearchUseCase
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    runs = []
+
+    async def work(key):
+        runs.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def main():
+        calls = [flight.do(k, lambda k=k: work(k)) for k in ("a", "a", "b", "a")]
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(main()) == ["A", "A", "B", "A"]
+    assert sorted(runs) == ["a", "b"]
+    assert (flight.calls, flight.collapsed) == (4, 2)
+    assert len(flight) == 0
+
+
+def test_errors_reach_every_waiter_and_release_the_key():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("falló")
+
+    async def main():
+        results = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await flight.do("k", lambda: asyncio.sleep(0, result="ok")) == "ok"
+
+    asyncio.run(main())
+    assert flight.collapsed == 1
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    flight = SingleFlight()
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(0.02, result="ok")))
+        second = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(0.02, result="otro")))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "ok"
+
+
+class SlowEmbedder:
+    calls = 0
+
+    async def embed(self, text):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return [0.0]
+
+
+class Adapter:
+    def query(self, embedding, top_k=10, filter=None, timeout=None):
+        return [{"id": "v1", "ref": "", "snippet": "", "score": 1.0}]
+
+
+def test_usecase_coalesces_embeddings(index_service):
+    embedder = SlowEmbedder()
+    usecase = SearchUseCase(index_service, embedder=embedder, pinecone_adapter=Adapter())
+
+    async def main():
+        return await asyncio.gather(*[usecase.search("amor", mode="semantic") for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert all(r[0]["id"] == "v1" for r in results)
+    assert embedder.calls == 1
+    assert usecase.embed_flight.collapsed == 4